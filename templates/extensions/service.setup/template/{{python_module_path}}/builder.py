@@ -0,0 +1,57 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+from pxr import Sdf, Usd, UsdGeom
+
+
+def build_cube_stage(cube_scale: float) -> Usd.Stage:
+    """
+    Builds a stage holding a cube of size `cube_scale` under a `/World`
+    default prim.
+
+    The stage lives in memory and is not attached to a USD context, so
+    concurrent builds do not share any state and can run on any thread.
+    """
+    stage = Usd.Stage.CreateInMemory()
+
+    # Set the default prim
+    world = UsdGeom.Xform.Define(stage, "/World")
+    stage.SetDefaultPrim(world.GetPrim())
+
+    # Create cube
+    cube = UsdGeom.Cube.Define(stage, "/World/Cube")
+    cube.CreateSizeAttr(cube_scale)
+    half_size = cube_scale / 2.0
+    cube.CreateExtentAttr([(-half_size, -half_size, -half_size), (half_size, half_size, half_size)])
+    return stage
+
+
+def author_cube(layer: Sdf.Layer, cube_scale: float) -> None:
+    """
+    Authors the same cube as `build_cube_stage` directly in `layer`.
+
+    Specs are written at the Sdf level without composing a stage, within a
+    single change block, which is what makes building many cubes cheap.
+    """
+    half_size = cube_scale / 2.0
+    with Sdf.ChangeBlock():
+        world = Sdf.CreatePrimInLayer(layer, "/World")
+        world.specifier = Sdf.SpecifierDef
+        world.typeName = "Xform"
+        layer.defaultPrim = "World"
+
+        cube = Sdf.CreatePrimInLayer(layer, "/World/Cube")
+        cube.specifier = Sdf.SpecifierDef
+        cube.typeName = "Cube"
+        Sdf.AttributeSpec(cube, "size", Sdf.ValueTypeNames.Double).default = cube_scale
+        Sdf.AttributeSpec(cube, "extent", Sdf.ValueTypeNames.Float3Array).default = [
+            (-half_size, -half_size, -half_size),
+            (half_size, half_size, half_size),
+        ]
@@ -0,0 +1,104 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import os
+import tempfile
+import zlib
+from typing import Iterator, List
+
+from pxr import Sdf
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# File formats layers can be exported to, and their media types.
+MEDIA_TYPES = {
+    "usda": "model/vnd.usda",
+    "usdc": "model/vnd.usd",
+}
+FORMATS = tuple(MEDIA_TYPES)
+
+
+def compressions() -> List[str]:
+    """Compressions exports can be streamed with, zstd only when the `zstandard` package is available."""
+    return ["identity", "gzip"] + (["zstd"] if zstandard is not None else [])
+
+
+def negotiate_compression(accept_encoding: str) -> str:
+    """Picks the best supported compression listed in an `Accept-Encoding` header."""
+    accepted = set()
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.strip().partition(";")
+        _, _, quality = params.strip().partition("q=")
+        try:
+            if quality and float(quality) <= 0:
+                continue
+        except ValueError:
+            continue
+        accepted.add(name.strip().lower())
+    for compression in ("zstd", "gzip"):
+        if compression in compressions() and (compression in accepted or "*" in accepted):
+            return compression
+    return "identity"
+
+
+def serialize_layer(layer: Sdf.Layer, file_format: str) -> bytes:
+    """
+    Serializes `layer` to `file_format` in memory.
+
+    usda is exported to a string directly. The crate format of usdc can only
+    be written to a file, which goes to a temporary directory deleted right
+    after.
+
+    Raises:
+        ValueError: If `file_format` is not one of `FORMATS`.
+    """
+    if file_format == "usda":
+        return layer.ExportToString().encode("utf-8")
+    if file_format != "usdc":
+        raise ValueError(f"Unsupported format '{file_format}', expected one of {', '.join(FORMATS)}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path = os.path.join(temp_dir, "export.usdc")
+        if not layer.Export(path):
+            raise RuntimeError(f"Failed to export {layer.identifier} to usdc")
+        with open(path, "rb") as exported:
+            return exported.read()
+
+
+def stream_chunks(data: bytes, compression: str, chunk_size: int) -> Iterator[bytes]:
+    """
+    Yields `data` in chunks of about `chunk_size` bytes, compressed chunk by
+    chunk, so that the first bytes go out before the whole payload is
+    compressed.
+
+    Raises:
+        ValueError: If `compression` is not one of `compressions()`.
+    """
+    if compression not in compressions():
+        raise ValueError(f"Unsupported compression '{compression}', expected one of {', '.join(compressions())}")
+    chunk_size = max(chunk_size, 1)
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    elif compression == "zstd":
+        compressor = zstandard.ZstdCompressor().compressobj()
+    else:
+        compressor = None
+
+    for offset in range(0, len(data), chunk_size):
+        chunk = data[offset:offset + chunk_size]
+        if compressor is not None:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
@@ -10,6 +10,8 @@
 
 import omni.ext
 from omni.services.core import main
+from .jobs import get_job_queue
+from .metrics import get_service_metrics
 from .service import router
 
 
@@ -24,6 +26,7 @@ class MyExtension(omni.ext.IExt):
     # located on the filesystem.
     def on_startup(self, _ext_id):
         """This is called every time the extension is activated."""
+        get_service_metrics().start()
         main.register_router(router)
         print("[{{ extension_name }}] MyExtension startup : Local Docs -  http://localhost:8011/docs")
 
@@ -31,4 +34,6 @@ class MyExtension(omni.ext.IExt):
         """This is called every time the extension is deactivated. It is used
         to clean up the extension state."""
         main.deregister_router(router)
+        get_job_queue().shutdown()
+        get_service_metrics().stop()
         print("[{{ extension_name }}] MyExtension shutdown")
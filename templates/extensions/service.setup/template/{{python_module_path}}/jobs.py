@@ -0,0 +1,225 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional
+
+import carb
+import carb.settings
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+JOB_WORKERS_SETTING = SETTINGS_PATH + "job_workers"
+JOB_QUEUE_SIZE_SETTING = SETTINGS_PATH + "job_queue_size"
+JOB_HISTORY_SIZE_SETTING = SETTINGS_PATH + "job_history_size"
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while `job_queue_size` jobs are already waiting."""
+
+
+class Job:
+    """A unit of work submitted to the `JobQueue`, and its outcome once it has run."""
+    def __init__(self, kind: str, work: Callable[[], Any]):
+        self.job_id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"
+        self.result: Any = None
+        self.error: str = ""
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._work = work
+        self._done = asyncio.get_event_loop().create_future()
+
+    @property
+    def finished(self) -> bool:
+        """Whether the job has run, successfully or not."""
+        return self.status in ("succeeded", "failed")
+
+    @property
+    def queue_seconds(self) -> Optional[float]:
+        """Time spent waiting for a worker."""
+        return self.started_at - self.submitted_at if self.started_at is not None else None
+
+    @property
+    def run_seconds(self) -> Optional[float]:
+        """Time spent running."""
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+    async def wait(self) -> Any:
+        """Waits for the job to finish and returns its result, raising its error if it failed."""
+        return await asyncio.shield(self._done)
+
+    def to_dict(self) -> dict:
+        """Status of the job as reported by the service."""
+        return {
+            "job_id": self.job_id,
+            "kind": self.kind,
+            "status": self.status,
+            "error": self.error,
+            "queue_seconds": self.queue_seconds,
+            "run_seconds": self.run_seconds,
+        }
+
+
+class JobQueue:
+    """
+    Bounded queue of jobs run by `job_workers` workers.
+
+    Jobs run on a thread pool, away from the event loop serving requests, so
+    a slow job only holds up its own worker. At most `job_queue_size` jobs
+    wait for a worker, further submissions raise `JobQueueFull` so callers
+    can push back instead of piling up work. Finished jobs are kept for
+    `job_history_size` jobs, the oldest being dropped first.
+
+    Workers start with the first submitted job.
+    """
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._running: int = 0
+        self._counters = {"submitted": 0, "succeeded": 0, "failed": 0, "rejected": 0}
+
+    def _start(self) -> None:
+        settings = carb.settings.get_settings()
+        workers = max(settings.get_as_int(JOB_WORKERS_SETTING), 1)
+        self._queue = asyncio.Queue(maxsize=max(settings.get_as_int(JOB_QUEUE_SIZE_SETTING), 0))
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="{{ extension_name }}.jobs")
+        self._workers = [asyncio.ensure_future(self._work()) for _ in range(workers)]
+
+    def submit(self, kind: str, work: Callable[[], Any]) -> Job:
+        """
+        Queues `work`, a callable run on a worker thread, and returns its job.
+
+        Raises:
+            JobQueueFull: If the queue is full.
+        """
+        if self._queue is None:
+            self._start()
+        job = Job(kind, work)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self._counters["rejected"] += 1
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued") from None
+        self._counters["submitted"] += 1
+        self._jobs[job.job_id] = job
+        self._trim_history()
+        return job
+
+    def submit_many(self, kind: str, works: List[Callable[[], Any]]) -> List[Job]:
+        """
+        Queues every callable of `works` as a job of its own, or none of them.
+
+        Raises:
+            JobQueueFull: If the queue cannot take every job.
+        """
+        if self._queue is None:
+            self._start()
+        if self._queue.maxsize > 0 and self._queue.qsize() + len(works) > self._queue.maxsize:
+            self._counters["rejected"] += len(works)
+            raise JobQueueFull(f"{self._queue.qsize()} jobs are already queued, {len(works)} more do not fit")
+        return [self.submit(kind, work) for work in works]
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """The job of `job_id`, if it is queued, running or in the history."""
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        """Queue depth, job counters and timings of the finished jobs in the history."""
+        finished = [job for job in self._jobs.values() if job.finished]
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self._queue.maxsize if self._queue else 0,
+            "running": self._running,
+            "workers": len(self._workers),
+            **self._counters,
+            "queue_seconds": _summary([job.queue_seconds for job in finished]),
+            "run_seconds": _summary([job.run_seconds for job in finished]),
+        }
+
+    async def _work(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.monotonic()
+            self._running += 1
+            try:
+                job.result = await loop.run_in_executor(self._executor, job._work)
+            except Exception as exc:
+                job.status = "failed"
+                job.error = str(exc)
+                self._counters["failed"] += 1
+                carb.log_warn(f"[{{ extension_name }}] Job {job.job_id} ({job.kind}) failed: {exc}")
+                job._done.set_exception(exc)
+            else:
+                job.status = "succeeded"
+                self._counters["succeeded"] += 1
+                job._done.set_result(job.result)
+            finally:
+                job.finished_at = time.monotonic()
+                self._running -= 1
+                self._queue.task_done()
+            # Nobody may wait for the outcome, which would then be reported as never retrieved.
+            job._done.exception()
+
+    def _trim_history(self) -> None:
+        limit = carb.settings.get_settings().get_as_int(JOB_HISTORY_SIZE_SETTING)
+        if limit <= 0:
+            return
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished]:
+            if len(self._jobs) <= limit:
+                break
+            del self._jobs[job_id]
+
+    def shutdown(self) -> None:
+        """Cancels the workers and fails the jobs still queued."""
+        for task in self._workers:
+            task.cancel()
+        self._workers.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        for job in self._jobs.values():
+            if not job._done.done():
+                job._done.cancel()
+        self._jobs.clear()
+        self._queue = None
+
+
+def _summary(values: List[Optional[float]]) -> dict:
+    values = sorted(value for value in values if value is not None)
+    if not values:
+        return {"count": 0}
+    return {
+        "count": len(values),
+        "mean": sum(values) / len(values),
+        "p50": values[len(values) // 2],
+        "p95": values[min(int(len(values) * 0.95), len(values) - 1)],
+        "max": values[-1],
+    }
+
+
+_job_queue = JobQueue()
+
+
+def get_job_queue() -> JobQueue:
+    """Returns the job queue shared by the service endpoints."""
+    return _job_queue
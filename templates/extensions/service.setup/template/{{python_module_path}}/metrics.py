@@ -0,0 +1,356 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import bisect
+import json
+import os
+import re
+import secrets
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import carb
+import carb.settings
+import carb.tokens
+import omni.kit.app
+from carb.eventdispatcher import get_eventdispatcher
+from fastapi import HTTPException, Request
+from fastapi.exceptions import RequestValidationError
+from fastapi.responses import Response, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.requests import ClientDisconnect
+from starlette.types import Receive, Scope, Send
+
+from .jobs import get_job_queue
+from .result_cache import get_result_cache
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+METRICS_ENABLED_SETTING = SETTINGS_PATH + "metrics_enabled"
+TRACE_FILE_SETTING = SETTINGS_PATH + "trace_file"
+
+# Upper bounds of the buckets of the histograms, in seconds.
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+FRAME_BUCKETS = (0.008, 0.0167, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+# W3C trace context header, https://www.w3.org/TR/trace-context/
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-[0-9a-f]{2}$")
+
+
+class _Histogram:
+    """Counts of observed values per bucket, along with their sum, as exposed by Prometheus."""
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # The last count is the +Inf bucket.
+        self.counts: List[int] = [0] * (len(buckets) + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name: str, labels: Dict[str, str]) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{name}_bucket{_labels(dict(labels, le=le))} {cumulative}")
+        lines.append(f"{name}_sum{_labels(labels)} {self.sum!r}")
+        lines.append(f"{name}_count{_labels(labels)} {self.count}")
+        return lines
+
+
+class _Span:
+    """A request being served, reported to the trace file once it completes."""
+    def __init__(self, method: str, route: str, traceparent: str):
+        self.method = method
+        self.route = route
+        match = _TRACEPARENT.match(traceparent.strip().lower())
+        if match and match.group(1) != "0" * 32:
+            self.trace_id, self.parent_span_id = match.group(1), match.group(2)
+        else:
+            self.trace_id, self.parent_span_id = secrets.token_hex(16), ""
+        self.span_id = secrets.token_hex(8)
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+        # Status code of a streamed response whose stream failed.
+        self.status_code: Optional[int] = None
+
+    @property
+    def traceparent(self) -> str:
+        """Trace context of the span, returned to the client to correlate its request with the trace."""
+        return f"00-{self.trace_id}-{self.span_id}-01"
+
+    def to_dict(self, status_code: int, duration: float) -> dict:
+        return {
+            "name": f"{self.method} {self.route}",
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_span_id": self.parent_span_id,
+            "start_time": self.start_time,
+            "duration_seconds": duration,
+            "method": self.method,
+            "route": self.route,
+            "status_code": status_code,
+        }
+
+
+class SpanWriter:
+    """
+    Appends spans to a file as JSON lines, for a local collector to tail.
+
+    Spans are written in order by a thread of their own, requests never wait
+    for the file. Once a write fails, further spans are dropped.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.failed = False
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="{{ extension_name }}.spans")
+
+    def write(self, span: dict) -> None:
+        """Queues `span` to be appended to the file."""
+        if not self.failed:
+            self._executor.submit(self._write, span)
+
+    def _write(self, span: dict) -> None:
+        if self.failed:
+            return
+        try:
+            self._file.write(json.dumps(span, separators=(",", ":")) + "\n")
+        except (OSError, ValueError) as exc:
+            carb.log_warn(f"[{{ extension_name }}] Failed to write a span, tracing stops: {exc}")
+            self.failed = True
+
+    def close(self) -> None:
+        """Writes the queued spans and closes the file."""
+        self._executor.shutdown(wait=True)
+        self._file.close()
+
+
+class ServiceMetrics:
+    """
+    Request, job queue, result cache and frame metrics of the service,
+    rendered in the Prometheus text format by `/metrics`.
+
+    Requests are measured by the routes of the router, which are
+    `MetricsRoute`s: per route latency histograms, request counts by status,
+    server error counts and the number of requests in flight. Streamed
+    responses are measured until their last chunk is sent or the client goes
+    away. Kit frame durations tell how long the main loop, which also runs
+    the event loop serving requests, is blocked.
+
+    When the `trace_file` setting is set, every request also appends a span
+    to that file, continuing the trace of a `traceparent` request header.
+    """
+    def __init__(self):
+        self._requests: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._errors: Dict[Tuple[str, str, str], int] = defaultdict(int)
+        self._durations: Dict[Tuple[str, str], _Histogram] = {}
+        self._in_flight: int = 0
+        self._frames = _Histogram(FRAME_BUCKETS)
+        self._frame_subscription = None
+        self._span_writer: Optional[SpanWriter] = None
+
+    @property
+    def enabled(self) -> bool:
+        """Whether requests are measured, read from the `metrics_enabled` setting."""
+        return carb.settings.get_settings().get_as_bool(METRICS_ENABLED_SETTING)
+
+    def start(self) -> None:
+        """Starts measuring frames and opens the trace file."""
+        self._frame_subscription = get_eventdispatcher().observe_event(
+            observer_name="{{ extension_name }}:ServiceMetrics",
+            event_name=omni.kit.app.GLOBAL_EVENT_UPDATE,
+            on_event=lambda event: self._frames.observe(float(event.payload["dt"])),
+        )
+        trace_file = carb.settings.get_settings().get_as_string(TRACE_FILE_SETTING)
+        if trace_file:
+            path = carb.tokens.get_tokens_interface().resolve(trace_file)
+            try:
+                self._span_writer = SpanWriter(path)
+            except OSError as exc:
+                carb.log_warn(f"[{{ extension_name }}] Failed to open the trace file {path}: {exc}")
+
+    def stop(self) -> None:
+        """Stops measuring frames and closes the trace file."""
+        self._frame_subscription = None
+        if self._span_writer is not None:
+            self._span_writer.close()
+            self._span_writer = None
+
+    async def track(self, request: Request, route: str, call: Callable) -> Response:
+        """Serves `request` with `call`, the handler of `route`, measuring it."""
+        if not self.enabled:
+            return await call(request)
+        span = _Span(request.method, route, request.headers.get("traceparent", ""))
+        self._in_flight += 1
+        try:
+            response = await call(request)
+        except BaseException as exc:
+            self._finish(span, _error_status(exc))
+            raise
+        response.headers["traceparent"] = span.traceparent
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = self._watch_stream(span, response.body_iterator)
+            # A failed stream may be cut short without the sending of the response failing.
+            return _MeasuredStream(response, lambda status_code: self._finish(span, span.status_code or status_code))
+        self._finish(span, response.status_code)
+        return response
+
+    async def _watch_stream(self, span: _Span, chunks: AsyncIterator) -> AsyncIterator:
+        try:
+            async for chunk in chunks:
+                yield chunk
+        except BaseException as exc:
+            span.status_code = _error_status(exc)
+            raise
+
+    def _finish(self, span: _Span, status_code: int) -> None:
+        duration = time.perf_counter() - span.start
+        self._in_flight -= 1
+        self._requests[(span.method, span.route, str(status_code))] += 1
+        if status_code >= 500:
+            self._errors[(span.method, span.route, str(status_code))] += 1
+        histogram = self._durations.get((span.method, span.route))
+        if histogram is None:
+            histogram = self._durations[(span.method, span.route)] = _Histogram(REQUEST_BUCKETS)
+        histogram.observe(duration)
+        if self._span_writer is not None:
+            self._span_writer.write(span.to_dict(status_code, duration))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+
+        def metric(name: str, metric_type: str, help_text: str) -> None:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+
+        metric("http_requests_total", "counter", "Requests served, by route and status code.")
+        for (method, route, status), count in sorted(self._requests.items()):
+            lines.append(f"http_requests_total{_labels(dict(method=method, route=route, status=status))} {count}")
+        metric("http_request_errors_total", "counter", "Requests answered with a server error, by route and status code.")
+        for (method, route, status), count in sorted(self._errors.items()):
+            lines.append(
+                f"http_request_errors_total{_labels(dict(method=method, route=route, status=status))} {count}"
+            )
+        metric("http_request_duration_seconds", "histogram", "Time to serve requests, by route.")
+        for (method, route), histogram in sorted(self._durations.items()):
+            lines.extend(histogram.render("http_request_duration_seconds", dict(method=method, route=route)))
+        metric("http_requests_in_flight", "gauge", "Requests being served.")
+        lines.append(f"http_requests_in_flight {self._in_flight}")
+
+        jobs = get_job_queue().stats()
+        metric("service_jobs_queue_depth", "gauge", "Jobs waiting for a worker.")
+        lines.append(f"service_jobs_queue_depth {jobs['queue_depth']}")
+        metric("service_jobs_queue_capacity", "gauge", "Jobs that can wait for a worker before submissions are rejected.")
+        lines.append(f"service_jobs_queue_capacity {jobs['queue_capacity']}")
+        metric("service_jobs_running", "gauge", "Jobs being run by a worker.")
+        lines.append(f"service_jobs_running {jobs['running']}")
+        metric("service_jobs_total", "counter", "Jobs by outcome.")
+        for outcome in ("submitted", "succeeded", "failed", "rejected"):
+            lines.append(f"service_jobs_total{_labels(dict(outcome=outcome))} {jobs[outcome]}")
+
+        cache = get_result_cache().stats()
+        metric("service_result_cache_lookups_total", "counter", "Result cache lookups by result.")
+        lines.append(f"service_result_cache_lookups_total{_labels(dict(result='hit'))} {cache['hits']}")
+        lines.append(f"service_result_cache_lookups_total{_labels(dict(result='miss'))} {cache['misses']}")
+        metric("service_result_cache_evictions_total", "counter", "Results evicted from the cache, by reason.")
+        lines.append(f"service_result_cache_evictions_total{_labels(dict(reason='size'))} {cache['evictions']}")
+        lines.append(f"service_result_cache_evictions_total{_labels(dict(reason='ttl'))} {cache['expirations']}")
+        metric("service_result_cache_bytes", "gauge", "Size of the results in the cache.")
+        lines.append(f"service_result_cache_bytes {cache['bytes']}")
+
+        metric("kit_frame_duration_seconds", "histogram", "Duration of the frames of the main loop.")
+        lines.extend(self._frames.render("kit_frame_duration_seconds", {}))
+        return "\n".join(lines) + "\n"
+
+    def clear(self) -> None:
+        """Resets every metric but the requests in flight."""
+        self._requests.clear()
+        self._errors.clear()
+        self._durations.clear()
+        self._frames = _Histogram(FRAME_BUCKETS)
+
+
+class _MeasuredStream:
+    """
+    Sends a streamed response, then finishes the span of its request.
+
+    The span is finished however sending ends, also when the client goes
+    away before the stream is iterated at all, which the stream itself would
+    never notice.
+    """
+    def __init__(self, response: StreamingResponse, finish: Callable[[int], None]):
+        self.response = response
+        self._finish = finish
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        status_code = self.response.status_code
+        try:
+            await self.response(scope, receive, send)
+        except BaseException as exc:
+            status_code = _error_status(exc)
+            raise
+        finally:
+            self._finish(status_code)
+
+
+class MetricsRoute(APIRoute):
+    """Route measuring the requests it serves with the service metrics, as the `route_class` of a router."""
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        # The path template, not the requested path, keeps the number of series bounded.
+        route = self.path
+
+        async def measured_handler(request: Request) -> Response:
+            return await get_service_metrics().track(request, route, handler)
+
+        return measured_handler
+
+
+def _error_status(exc: BaseException) -> int:
+    """Status code a request failing with `exc` is answered with."""
+    if isinstance(exc, HTTPException):
+        return exc.status_code
+    if isinstance(exc, RequestValidationError):
+        return 422
+    if isinstance(exc, (asyncio.CancelledError, ClientDisconnect)):
+        # The client went away, as logged by nginx.
+        return 499
+    return 500
+
+
+def _labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+_service_metrics = ServiceMetrics()
+
+
+def get_service_metrics() -> ServiceMetrics:
+    """Returns the metrics shared by the service endpoints."""
+    return _service_metrics
@@ -0,0 +1,242 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import carb
+import carb.settings
+import carb.tokens
+from pydantic import BaseModel
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+RESULT_CACHE_DIR_SETTING = SETTINGS_PATH + "result_cache_dir"
+RESULT_CACHE_MAX_MB_SETTING = SETTINGS_PATH + "result_cache_max_mb"
+RESULT_CACHE_TTL_SETTING = SETTINGS_PATH + "result_cache_ttl"
+
+
+def cache_key(kind: str, model: BaseModel, exclude: Tuple[str, ...] = (), **params) -> str:
+    """
+    Content address of a result: the sha256 of the canonical JSON of the
+    validated request `model`, minus the `exclude` fields that do not change
+    the result, along with the `kind` of result and its extra `params`.
+    """
+    data = model.model_dump() if hasattr(model, "model_dump") else model.dict()
+    canonical = json.dumps(
+        {
+            "kind": kind,
+            "request": {key: value for key, value in data.items() if key not in exclude},
+            "params": params,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """
+    On-disk LRU store of generated results, one file per content address.
+
+    Entries not used for `ttl` seconds are dropped when read, and the least
+    recently used entries are evicted once the store holds more than
+    `max_bytes`. The store survives restarts: existing files are indexed on
+    first use, most recently modified last, and every write or hit touches
+    its file, so the modification time is the last use whether the entry was
+    indexed from disk or cached by this process.
+
+    Results are read and written from the job workers as well as the event
+    loop. The lock only guards the index, files are read, written and
+    deleted outside of it; a file deleted under a reader is a miss.
+    """
+    def __init__(self, directory: str, max_bytes: int, ttl: float):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # Size and last use time of every entry, least recently used first.
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()
+        self._bytes: int = 0
+        self._lock = threading.Lock()
+        self._indexed = False
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether results are cached, a size limit of 0 or no directory disables the cache."""
+        return bool(self.directory) and self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+
+    def _ensure_indexed(self) -> None:
+        """Indexes the entries already on disk on first use."""
+        if self._indexed:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and len(entry.name) == 64:
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+        with self._lock:
+            if self._indexed:
+                return
+            self._indexed = True
+            # Entries cached meanwhile by this process are the most recently used.
+            for mtime, key, size in sorted(entries, reverse=True):
+                if key not in self._entries:
+                    self._entries[key] = (size, mtime)
+                    self._entries.move_to_end(key, last=False)
+                    self._bytes += size
+            removed = self._evict()
+        self._delete(removed)
+
+    def _valid(self, key: str, removed: List[str]) -> bool:
+        """Whether `key` is cached and fresh, dropping it if it expired. Called with the lock held."""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False
+        if self.ttl > 0 and time.time() - entry[1] > self.ttl:
+            removed.append(self._drop(key))
+            self._counters["expirations"] += 1
+            return False
+        return True
+
+    def contains(self, key: str) -> bool:
+        """Whether a fresh result is cached for `key`, without counting a hit or a miss."""
+        if not self.enabled:
+            return False
+        self._ensure_indexed()
+        removed: List[str] = []
+        with self._lock:
+            valid = self._valid(key, removed)
+        self._delete(removed)
+        return valid
+
+    def get(self, key: str) -> Optional[bytes]:
+        """The result cached for `key`, None on a miss."""
+        if not self.enabled:
+            return None
+        self._ensure_indexed()
+        removed: List[str] = []
+        with self._lock:
+            valid = self._valid(key, removed)
+        self._delete(removed)
+        data = None
+        if valid:
+            try:
+                with open(self._path(key), "rb") as cached:
+                    data = cached.read()
+                # Keeps the LRU order and the expiration across restarts.
+                os.utime(self._path(key))
+            except OSError:
+                data = None
+        with self._lock:
+            if data is None:
+                if valid and key in self._entries:
+                    # Evicted or deleted while being read.
+                    self._bytes -= self._entries.pop(key)[0]
+                self._counters["misses"] += 1
+                return None
+            self._counters["hits"] += 1
+            if key in self._entries:
+                self._entries[key] = (self._entries[key][0], time.time())
+                self._entries.move_to_end(key)
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """Caches `data` for `key`, evicting the least recently used results beyond the size limit."""
+        if not self.enabled or len(data) > self.max_bytes:
+            return
+        self._ensure_indexed()
+        # Written aside and moved in place, readers never see a partial result.
+        try:
+            handle, temp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        except OSError as exc:
+            carb.log_warn(f"[{{ extension_name }}] Failed to cache result {key}: {exc}")
+            return
+        try:
+            with os.fdopen(handle, "wb") as temp_file:
+                temp_file.write(data)
+            os.replace(temp_path, self._path(key))
+        except OSError as exc:
+            carb.log_warn(f"[{{ extension_name }}] Failed to cache result {key}: {exc}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= self._entries.pop(key)[0]
+            self._entries[key] = (len(data), time.time())
+            self._bytes += len(data)
+            removed = self._evict()
+        self._delete(removed)
+
+    def _evict(self) -> List[str]:
+        """Drops the least recently used entries beyond the size limit, returns their paths. Called with the lock held."""
+        removed = []
+        while self._entries and self._bytes > self.max_bytes:
+            removed.append(self._drop(next(iter(self._entries))))
+            self._counters["evictions"] += 1
+        return removed
+
+    def _drop(self, key: str) -> str:
+        """Drops `key` from the index, returns the path of its file. Called with the lock held."""
+        size, _ = self._entries.pop(key)
+        self._bytes -= size
+        return self._path(key)
+
+    @staticmethod
+    def _delete(paths: List[str]) -> None:
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        """Hit, miss, eviction and expiration counters and the size of the store."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                **self._counters,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+            }
+
+
+_result_cache: Optional[ResultCache] = None
+# Job workers may be the first to use the cache, concurrently.
+_result_cache_lock = threading.Lock()
+
+
+def get_result_cache() -> ResultCache:
+    """Returns the result cache shared by the service endpoints, configured from the settings on first use."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            settings = carb.settings.get_settings()
+            directory = settings.get_as_string(RESULT_CACHE_DIR_SETTING)
+            _result_cache = ResultCache(
+                carb.tokens.get_tokens_interface().resolve(directory),
+                int(settings.get_as_float(RESULT_CACHE_MAX_MB_SETTING) * 1024 * 1024),
+                settings.get_as_float(RESULT_CACHE_TTL_SETTING),
+            )
+        return _result_cache
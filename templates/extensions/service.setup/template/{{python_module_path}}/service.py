@@ -8,14 +8,36 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 
+import asyncio
+import math
+import time
 from pathlib import Path
+from typing import Callable, List, Optional
+from fastapi import HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from pydantic import BaseModel, Field
 
-import omni.kit.commands
-import omni.usd
+import carb.settings
 from omni.services.core.routers import ServiceAPIRouter
 
-router = ServiceAPIRouter(tags=["{{ extension_display_name }}"])
+from pxr import Sdf
+
+from .builder import author_cube, build_cube_stage
+from .export import FORMATS, MEDIA_TYPES, compressions, negotiate_compression, serialize_layer, stream_chunks
+from .jobs import JOB_WORKERS_SETTING, JobQueueFull, get_job_queue
+from .metrics import MetricsRoute, get_service_metrics
+from .result_cache import cache_key, get_result_cache
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+EXPORT_CHUNK_SIZE_SETTING = SETTINGS_PATH + "export_chunk_size"
+BATCH_MAX_SIZE_SETTING = SETTINGS_PATH + "batch_max_size"
+BATCH_MIN_CHUNK_SIZE_SETTING = SETTINGS_PATH + "batch_min_chunk_size"
+
+# Fields of a `CubeDataModel` that do not change the generated layer.
+_LOCATION_FIELDS = ("asset_write_location", "asset_name")
+
+# Every request to the routes of the router is measured by the service metrics.
+router = ServiceAPIRouter(tags=["{{ extension_display_name }}"], route_class=MetricsRoute)
 
 
 class CubeDataModel(BaseModel):
@@ -40,6 +62,121 @@ class CubeDataModel(BaseModel):
     )
 
 
+class CubeBatchDataModel(BaseModel):
+    """Model of a request for generating several cubes."""
+
+    cubes: List[CubeDataModel] = Field(
+        title="Cubes",
+        description="Cubes to generate, each written to its own asset",
+    )
+
+
+class JobModel(BaseModel):
+    """Model of the status of a job."""
+
+    job_id: str = Field(title="Job Id", description="Id to query the status and result of the job with")
+    kind: str = Field(title="Job Kind", description="Endpoint the job was submitted to")
+    status: str = Field(title="Status", description="One of queued, running, succeeded or failed")
+    error: str = Field(default="", title="Error", description="Why the job failed, if it did")
+    queue_seconds: Optional[float] = Field(
+        default=None, title="Queue Time", description="Seconds the job waited for a worker"
+    )
+    run_seconds: Optional[float] = Field(default=None, title="Run Time", description="Seconds the job ran for")
+
+
+def _cube_key(cube_data: CubeDataModel, file_format: str) -> str:
+    """Content address of the layer generated for `cube_data` in `file_format`."""
+    return cache_key("cube", cube_data, exclude=_LOCATION_FIELDS, format=file_format)
+
+
+def _store(key: str, data: bytes) -> bytes:
+    """Caches `data` for `key` and returns it."""
+    get_result_cache().put(key, data)
+    return data
+
+
+def _cached(key: str, produce: Callable[[], bytes]) -> bytes:
+    """The result cached for `key`, or else the one `produce` returns, which is cached."""
+    data = get_result_cache().get(key)
+    return data if data is not None else _store(key, produce())
+
+
+def _write_asset(asset_file_path: str, data: bytes) -> None:
+    """Writes a generated layer, creating its directory like `Sdf.Layer.Export` does."""
+    Path(asset_file_path).parent.mkdir(parents=True, exist_ok=True)
+    with open(asset_file_path, "wb") as asset_file:
+        asset_file.write(data)
+
+
+def _write_cube(cube_data: CubeDataModel) -> str:
+    """Builds the cube of `cube_data`, unless cached, and writes it, returns the path written. Runs on a job worker."""
+    data = _cached(_cube_key(cube_data, "usda"), lambda: _serialize_cube(cube_data, "usda"))
+    asset_file_path = str(Path(
+        cube_data.asset_write_location).joinpath(f"{cube_data.asset_name}.usda")
+    )
+    _write_asset(asset_file_path, data)
+    return asset_file_path
+
+
+def _serialize_cube(cube_data: CubeDataModel, file_format: str) -> bytes:
+    """Builds the cube of `cube_data` and serializes it in memory. Runs on a job worker."""
+    # The root layer of an in-memory stage only lives as long as the stage.
+    stage = build_cube_stage(cube_data.cube_scale)
+    return serialize_layer(stage.GetRootLayer(), file_format)
+
+
+def _author_usda(cube_data: CubeDataModel) -> bytes:
+    """Authors the cube of `cube_data` at the Sdf level and serializes it to usda."""
+    layer = Sdf.Layer.CreateAnonymous(".usda")
+    author_cube(layer, cube_data.cube_scale)
+    return layer.ExportToString().encode("utf-8")
+
+
+def _write_cubes(cubes: List[CubeDataModel]) -> List[dict]:
+    """
+    Authors and writes a chunk of a batch, returns its manifest entries. Runs on a job worker.
+
+    Each cube not already cached is authored in a layer of its own by
+    `author_cube`, so no stage is composed, and a cube that fails to be
+    authored or written is reported in its entry without failing the others.
+    """
+    manifest = []
+    for cube_data in cubes:
+        asset_file_path = str(Path(
+            cube_data.asset_write_location).joinpath(f"{cube_data.asset_name}.usda")
+        )
+        entry = {"asset_name": cube_data.asset_name, "path": asset_file_path, "cube_scale": cube_data.cube_scale}
+        try:
+            _write_asset(asset_file_path, _cached(_cube_key(cube_data, "usda"), lambda: _author_usda(cube_data)))
+        except Exception as exc:
+            entry["error"] = f"Failed to generate the asset: {exc}"
+        manifest.append(entry)
+    return manifest
+
+
+def _submit(kind: str, work):
+    """Submits `work` to the job queue, answering 503 when the queue is full."""
+    try:
+        return get_job_queue().submit(kind, work)
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {exc}") from exc
+
+
+def _submit_many(kind: str, works):
+    """Submits every callable of `works` to the job queue, or none of them, answering 503 when they do not fit."""
+    try:
+        return get_job_queue().submit_many(kind, works)
+    except JobQueueFull as exc:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {exc}") from exc
+
+
+def _get_job(job_id: str):
+    job = get_job_queue().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No job {job_id}")
+    return job
+
+
 @router.post(
     "/generate_cube",
     summary="Generate a cube",
@@ -48,34 +185,178 @@ class CubeDataModel(BaseModel):
 async def generate_cube(cube_data: CubeDataModel):
     print("[{{ extension_name }}] generate_cube was called")
 
-    # Create a new stage
-    usd_context = omni.usd.get_context()
-    usd_context.new_stage()
-    stage = omni.usd.get_context().get_stage()
-
-    # Set the default prim
-    default_prim_path = "/World"
-    stage.DefinePrim(default_prim_path, "Xform")
-    prim = stage.GetPrimAtPath(default_prim_path)
-    stage.SetDefaultPrim(prim)
-
-    # Create cube
-    prim_type = "Cube"
-    prim_path = f"/World/{prim_type}"
-
-    omni.kit.commands.execute(
-        "CreatePrim",
-        prim_path=prim_path,
-        prim_type=prim_type,
-        attributes={"size": cube_data.cube_scale},
-        select_new_prim=False,
-    )
-
-    # save stage
-    asset_file_path = str(Path(
-        cube_data.asset_write_location).joinpath(f"{cube_data.asset_name}.usda")
-    )
-    stage.GetRootLayer().Export(asset_file_path)
+    # The cube is built on an in-memory stage by a job worker, concurrent
+    # requests do not share any stage.
+    job = _submit("generate_cube", lambda: _write_cube(cube_data))
+    asset_file_path = await job.wait()
     msg = f"[{{ extension_name }}] Wrote a cube to this path: {asset_file_path}"
     print(msg)
     return msg
+
+
+@router.post(
+    "/jobs/generate_cube",
+    summary="Submit a cube generation job",
+    description="Queues the generation of a usda file containing a cube of given scale and returns the job right away",
+    response_model=JobModel,
+)
+async def submit_generate_cube(cube_data: CubeDataModel):
+    return _submit("generate_cube", lambda: _write_cube(cube_data)).to_dict()
+
+
+@router.get(
+    "/jobs",
+    summary="Job queue statistics",
+    description="Queue depth, job counters and the queue and run times of recent jobs",
+)
+async def get_jobs():
+    return get_job_queue().stats()
+
+
+@router.get(
+    "/jobs/{job_id}",
+    summary="Job status",
+    description="Status and timing of a submitted job",
+    response_model=JobModel,
+)
+async def get_job(job_id: str):
+    return _get_job(job_id).to_dict()
+
+
+@router.get(
+    "/jobs/{job_id}/result",
+    summary="Job result",
+    description="Result of a job, 409 while it has not finished and 500 if it failed",
+)
+async def get_job_result(job_id: str):
+    job = _get_job(job_id)
+    if not job.finished:
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    return {"job_id": job.job_id, "result": job.result}
+
+
+@router.post(
+    "/generate_cube/stream",
+    summary="Generate a cube and stream it back",
+    description=(
+        "Generates a cube of given scale and streams the usda or usdc file back in the response, "
+        "nothing is written on the service host. The response is compressed with the given compression, "
+        "or else the best one accepted by the Accept-Encoding header of the request. "
+        "Responses carry an ETag, a request with a matching If-None-Match gets a 304 while the layer is cached"
+    ),
+    response_class=StreamingResponse,
+)
+async def generate_cube_stream(
+    cube_data: CubeDataModel,
+    request: Request,
+    file_format: str = Query(default="usda", alias="format", description="One of usda or usdc"),
+    compression: str = Query(default="", description="One of identity, gzip or zstd, negotiated when empty"),
+):
+    if file_format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{file_format}', expected one of {', '.join(FORMATS)}")
+    compression = compression or negotiate_compression(request.headers.get("accept-encoding", ""))
+    if compression not in compressions():
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported compression '{compression}', expected one of {', '.join(compressions())}",
+        )
+
+    # Layers are cached by content address, which makes the address, along
+    # with the encoding of the body, a validator of the response.
+    key = _cube_key(cube_data, file_format)
+    etag = f'W/"{key}-{compression}"'
+    # The body depends on the Accept-Encoding header when no compression is given.
+    vary = {"Vary": "Accept-Encoding"}
+    # The cache reads the disk, which is done off the event loop.
+    loop = asyncio.get_event_loop()
+    cache = get_result_cache()
+    if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if (etag in if_none_match or "*" in if_none_match) and await loop.run_in_executor(None, cache.contains, key):
+        return Response(status_code=304, headers={"ETag": etag, **vary})
+
+    data = await loop.run_in_executor(None, cache.get, key)
+    cache_status = "hit" if data is not None else "miss"
+    if data is None:
+        job = _submit("generate_cube_stream", lambda: _store(key, _serialize_cube(cube_data, file_format)))
+        data = await job.wait()
+
+    headers = {
+        "Content-Disposition": f'attachment; filename="{cube_data.asset_name}.{file_format}"',
+        "ETag": etag,
+        "X-Cache": cache_status,
+        **vary,
+    }
+    if compression != "identity":
+        headers["Content-Encoding"] = compression
+    chunk_size = carb.settings.get_settings().get_as_int(EXPORT_CHUNK_SIZE_SETTING) or 64 * 1024
+    return StreamingResponse(
+        stream_chunks(data, compression, chunk_size), media_type=MEDIA_TYPES[file_format], headers=headers
+    )
+
+
+@router.post(
+    "/generate_cube/batch",
+    summary="Generate several cubes",
+    description=(
+        "Generates a usda file per cube of the request and returns a manifest of the assets written. "
+        "The cubes are split into chunks built concurrently by the job workers"
+    ),
+)
+async def generate_cube_batch(batch_data: CubeBatchDataModel):
+    cubes = batch_data.cubes
+    settings = carb.settings.get_settings()
+    max_size = settings.get_as_int(BATCH_MAX_SIZE_SETTING)
+    if max_size > 0 and len(cubes) > max_size:
+        raise HTTPException(status_code=413, detail=f"Batch of {len(cubes)} cubes exceeds the limit of {max_size}")
+    paths = [str(Path(cube.asset_write_location).joinpath(f"{cube.asset_name}.usda")) for cube in cubes]
+    if len(set(paths)) != len(paths):
+        raise HTTPException(status_code=400, detail="Several cubes of the batch are written to the same path")
+    print(f"[{{ extension_name }}] generate_cube_batch was called for {len(cubes)} cubes")
+
+    # One chunk per worker, unless chunks would be too small to be worth a job.
+    start = time.perf_counter()
+    min_chunk_size = max(settings.get_as_int(BATCH_MIN_CHUNK_SIZE_SETTING), 1)
+    chunk_count = max(min(max(settings.get_as_int(JOB_WORKERS_SETTING), 1), len(cubes) // min_chunk_size), 1)
+    chunk_size = math.ceil(len(cubes) / chunk_count) if cubes else 1
+    # Either every chunk is queued or the request is refused, a batch is never half written.
+    jobs = _submit_many("generate_cube_batch", [
+        lambda chunk=cubes[offset:offset + chunk_size]: _write_cubes(chunk)
+        for offset in range(0, len(cubes), chunk_size)
+    ])
+    manifest = []
+    for chunk in await asyncio.gather(*(job.wait() for job in jobs)):
+        manifest.extend(chunk)
+
+    failed = sum(1 for entry in manifest if "error" in entry)
+    return {
+        "count": len(manifest),
+        "succeeded": len(manifest) - failed,
+        "failed": failed,
+        "chunks": len(jobs),
+        "seconds": time.perf_counter() - start,
+        "assets": manifest,
+    }
+
+
+@router.get(
+    "/cache/stats",
+    summary="Result cache statistics",
+    description="Hit, miss, eviction and expiration counts and the size of the result cache",
+)
+async def get_cache_stats():
+    return get_result_cache().stats()
+
+
+@router.get(
+    "/metrics",
+    summary="Service metrics",
+    description=(
+        "Request latency histograms, request and error counts, requests in flight, job queue depth, "
+        "result cache counts and Kit frame durations, in the Prometheus text format"
+    ),
+    response_class=PlainTextResponse,
+)
+async def get_metrics():
+    return PlainTextResponse(get_service_metrics().render(), media_type="text/plain; version=0.0.4")
@@ -9,4 +9,5 @@
 # its affiliates is strictly prohibited.
 
 from .test_benchmarks import *
+from .test_load_benchmarks import *
 from .test_service import *
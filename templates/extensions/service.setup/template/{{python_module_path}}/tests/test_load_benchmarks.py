@@ -0,0 +1,162 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import tempfile
+import time
+from typing import Callable, List, Optional
+
+import carb.settings
+from omni.kit.test import BenchmarkTestCase
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/benchmark/"
+HTTP_SERVER_SETTINGS_PATH = "/exts/omni.services.transport.server.http/"
+# Interval at which the event loop lag is sampled.
+LAG_PROBE_INTERVAL = 0.01
+
+
+def rss_mb() -> Optional[float]:
+    """Current resident memory of the process in megabytes, None without psutil."""
+    try:
+        import psutil
+    except ImportError:
+        # The peak memory the platform reports cannot tell the growth over a run.
+        return None
+    return psutil.Process().memory_info().rss / (1024.0 * 1024.0)
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """The `fraction` percentile of `values`, by nearest rank."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(int(len(values) * fraction), len(values) - 1)]
+
+
+class LoopLagProbe:
+    """Measures by how much the event loop wakes up late, which is how long something blocked it."""
+    def __init__(self):
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _probe(self) -> None:
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.samples.append(max(time.perf_counter() - start - LAG_PROBE_INTERVAL, 0.0) * 1000.0)
+
+    def start(self) -> None:
+        self._task = asyncio.ensure_future(self._probe())
+
+    def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+
+class TestServiceLoadBenchmarks(BenchmarkTestCase):
+    """
+    Load tests the endpoints of the service through the HTTP server of the
+    running Kit instance, the way clients reach them.
+
+    Each benchmark sends `benchmark/requests` requests from
+    `benchmark/concurrency` concurrent clients, for example with
+    `--/exts/{{ extension_name }}/benchmark/concurrency=64`, and reports the
+    latency percentiles and distribution, the throughput, the event loop lag
+    and the memory growth over the run.
+    """
+
+    async def setUp(self):
+        import aiohttp
+
+        settings = carb.settings.get_settings()
+        host = settings.get_as_string(HTTP_SERVER_SETTINGS_PATH + "host") or "127.0.0.1"
+        if host == "0.0.0.0":
+            host = "127.0.0.1"
+        port = settings.get_as_int(HTTP_SERVER_SETTINGS_PATH + "port") or 8011
+        self._base_url = f"http://{host}:{port}"
+        self._session = aiohttp.ClientSession()
+        self._temp_dir = tempfile.TemporaryDirectory()
+        # Offsets the scales of the run so that results cached by previous
+        # runs are not hit.
+        self._scale_offset = time.time() % 1000.0
+
+    async def tearDown(self):
+        await self._session.close()
+        self._temp_dir.cleanup()
+
+    async def _load_test(self, method: str, path: str, payload: Callable[[int], Optional[dict]]) -> None:
+        """Sends `method` requests to `path`, the body of the `i`th request being `payload(i)`."""
+        settings = carb.settings.get_settings()
+        total = max(settings.get_as_int(SETTINGS_PATH + "requests"), 0) or 200
+        concurrency = max(settings.get_as_int(SETTINGS_PATH + "concurrency"), 0) or 8
+        latencies: List[float] = []
+        errors = 0
+        next_request = iter(range(total))
+
+        async def client() -> None:
+            nonlocal errors
+            for index in next_request:
+                start = time.perf_counter()
+                async with self._session.request(method, self._base_url + path, json=payload(index)) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+                latencies.append((time.perf_counter() - start) * 1000.0)
+
+        probe = LoopLagProbe()
+        memory_before = rss_mb()
+        probe.start()
+        start = time.perf_counter()
+        try:
+            await asyncio.gather(*(client() for _ in range(concurrency)))
+        finally:
+            probe.stop()
+        elapsed = time.perf_counter() - start
+        memory_after = rss_mb()
+
+        self.assertEqual(errors, 0, f"{errors} of {total} requests to {path} failed")
+        self.set_metric_sample_array(name="latency", values=latencies, unit="ms")
+        self.set_metric_sample(name="latency_p50", value=percentile(latencies, 0.50), unit="ms")
+        self.set_metric_sample(name="latency_p95", value=percentile(latencies, 0.95), unit="ms")
+        self.set_metric_sample(name="latency_p99", value=percentile(latencies, 0.99), unit="ms")
+        self.set_metric_sample(name="requests_per_second", value=total / elapsed if elapsed > 0 else 0.0)
+        self.set_metric_sample(name="concurrency", value=concurrency)
+        self.set_metric_sample_array(name="loop_lag", values=probe.samples or [0.0], unit="ms")
+        self.set_metric_sample(name="loop_lag_max", value=max(probe.samples, default=0.0), unit="ms")
+        if memory_before is not None and memory_after is not None:
+            self.set_metric_sample(name="memory_growth", value=memory_after - memory_before, unit="MB")
+
+    async def benchmark_generate_cube(self):
+        """Generates cubes of distinct scales, each one built and written to disk."""
+        await self._load_test("POST", "/generate_cube", lambda index: {
+            "asset_write_location": self._temp_dir.name,
+            "asset_name": f"cube_{index}",
+            "cube_scale": self._scale_offset + index,
+        })
+
+    async def benchmark_generate_cube_cached(self):
+        """Generates the same cube over and over, served from the result cache after the first request."""
+        await self._load_test("POST", "/generate_cube", lambda index: {
+            "asset_write_location": self._temp_dir.name,
+            "asset_name": f"cube_{index}",
+            "cube_scale": 100.0,
+        })
+
+    async def benchmark_generate_cube_stream(self):
+        """Streams cubes of distinct scales back without writing to disk."""
+        await self._load_test("POST", "/generate_cube/stream?compression=identity", lambda index: {
+            "cube_scale": self._scale_offset + index + 0.5,
+        })
+
+    async def benchmark_job_stats(self):
+        """Queries the job statistics, the overhead of the HTTP stack alone."""
+        await self._load_test("GET", "/jobs", lambda index: None)
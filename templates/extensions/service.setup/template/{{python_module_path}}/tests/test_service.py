@@ -37,3 +37,255 @@ class Test(omni.kit.test.AsyncTestCaseFailOnLogError):
         # This step assumes that the route '/generate_cube' should be one of the registered routes
         routes = [route for route in router.routes if route.path == "/generate_cube"]
         self.assertTrue(len(routes) > 0, "The generate_cube endpoint should be registered in the router")
+
+    # Test that the job endpoints are registered next to generate_cube
+    async def test_job_routes(self):
+        paths = {route.path for route in router.routes}
+        for path in ("/jobs/generate_cube", "/jobs", "/jobs/{job_id}", "/jobs/{job_id}/result"):
+            self.assertIn(path, paths, f"The {path} endpoint should be registered in the router")
+
+    # Test that concurrent jobs build their cubes on separate stages
+    async def test_concurrent_cube_jobs(self):
+        import tempfile
+        from pathlib import Path
+        from pxr import Usd, UsdGeom
+        from {{ python_module }}.jobs import get_job_queue
+        from {{ python_module }}.service import CubeDataModel, _write_cube
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            scales = [10.0, 20.0, 30.0, 40.0]
+            jobs = [
+                get_job_queue().submit(
+                    "generate_cube",
+                    lambda data=CubeDataModel(asset_write_location=temp_dir, asset_name=f"cube_{index}", cube_scale=scale):
+                        _write_cube(data),
+                )
+                for index, scale in enumerate(scales)
+            ]
+            for job in jobs:
+                await job.wait()
+                self.assertEqual(job.status, "succeeded")
+                self.assertIsNotNone(job.run_seconds)
+
+            for index, scale in enumerate(scales):
+                stage = Usd.Stage.Open(str(Path(temp_dir) / f"cube_{index}.usda"))
+                self.assertEqual(UsdGeom.Cube(stage.GetPrimAtPath("/World/Cube")).GetSizeAttr().Get(), scale)
+                stage = None
+
+        stats = get_job_queue().stats()
+        self.assertGreaterEqual(stats["succeeded"], len(scales))
+        self.assertEqual(stats["queue_depth"], 0)
+
+    # Test that a streamed export decompresses back to the generated layer
+    async def test_stream_export(self):
+        import gzip
+        from pxr import Sdf
+        from {{ python_module }}.export import stream_chunks
+        from {{ python_module }}.service import CubeDataModel, _serialize_cube
+
+        data = _serialize_cube(CubeDataModel(cube_scale=25.0), "usda")
+        streamed = b"".join(stream_chunks(data, "gzip", 128))
+        self.assertEqual(gzip.decompress(streamed), data)
+
+        layer = Sdf.Layer.CreateAnonymous(".usda")
+        self.assertTrue(layer.ImportFromString(data.decode("utf-8")))
+        self.assertEqual(layer.GetAttributeAtPath("/World/Cube.size").default, 25.0)
+
+        self.assertTrue(_serialize_cube(CubeDataModel(), "usdc").startswith(b"PXR-USDC"))
+
+    # Test that streamed responses are validated per content encoding
+    async def test_stream_etag(self):
+        from starlette.requests import Request
+        from {{ python_module }}.service import CubeDataModel, generate_cube_stream
+
+        def request(*headers):
+            return Request({"type": "http", "method": "POST", "headers": [(k.encode(), v.encode()) for k, v in headers]})
+
+        cube = CubeDataModel(cube_scale=31.0)
+        gzipped = await generate_cube_stream(cube, request(("accept-encoding", "gzip")), file_format="usda", compression="")
+        identity = await generate_cube_stream(cube, request(), file_format="usda", compression="identity")
+        self.assertEqual(gzipped.headers["content-encoding"], "gzip")
+        self.assertEqual(gzipped.headers["vary"], "Accept-Encoding")
+        self.assertNotEqual(gzipped.headers["etag"], identity.headers["etag"])
+
+        etag = gzipped.headers["etag"]
+        cached = await generate_cube_stream(
+            cube, request(("accept-encoding", "gzip"), ("if-none-match", etag)), file_format="usda", compression=""
+        )
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.headers["vary"], "Accept-Encoding")
+        # The same validator does not match the identity encoded body.
+        other = await generate_cube_stream(
+            cube, request(("if-none-match", etag)), file_format="usda", compression="identity"
+        )
+        self.assertEqual(other.status_code, 200)
+
+    # Test that a batch writes every cube and lists it in the manifest
+    async def test_cube_batch(self):
+        import tempfile
+        from pathlib import Path
+        from pxr import Sdf
+        from {{ python_module }}.service import CubeBatchDataModel, CubeDataModel, generate_cube_batch
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            batch = CubeBatchDataModel(cubes=[
+                CubeDataModel(asset_write_location=temp_dir, asset_name=f"cube_{index}", cube_scale=index + 1.0)
+                for index in range(100)
+            ])
+            manifest = await generate_cube_batch(batch)
+
+            self.assertEqual(manifest["succeeded"], 100)
+            self.assertEqual([entry["asset_name"] for entry in manifest["assets"]], [f"cube_{index}" for index in range(100)])
+            layer = Sdf.Layer.FindOrOpen(str(Path(temp_dir) / "cube_41.usda"))
+            self.assertEqual(layer.GetAttributeAtPath("/World/Cube.size").default, 42.0)
+            layer = None
+
+            # A cube that cannot be written is reported in its entry, the others are written.
+            blocker = Path(temp_dir) / "blocker"
+            blocker.write_bytes(b"")
+            manifest = await generate_cube_batch(CubeBatchDataModel(cubes=[
+                CubeDataModel(asset_write_location=str(blocker), asset_name="blocked"),
+                CubeDataModel(asset_write_location=temp_dir, asset_name="written"),
+            ]))
+            self.assertEqual((manifest["succeeded"], manifest["failed"]), (1, 1))
+            self.assertIn("error", manifest["assets"][0])
+            self.assertTrue((Path(temp_dir) / "written.usda").exists())
+
+    # Test that jobs submitted together are all queued or all refused
+    async def test_submit_many(self):
+        import carb.settings
+        from {{ python_module }}.jobs import JOB_QUEUE_SIZE_SETTING, JobQueue, JobQueueFull
+
+        settings = carb.settings.get_settings()
+        queue_size = settings.get_as_int(JOB_QUEUE_SIZE_SETTING)
+        settings.set_int(JOB_QUEUE_SIZE_SETTING, 2)
+        queue = JobQueue()
+        try:
+            with self.assertRaises(JobQueueFull):
+                queue.submit_many("test", [lambda: 1, lambda: 2, lambda: 3])
+            self.assertEqual((queue.stats()["submitted"], queue.stats()["rejected"]), (0, 3))
+            jobs = queue.submit_many("test", [lambda: 1, lambda: 2])
+            self.assertEqual([await job.wait() for job in jobs], [1, 2])
+        finally:
+            queue.shutdown()
+            settings.set_int(JOB_QUEUE_SIZE_SETTING, queue_size)
+
+    # Test that the result cache evicts the least recently used results and keys by content
+    async def test_result_cache(self):
+        import os
+        import tempfile
+        import time
+        from concurrent.futures import ThreadPoolExecutor
+        from {{ python_module }}.result_cache import ResultCache, cache_key
+        from {{ python_module }}.service import CubeDataModel
+
+        first = cache_key("cube", CubeDataModel(asset_name="a", cube_scale=2.0), exclude=("asset_name",))
+        second = cache_key("cube", CubeDataModel(asset_name="b", cube_scale=2.0), exclude=("asset_name",))
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, cache_key("cube", CubeDataModel(cube_scale=3.0), exclude=("asset_name",)))
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir, max_bytes=20, ttl=0)
+            cache.put("a" * 64, b"0123456789")
+            cache.put("b" * 64, b"0123456789")
+            self.assertEqual(cache.get("a" * 64), b"0123456789")
+            cache.put("c" * 64, b"0123456789")
+
+            self.assertIsNone(cache.get("b" * 64))
+            self.assertTrue(cache.contains("a" * 64))
+            stats = cache.stats()
+            self.assertEqual((stats["hits"], stats["misses"], stats["evictions"]), (1, 1, 1))
+
+            # Entries on disk are picked up by a new cache.
+            self.assertEqual(ResultCache(temp_dir, max_bytes=20, ttl=0).get("c" * 64), b"0123456789")
+            self.assertNotIn("directory", stats)
+
+        # Entries expire after their last use, whether cached by this process or found on disk.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir, max_bytes=1000, ttl=60)
+            cache.put("a" * 64, b"0123456789")
+            cache.put("b" * 64, b"0123456789")
+            last_use = time.time() - 120
+            os.utime(os.path.join(temp_dir, "a" * 64), (last_use, last_use))
+            restarted = ResultCache(temp_dir, max_bytes=1000, ttl=60)
+            self.assertIsNone(restarted.get("a" * 64))
+            self.assertEqual(restarted.get("b" * 64), b"0123456789")
+            self.assertEqual(restarted.stats()["expirations"], 1)
+
+        # Workers reading and writing concurrently keep the index within the size limit.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cache = ResultCache(temp_dir, max_bytes=400, ttl=0)
+
+            def churn(worker):
+                for index in range(200):
+                    key = f"{(worker * 7 + index) % 60:064d}"
+                    cache.put(key, b"x" * 10)
+                    cache.get(key)
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                list(executor.map(churn, range(4)))
+            stats = cache.stats()
+            on_disk = [name for name in os.listdir(temp_dir) if len(name) == 64]
+            self.assertLessEqual(stats["bytes"], 400)
+            self.assertEqual(stats["bytes"], stats["entries"] * 10)
+            # A file deleted under a concurrent writer is only noticed by the next read.
+            self.assertLessEqual(len(on_disk), stats["entries"])
+
+    # Test that requests are measured per route and rendered in the Prometheus text format
+    async def test_service_metrics(self):
+        import json
+        import os
+        import tempfile
+        from fastapi import HTTPException
+        from fastapi.responses import Response, StreamingResponse
+        from starlette.requests import ClientDisconnect, Request
+        from {{ python_module }}.metrics import MetricsRoute, ServiceMetrics, SpanWriter
+
+        self.assertTrue(all(isinstance(route, MetricsRoute) for route in router.routes))
+        self.assertIn("/metrics", {route.path for route in router.routes})
+
+        async def succeed(request):
+            return Response(status_code=200)
+
+        async def fail(request):
+            raise HTTPException(status_code=503, detail="Job queue is full")
+
+        metrics = ServiceMetrics()
+        parent = "00-" + "a" * 32 + "-" + "b" * 16 + "-01"
+        request = Request({"type": "http", "method": "POST", "headers": [(b"traceparent", parent.encode())]})
+        response = await metrics.track(request, "/generate_cube", succeed)
+        self.assertTrue(response.headers["traceparent"].startswith("00-" + "a" * 32 + "-"))
+        with self.assertRaises(HTTPException):
+            await metrics.track(Request({"type": "http", "method": "POST", "headers": []}), "/generate_cube", fail)
+
+        # A client going away before the stream is iterated still ends its request.
+        async def chunks():
+            yield b"never sent"
+
+        async def stream(request):
+            return StreamingResponse(chunks())
+
+        async def disconnected(message):
+            raise OSError("Connection reset by peer")
+
+        scope = {"type": "http", "method": "GET", "headers": [], "asgi": {"spec_version": "2.4"}}
+        response = await metrics.track(Request(scope), "/generate_cube_stream", stream)
+        with self.assertRaises(ClientDisconnect):
+            await response(scope, None, disconnected)
+
+        text = metrics.render()
+        self.assertIn('http_requests_total{method="POST",route="/generate_cube",status="200"} 1', text)
+        self.assertIn('http_request_errors_total{method="POST",route="/generate_cube",status="503"} 1', text)
+        self.assertIn('http_request_duration_seconds_count{method="POST",route="/generate_cube"} 2', text)
+        self.assertIn('http_requests_total{method="GET",route="/generate_cube_stream",status="499"} 1', text)
+        self.assertIn("http_requests_in_flight 0", text)
+        self.assertIn("service_jobs_queue_depth ", text)
+
+        # Spans are written in order off the request path.
+        with tempfile.TemporaryDirectory() as temp_dir:
+            writer = SpanWriter(os.path.join(temp_dir, "spans", "trace.jsonl"))
+            for index in range(100):
+                writer.write({"span_id": index})
+            writer.close()
+            with open(writer.path, encoding="utf-8") as trace:
+                self.assertEqual([json.loads(line)["span_id"] for line in trace], list(range(100)))
@@ -14,3 +14,4 @@
 # limitations under the License.
 
 from .extension import *
+from .payload_loading import LoadOptions
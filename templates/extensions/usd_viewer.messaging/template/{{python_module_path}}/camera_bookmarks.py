@@ -0,0 +1,177 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import omni.kit.app
+from pxr import Gf, Sdf, Usd
+
+# Slot captured when a stage is opened, restored by `resetStage`.
+DEFAULT_SLOT = "default"
+
+# Value types interpolated during a transition, the others are set at its end.
+_LERP_TYPES = (
+    float,
+    Gf.Vec2d, Gf.Vec2f, Gf.Vec3d, Gf.Vec3f, Gf.Vec4d, Gf.Vec4f,
+    Gf.Matrix3d, Gf.Matrix4d,
+)
+_SLERP_TYPES = (Gf.Quatd, Gf.Quatf)
+# Prefix of the Euler rotation ops, in degrees, interpolated along the shortest angle.
+_ROTATE_OP_PREFIX = "xformOp:rotate"
+
+
+def _shortest_angle(start: float, end: float) -> float:
+    """The rotation in degrees, within [-180, 180), that brings `start` to `end`."""
+    return (end - start + 180.0) % 360.0 - 180.0
+
+
+class CameraState:
+    """Values of the attributes of a camera prim, with what is needed to author them at the Sdf level."""
+    def __init__(self, values: Dict[str, Tuple[Sdf.ValueTypeName, Sdf.Variability, Any]]):
+        self.values = values
+
+    @classmethod
+    def capture(cls, prim: Usd.Prim) -> "CameraState":
+        """Captures the current value of every attribute of `prim` that has one."""
+        values = {}
+        for attr in prim.GetAttributes():
+            value = attr.Get()
+            if value is not None:
+                values[attr.GetName()] = (attr.GetTypeName(), attr.GetVariability(), value)
+        return cls(values)
+
+    def interpolate(self, target: "CameraState", t: float) -> "CameraState":
+        """
+        State `t` of the way from this state to `target`. Values that cannot
+        be interpolated keep their current value until `t` reaches 1. Euler
+        rotations turn by the shortest angle on each axis, rather than the
+        long way round when crossing 180 degrees.
+        """
+        values = {}
+        for name, (type_name, variability, end) in target.values.items():
+            start = self.values.get(name, (None, None, None))[2]
+            if t >= 1.0 or start is None:
+                value = end
+            elif type(start) is not type(end):
+                value = start
+            elif isinstance(end, _SLERP_TYPES):
+                value = Gf.Slerp(t, start, end)
+            elif name.startswith(_ROTATE_OP_PREFIX) and isinstance(end, float):
+                value = start + _shortest_angle(start, end) * t
+            elif name.startswith(_ROTATE_OP_PREFIX) and isinstance(end, (Gf.Vec3d, Gf.Vec3f)):
+                value = type(end)(*(a + _shortest_angle(a, b) * t for a, b in zip(start, end)))
+            elif isinstance(end, _LERP_TYPES):
+                value = start + (end - start) * t
+            else:
+                value = start
+            values[name] = (type_name, variability, value)
+        return CameraState(values)
+
+
+def author_camera_state(stage: Usd.Stage, camera_path: str, state: CameraState) -> int:
+    """
+    Authors `state` on the camera at `camera_path` in the session layer.
+
+    The camera lives on the session layer, which has a stronger opinion than
+    the root layer, so it is targeted explicitly. Attributes already at their
+    value are left out, the others are written at the Sdf level within a
+    single change block, so the camera is recomposed once rather than once
+    per attribute. Usd is not read within the block, where it may not be
+    up to date.
+
+    Returns:
+        The number of attributes written.
+    """
+    prim = stage.GetPrimAtPath(camera_path)
+    if not prim:
+        raise ValueError(f"No camera at {camera_path}")
+    changes = []
+    for name, (type_name, variability, value) in state.values.items():
+        attr = prim.GetAttribute(name)
+        if not attr or attr.Get() != value:
+            changes.append((name, type_name, variability, value))
+    if not changes:
+        return 0
+
+    layer = stage.GetSessionLayer()
+    path = Sdf.Path(camera_path)
+    with Sdf.ChangeBlock():
+        prim_spec = layer.GetPrimAtPath(path) or Sdf.CreatePrimInLayer(layer, path)
+        for name, type_name, variability, value in changes:
+            spec = prim_spec.attributes.get(name)
+            if spec is None:
+                spec = Sdf.AttributeSpec(prim_spec, name, type_name, variability)
+            spec.default = value
+    return len(changes)
+
+
+def smoothstep(t: float) -> float:
+    """Eases a transition in and out."""
+    t = min(max(t, 0.0), 1.0)
+    return t * t * (3.0 - 2.0 * t)
+
+
+class CameraBookmarks:
+    """
+    Named camera states of the open stage, least recently saved first.
+
+    Slots hold values only, restoring one applies it to the active camera.
+    When more than `limit` slots are saved, the oldest is dropped, the
+    default slot excepted.
+    """
+    def __init__(self, limit: int = 0):
+        self.limit = limit
+        self._slots: "OrderedDict[str, CameraState]" = OrderedDict()
+
+    def save(self, name: str, state: CameraState) -> None:
+        """Saves `state` in slot `name`, replacing what it held."""
+        self._slots.pop(name, None)
+        self._slots[name] = state
+        while self.limit > 0 and len(self._slots) > self.limit:
+            oldest = next((slot for slot in self._slots if slot != DEFAULT_SLOT), None)
+            if oldest is None:
+                break
+            del self._slots[oldest]
+
+    def get(self, name: str) -> Optional[CameraState]:
+        """The state saved in slot `name`, if any."""
+        return self._slots.get(name)
+
+    def delete(self, name: str) -> bool:
+        """Deletes slot `name`. Returns whether it existed."""
+        return self._slots.pop(name, None) is not None
+
+    def names(self) -> List[str]:
+        """Names of the saved slots."""
+        return list(self._slots)
+
+    def clear(self) -> None:
+        """Deletes every slot."""
+        self._slots.clear()
+
+    async def transition(self, stage: Usd.Stage, camera_path: str, target: CameraState, duration: float) -> None:
+        """
+        Moves the camera at `camera_path` to `target` over `duration` seconds,
+        authoring one interpolated state per frame. A duration of 0 applies
+        `target` at once.
+        """
+        prim = stage.GetPrimAtPath(camera_path)
+        if not prim:
+            raise ValueError(f"No camera at {camera_path}")
+        if duration > 0:
+            start_state = CameraState.capture(prim)
+            start = time.monotonic()
+            app = omni.kit.app.get_app()
+            while (elapsed := time.monotonic() - start) < duration:
+                author_camera_state(stage, camera_path, start_state.interpolate(target, smoothstep(elapsed / duration)))
+                await app.next_update_async()
+        author_camera_state(stage, camera_path, target)
@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pxr import Sdf, Usd
+
+
+class ChildListing:
+    """The filtered children of a prim and the client infos built for them so far."""
+    __slots__ = ("children", "infos")
+
+    def __init__(self, children: List[Usd.Prim]):
+        self.children: List[Usd.Prim] = children
+        # Infos are built lazily, only for the pages a client has asked for.
+        self.infos: List[Optional[dict]] = [None] * len(children)
+
+
+class ChildrenCache:
+    """
+    Caches the child listings served to `getChildrenRequest`, keyed by prim
+    path and the set of filters of the request.
+
+    The cache does not watch the stage itself, the owner is expected to call
+    `invalidate` with the resynced paths of `Usd.Notice.ObjectsChanged` and
+    `clear` whenever a different stage is opened.
+    """
+    def __init__(self):
+        self._listings: Dict[Sdf.Path, Dict[Optional[Tuple[str, ...]], ChildListing]] = {}
+        self._hits: int = 0
+        self._misses: int = 0
+        self._invalidations: int = 0
+        # Bumped on every invalidation, lets listings built over several
+        # frames detect that the stage changed in the meantime.
+        self._generation: int = 0
+
+    @property
+    def generation(self) -> int:
+        """Counter bumped every time listings are invalidated or cleared."""
+        return self._generation
+
+    def get(self, prim_path: Sdf.Path, filter_key: Optional[Tuple[str, ...]]) -> Optional[ChildListing]:
+        """Returns the cached listing of `prim_path` for the given filters, if any."""
+        listing = self._listings.get(prim_path, {}).get(filter_key)
+        if listing is None:
+            self._misses += 1
+        else:
+            self._hits += 1
+        return listing
+
+    def put(self, prim_path: Sdf.Path, filter_key: Optional[Tuple[str, ...]], listing: ChildListing) -> None:
+        """Stores the listing of `prim_path` for the given filters."""
+        self._listings.setdefault(prim_path, {})[filter_key] = listing
+
+    def invalidate(self, resynced_paths: Iterable[Sdf.Path]) -> None:
+        """
+        Drops every listing affected by the given resynced paths.
+
+        A resync of a prim changes the listing of its parent (the prim was
+        added, removed or changed type), the has-children flag stored in the
+        listing of its grandparent and every listing within its own subtree.
+        """
+        prim_paths = [path for path in resynced_paths if path.IsAbsoluteRootOrPrimPath()]
+        if not prim_paths:
+            return
+        self._generation += 1
+
+        stale = set()
+        for path in Sdf.Path.RemoveDescendentPaths(prim_paths):
+            parent = path.GetParentPath()
+            stale.add(parent)
+            stale.add(parent.GetParentPath())
+            stale.update(cached for cached in self._listings if cached.HasPrefix(path))
+
+        for path in stale:
+            if self._listings.pop(path, None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        """Drops all listings, used when a different stage is opened."""
+        self._generation += 1
+        self._listings.clear()
+
+    @property
+    def stats(self) -> dict:
+        """Hit, miss and invalidation counters of the cache."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "invalidations": self._invalidations,
+            "entries": sum(len(listings) for listings in self._listings.values()),
+        }
@@ -0,0 +1,142 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import base64
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import carb.dictionary
+
+# Encodings a client can ask responses to be sent with.
+ENCODINGS = ("json", "compact")
+
+
+def as_list(value) -> list:
+    """Converts a payload value that may be a `carb.dictionary.Item` to a list."""
+    if value is None:
+        return []
+    if isinstance(value, carb.dictionary.Item):
+        value = value.get_dict()
+    return list(value)
+
+
+def encode_paths(paths: Iterable[str]) -> dict:
+    """
+    Front codes prim paths: each one is sent as the length of the prefix it
+    shares with the previous one and the rest of it. The paths keep their
+    order, `decode_paths` returns them as given.
+
+    Sibling prims share most of their path, so large path lists in traversal
+    or selection order shrink to little more than the prim names.
+
+    Returns:
+        A dict with the parallel `prefix_lengths` and `suffixes` lists.
+    """
+    prefix_lengths: List[int] = []
+    suffixes: List[str] = []
+    previous = ""
+    for path in paths:
+        length = 0
+        limit = min(len(previous), len(path))
+        while length < limit and previous[length] == path[length]:
+            length += 1
+        prefix_lengths.append(length)
+        suffixes.append(path[length:])
+        previous = path
+    return {"prefix_lengths": prefix_lengths, "suffixes": suffixes}
+
+
+def decode_paths(encoded: dict) -> List[str]:
+    """
+    Decodes prim paths front coded by `encode_paths`.
+
+    Raises:
+        ValueError: If the lists differ in length or a prefix length is out of range.
+    """
+    prefix_lengths = list(encoded.get("prefix_lengths", []))
+    suffixes = list(encoded.get("suffixes", []))
+    if len(prefix_lengths) != len(suffixes):
+        raise ValueError("prefix_lengths and suffixes differ in length")
+    paths: List[str] = []
+    previous = ""
+    for length, suffix in zip(prefix_lengths, suffixes):
+        length = int(length)
+        if not 0 <= length <= len(previous):
+            raise ValueError(f"Prefix length {length} out of range")
+        previous = previous[:length] + str(suffix)
+        paths.append(previous)
+    return paths
+
+
+def is_encoded_paths(value) -> bool:
+    """Whether a payload value holds paths encoded by `encode_paths` rather than a list of paths."""
+    return isinstance(value, dict) and "prefix_lengths" in value and "suffixes" in value
+
+
+class StringTable:
+    """Strings shared by the entries of a payload, each sent once and referenced by index."""
+    def __init__(self):
+        self.strings: List[str] = []
+        self._indices: Dict[str, int] = {}
+
+    def index(self, value: str) -> int:
+        """Returns the index of `value`, adding it to the table if needed."""
+        index = self._indices.get(value)
+        if index is None:
+            index = self._indices[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+
+def pack_flags(flags: Sequence[bool]) -> str:
+    """Packs booleans into a base64 bitmap, flag `i` being bit `i % 8` of byte `i // 8`."""
+    packed = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            packed[i >> 3] |= 1 << (i & 7)
+    return base64.b64encode(bytes(packed)).decode("ascii")
+
+
+def unpack_flags(packed: str, count: int) -> List[bool]:
+    """Unpacks `count` booleans packed by `pack_flags`."""
+    data = base64.b64decode(packed)
+    return [bool(data[i >> 3] & (1 << (i & 7))) for i in range(count)]
+
+
+def encode_children(payload: dict, strings: Optional[StringTable] = None) -> dict:
+    """
+    Compacts a `getChildrenResponse` payload.
+
+    Every child is a direct child of `prim_path`, so its path is not sent:
+    the list of `{name, path, children}` entries is replaced by the `names`
+    of the children and a `child_flags` bitmap, see `pack_flags`, of the
+    children that have children. The path of a child is the `prefix` joined
+    with its name. With a `strings` table, names are sent as indices in it.
+    """
+    children = payload["children"]
+    encoded = {key: value for key, value in payload.items() if key != "children"}
+    names = [child["name"] for child in children]
+    encoded["encoding"] = "compact"
+    encoded["prefix"] = payload["prim_path"].rstrip("/") + "/"
+    encoded["names"] = [strings.index(name) for name in names] if strings is not None else names
+    encoded["child_flags"] = pack_flags(["children" in child for child in children])
+    return encoded
+
+
+def decode_children(encoded: dict, strings: Optional[List[str]] = None) -> List[dict]:
+    """Rebuilds the children entries of a payload compacted by `encode_children`."""
+    names = [strings[index] for index in encoded["names"]] if strings is not None else list(encoded["names"])
+    flags = unpack_flags(encoded["child_flags"], len(names))
+    children = []
+    for name, has_children in zip(names, flags):
+        child = {"name": name, "path": encoded["prefix"] + name}
+        if has_children:
+            child["children"] = []
+        children.append(child)
+    return children
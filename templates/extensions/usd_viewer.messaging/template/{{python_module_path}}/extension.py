@@ -8,6 +8,8 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 
+from .instrumentation import MetricsReporter
+from .sessions import get_sessions
 from .stage_loading import LoadingManager
 from .stage_management import StageManager
 import omni.ext
@@ -25,6 +27,7 @@ class Extension(omni.ext.IExt):
         # Internal messaging state
         self._loading_manager: LoadingManager = LoadingManager()
         self._stage_manager: StageManager = StageManager()
+        self._metrics_reporter: MetricsReporter = MetricsReporter()
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated. It is used to
@@ -36,3 +39,7 @@ class Extension(omni.ext.IExt):
         if self._stage_manager:
             self._stage_manager.on_shutdown()
             self._stage_manager = None
+        if self._metrics_reporter:
+            self._metrics_reporter.on_shutdown()
+            self._metrics_reporter = None
+        get_sessions().clear()
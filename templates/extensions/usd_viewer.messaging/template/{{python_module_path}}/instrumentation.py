@@ -0,0 +1,259 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import json
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+import carb
+import carb.events
+import carb.settings
+import omni.kit.app
+import omni.kit.livestream.messaging as messaging
+from carb.eventdispatcher import get_eventdispatcher
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+METRICS_ENABLED_SETTING = SETTINGS_PATH + "metrics_enabled"
+METRICS_WINDOW_SETTING = SETTINGS_PATH + "metrics_window"
+METRICS_LOG_INTERVAL_SETTING = SETTINGS_PATH + "metrics_log_interval"
+
+# Samples kept per series, bounds memory when messages arrive faster than the window drains.
+MAX_SAMPLES = 10000
+# Payloads of an event type are serialized to measure their size once every
+# this many messages, payloads of several megabytes are not serialized twice
+# each time they are sent.
+PAYLOAD_SIZE_SAMPLE_INTERVAL = 16
+
+
+class _RollingSeries:
+    """Samples of the last `window` seconds, summarized into percentiles on demand."""
+    def __init__(self):
+        self._samples: Deque[Tuple[float, float]] = deque(maxlen=MAX_SAMPLES)
+
+    def add(self, now: float, value: float) -> None:
+        self._samples.append((now, value))
+
+    def prune(self, oldest: float) -> None:
+        while self._samples and self._samples[0][0] < oldest:
+            self._samples.popleft()
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def summary(self) -> dict:
+        values = sorted(value for _, value in self._samples)
+        if not values:
+            return {"count": 0}
+        return {
+            "count": len(values),
+            "p50": values[len(values) // 2],
+            "p95": values[min(int(len(values) * 0.95), len(values) - 1)],
+            "max": values[-1],
+            "total": sum(values),
+        }
+
+
+class _RateCounter:
+    """Number of events of the last `window` seconds, counted per one second bucket."""
+    def __init__(self):
+        self._buckets: Deque[List[float]] = deque()
+
+    def add(self, now: float) -> None:
+        second = float(int(now))
+        if self._buckets and self._buckets[-1][0] == second:
+            self._buckets[-1][1] += 1
+        else:
+            self._buckets.append([second, 1])
+
+    def prune(self, oldest: float) -> None:
+        # Buckets are only dropped once they are entirely outside of the window.
+        while self._buckets and self._buckets[0][0] + 1.0 <= oldest:
+            self._buckets.popleft()
+
+    def __len__(self) -> int:
+        return int(sum(count for _, count in self._buckets))
+
+
+class _EventMetrics:
+    """Rolling metrics of one event type."""
+    def __init__(self, direction: str):
+        self.direction = direction
+        self.total_count: int = 0
+        self.handler_ms = _RollingSeries()
+        self.queue_delay_ms = _RollingSeries()
+        self.payload_bytes = _RollingSeries()
+        # Arrivals over the window give the rate, whatever the number of samples kept.
+        self.arrivals = _RateCounter()
+
+
+class MessageMetrics:
+    """
+    Collects handler wall time, queue delay, payload size and rate of the
+    messages exchanged with streaming clients, over a rolling window of
+    `metrics_window` seconds.
+
+    Incoming handlers are wrapped with `instrument` and outgoing messages
+    sent through `send_message`. Clients that add a `sent_at` timestamp, in
+    milliseconds since the epoch, to their requests get their queue delay
+    measured. Payload sizes are sampled, one message out of
+    `PAYLOAD_SIZE_SAMPLE_INTERVAL` of each event type is serialized to be
+    measured, starting with the first one.
+    """
+    def __init__(self):
+        self._events: Dict[str, _EventMetrics] = {}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether messages are measured, read from the `metrics_enabled` setting."""
+        return carb.settings.get_settings().get_as_bool(METRICS_ENABLED_SETTING)
+
+    @property
+    def window(self) -> float:
+        """Length of the rolling window in seconds."""
+        window = carb.settings.get_settings().get_as_float(METRICS_WINDOW_SETTING)
+        return window if window > 0 else 60.0
+
+    def record(
+        self,
+        event_type: str,
+        direction: str,
+        payload: Optional[dict],
+        handler_ms: Optional[float] = None,
+    ) -> None:
+        """Records one message of `event_type`, `direction` being `incoming` or `outgoing`."""
+        now = time.monotonic()
+        metrics = self._events.get(event_type)
+        if metrics is None:
+            metrics = self._events[event_type] = _EventMetrics(direction)
+        metrics.total_count += 1
+        metrics.arrivals.add(now)
+        if handler_ms is not None:
+            metrics.handler_ms.add(now, handler_ms)
+        if payload:
+            sent_at = payload.get("sent_at")
+            if isinstance(sent_at, (int, float)):
+                metrics.queue_delay_ms.add(now, max(time.time() * 1000.0 - sent_at, 0.0))
+            if metrics.total_count % PAYLOAD_SIZE_SAMPLE_INTERVAL == 1:
+                metrics.payload_bytes.add(now, float(self._payload_size(payload)))
+
+    def instrument(self, event_type: str, handler: Callable[[carb.events.IEvent], None]) -> Callable:
+        """Wraps an incoming event handler so that its calls are recorded."""
+        def on_event(event: carb.events.IEvent) -> None:
+            if not self.enabled:
+                handler(event)
+                return
+            start = time.perf_counter()
+            try:
+                handler(event)
+            finally:
+                handler_ms = (time.perf_counter() - start) * 1000.0
+                self.record(event_type, "incoming", dict(event.payload) if event.payload else None, handler_ms)
+        return on_event
+
+    def snapshot(self) -> dict:
+        """Summaries of every event type over the rolling window."""
+        window = self.window
+        oldest = time.monotonic() - window
+        events = {}
+        for event_type, metrics in self._events.items():
+            for series in (metrics.handler_ms, metrics.queue_delay_ms, metrics.payload_bytes, metrics.arrivals):
+                series.prune(oldest)
+            events[event_type] = {
+                "direction": metrics.direction,
+                "total_count": metrics.total_count,
+                "rate": len(metrics.arrivals) / window,
+                "handler_ms": metrics.handler_ms.summary(),
+                "queue_delay_ms": metrics.queue_delay_ms.summary(),
+                "payload_bytes": metrics.payload_bytes.summary(),
+            }
+        return {"window": window, "events": events}
+
+    def clear(self) -> None:
+        """Drops every recorded sample."""
+        self._events.clear()
+
+    @staticmethod
+    def _payload_size(payload: dict) -> int:
+        """Size of the payload once serialized, as sent to the client."""
+        try:
+            return len(json.dumps(payload, default=str, separators=(",", ":")))
+        except (TypeError, ValueError):
+            return 0
+
+
+_metrics = MessageMetrics()
+
+
+def get_message_metrics() -> MessageMetrics:
+    """Returns the metrics shared by every messaging manager."""
+    return _metrics
+
+
+def send_message(event_type: str, payload: dict) -> None:
+    """Sends `event_type` to the client, recording its size and rate."""
+    if _metrics.enabled:
+        _metrics.record(event_type, "outgoing", payload)
+    get_eventdispatcher().dispatch_event(event_type, payload=payload)
+
+
+class MetricsReporter:
+    """Answers `messagingMetricsQuery` and periodically logs the message metrics."""
+    def __init__(self):
+        messaging.register_event_type_to_send("messagingMetricsResponse")
+        omni.kit.app.register_event_alias(
+            carb.events.type_from_string("messagingMetricsResponse"),
+            "messagingMetricsResponse",
+        )
+        omni.kit.app.register_event_alias(
+            carb.events.type_from_string("messagingMetricsQuery"),
+            "messagingMetricsQuery",
+        )
+        self._subscription = get_eventdispatcher().observe_event(
+            observer_name="MetricsReporter:messagingMetricsQuery",
+            event_name="messagingMetricsQuery",
+            on_event=self._on_metrics_query,
+        )
+        self._log_task: Optional[asyncio.Task] = None
+        interval = carb.settings.get_settings().get_as_float(METRICS_LOG_INTERVAL_SETTING)
+        if interval > 0:
+            self._log_task = asyncio.ensure_future(self._log_periodically(interval))
+
+    def _on_metrics_query(self, event: carb.events.IEvent) -> None:
+        """Handler for `messagingMetricsQuery` event."""
+        send_message("messagingMetricsResponse", get_message_metrics().snapshot())
+
+    async def _log_periodically(self, interval: float) -> None:
+        """Logs the metrics of the busiest event types every `interval` seconds."""
+        while True:
+            await asyncio.sleep(interval)
+            events = get_message_metrics().snapshot()["events"]
+            busiest = sorted(
+                events.items(), key=lambda item: item[1]["handler_ms"].get("total", 0.0), reverse=True
+            )
+            for event_type, metrics in busiest:
+                handler_ms = metrics["handler_ms"]
+                payload_bytes = metrics["payload_bytes"]
+                carb.log_info(
+                    f"Messaging metrics: {event_type} ({metrics['direction']}) "
+                    f"rate={metrics['rate']:.2f}/s "
+                    f"handler_p95={handler_ms.get('p95', 0.0):.3f}ms "
+                    f"handler_max={handler_ms.get('max', 0.0):.3f}ms "
+                    f"bytes_p95={payload_bytes.get('p95', 0):.0f}"
+                )
+
+    def on_shutdown(self) -> None:
+        """Stops logging and answering queries."""
+        if self._log_task is not None:
+            self._log_task.cancel()
+            self._log_task = None
+        self._subscription = None
@@ -0,0 +1,99 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import time
+from typing import List, Optional, Set
+
+import carb
+import omni.client
+from pxr import Sdf
+
+
+def is_remote_url(url: str) -> bool:
+    """Whether `url` is served by a remote storage rather than the local filesystem."""
+    scheme = omni.client.break_url(url).scheme
+    # Single letter schemes are Windows drive letters.
+    return bool(scheme) and scheme != "file" and len(scheme) > 1
+
+
+class LayerPrefetcher:
+    """
+    Fetches the layers a stage is composed from ahead of composition.
+
+    Starting from the root layer, every layer is read through `omni.client`,
+    which warms its local cache, then opened with `Sdf.Layer.FindOrOpen` off
+    the main thread. The sublayers, references and payloads it depends on
+    are queued in turn, so a whole layer tree is fetched by `workers`
+    concurrent fetches instead of one asset at a time during composition.
+
+    The opened layers are kept in `layers` so that composition finds them in
+    the layer registry, the owner releases them once the stage has opened.
+    """
+    def __init__(self, workers: int, max_layers: int = 0):
+        self._workers = max(workers, 1)
+        self._max_layers = max_layers
+        self.layers: List[Sdf.Layer] = []
+        self.bytes_read: int = 0
+
+    async def prefetch(self, root_url: str) -> List[Sdf.Layer]:
+        """Fetches `root_url` and the layers it depends on, returns the opened layers."""
+        start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue()
+        seen: Set[str] = {root_url}
+        queue.put_nowait(root_url)
+
+        async def worker() -> None:
+            while True:
+                url = await queue.get()
+                try:
+                    for dependency in await self._fetch(url):
+                        if dependency in seen:
+                            continue
+                        if self._max_layers > 0 and len(seen) >= self._max_layers:
+                            break
+                        seen.add(dependency)
+                        queue.put_nowait(dependency)
+                except Exception as exc:
+                    carb.log_warn(f"Failed to prefetch layer {url}: {exc}")
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self._workers)]
+        try:
+            await queue.join()
+        finally:
+            for task in workers:
+                task.cancel()
+        carb.log_info(
+            f"Prefetched {len(self.layers)} layers, {self.bytes_read} bytes, of {root_url} "
+            f"in {time.perf_counter() - start:.3f}s"
+        )
+        return self.layers
+
+    async def _fetch(self, url: str) -> List[str]:
+        """Reads and opens the layer at `url`, returns the absolute URLs of its dependencies."""
+        result, _, content = await omni.client.read_file_async(url)
+        if result != omni.client.Result.OK:
+            carb.log_warn(f"Failed to prefetch layer {url}: {result}")
+            return []
+        self.bytes_read += len(memoryview(content))
+
+        # Parsing is the other half of the cost, it is done on a worker
+        # thread with the content now in the local cache.
+        layer: Optional[Sdf.Layer] = await asyncio.get_event_loop().run_in_executor(None, Sdf.Layer.FindOrOpen, url)
+        if not layer:
+            return []
+        self.layers.append(layer)
+        return [
+            layer.ComputeAbsolutePath(asset_path)
+            for asset_path in layer.GetCompositionAssetDependencies()
+            if asset_path
+        ]
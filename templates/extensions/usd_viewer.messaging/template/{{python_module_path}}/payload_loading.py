@@ -0,0 +1,148 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+from typing import Iterable, List, Optional, Sequence, Set, Tuple
+
+import carb.dictionary
+import omni.usd
+from pxr import Gf, Sdf, Usd, UsdGeom
+
+from .encoding import as_list
+
+
+class LoadOptions:
+    """
+    Which payloads of a stage to load when it is opened.
+
+    By default every payload is loaded. Otherwise the stage is opened with
+    no payload loaded and only the payloads selected by `payloads`, `depth`
+    and `bounds` are loaded once it has opened:
+
+    - `payloads`: prim paths loaded along with every payload below them.
+    - `depth`: payloads on prims at most this many levels below the root are
+      loaded, including nested payloads brought in by loading them.
+    - `bounds`: payloads on prims whose `extentsHint`, in world space,
+      intersect the `(min, max)` box are loaded. Unloaded prims cannot be
+      measured otherwise, so prims without extents hint are left unloaded.
+    """
+    def __init__(
+        self,
+        load_all: bool = True,
+        payloads: Iterable[str] = (),
+        depth: int = 0,
+        bounds: Optional[Tuple[Sequence[float], Sequence[float]]] = None,
+    ):
+        self.payloads: Tuple[str, ...] = tuple(sorted(set(payloads)))
+        self.depth = max(depth, 0)
+        self.bounds = (tuple(bounds[0]), tuple(bounds[1])) if bounds else None
+        # Selecting payloads implies not loading the others.
+        self.load_all = load_all and not (self.payloads or self.depth or self.bounds)
+
+    @classmethod
+    def from_payload(cls, payload: dict) -> "LoadOptions":
+        """
+        Reads the `load_set`, `payloads`, `load_depth` and `load_bounds` keys
+        of an `openStageRequest` payload.
+
+        Raises:
+            ValueError: If any of the keys has an invalid value.
+        """
+        load_set = payload.get("load_set", "all")
+        if load_set not in ("all", "none"):
+            raise ValueError(f"Invalid load_set '{load_set}', expected 'all' or 'none'")
+        payloads = [str(path) for path in as_list(payload.get("payloads"))]
+        for path in payloads:
+            if not Sdf.Path.IsValidPathString(path) or not Sdf.Path(path).IsAbsoluteRootOrPrimPath():
+                raise ValueError(f"Invalid payload prim path '{path}'")
+        bounds = None
+        if payload.get("load_bounds"):
+            load_bounds = payload["load_bounds"]
+            if isinstance(load_bounds, carb.dictionary.Item):
+                load_bounds = load_bounds.get_dict()
+            try:
+                bounds = ([float(v) for v in load_bounds["min"]], [float(v) for v in load_bounds["max"]])
+            except (KeyError, TypeError, ValueError):
+                raise ValueError("Invalid load_bounds, expected {\"min\": [x, y, z], \"max\": [x, y, z]}")
+            if len(bounds[0]) != 3 or len(bounds[1]) != 3:
+                raise ValueError("Invalid load_bounds, expected {\"min\": [x, y, z], \"max\": [x, y, z]}")
+        return cls(load_set == "all", payloads, int(payload.get("load_depth", 0) or 0), bounds)
+
+    @property
+    def initial_load_set(self) -> omni.usd.UsdContextInitialLoadSet:
+        """The load set to open the stage with."""
+        if self.load_all:
+            return omni.usd.UsdContextInitialLoadSet.LOAD_ALL
+        return omni.usd.UsdContextInitialLoadSet.LOAD_NONE
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, LoadOptions):
+            return NotImplemented
+        return (self.load_all, self.payloads, self.depth, self.bounds) == (
+            other.load_all, other.payloads, other.depth, other.bounds)
+
+    def apply(self, stage: Usd.Stage) -> int:
+        """
+        Unloads every payload of `stage` and loads the selected ones.
+
+        Returns:
+            The number of prims that were loaded.
+        """
+        if self.load_all:
+            stage.Load(Sdf.Path.absoluteRootPath)
+            return 1
+
+        # A single Usd.Stage.LoadAndUnload call per level of nested payloads
+        # keeps the number of recompositions low.
+        stage.Unload(Sdf.Path.absoluteRootPath)
+        loaded: Set[Sdf.Path] = set()
+        if self.payloads:
+            paths = [Sdf.Path(path) for path in self.payloads]
+            stage.LoadAndUnload(paths, [], Usd.LoadWithDescendants)
+            loaded.update(paths)
+
+        if self.depth or self.bounds:
+            xform_cache = UsdGeom.XformCache()
+            box = Gf.Range3d(Gf.Vec3d(*self.bounds[0]), Gf.Vec3d(*self.bounds[1])) if self.bounds else None
+            while True:
+                selected = [
+                    prim.GetPath() for prim in self._unloaded_payload_prims(stage)
+                    if prim.GetPath() not in loaded and self._is_selected(prim, xform_cache, box)
+                ]
+                if not selected:
+                    break
+                stage.LoadAndUnload(selected, [], Usd.LoadWithoutDescendants)
+                loaded.update(selected)
+                xform_cache.Clear()
+        return len(loaded)
+
+    def _is_selected(self, prim: Usd.Prim, xform_cache: UsdGeom.XformCache, box: Optional[Gf.Range3d]) -> bool:
+        if self.depth and prim.GetPath().pathElementCount > self.depth:
+            return False
+        if box is not None:
+            # The first two entries of the hint are the extent of the default purpose.
+            hint = UsdGeom.ModelAPI(prim).GetExtentsHint(Usd.TimeCode.Default())
+            if not hint or len(hint) < 2:
+                return False
+            local_box = Gf.BBox3d(Gf.Range3d(Gf.Vec3d(hint[0]), Gf.Vec3d(hint[1])), xform_cache.GetLocalToWorldTransform(prim))
+            prim_box = local_box.ComputeAlignedRange()
+            if prim_box.IsEmpty() or Gf.Range3d.GetIntersection(prim_box, box).IsEmpty():
+                return False
+        return True
+
+    @staticmethod
+    def _unloaded_payload_prims(stage: Usd.Stage) -> List[Usd.Prim]:
+        """The prims that have a payload and are not loaded, the traversal does not enter them."""
+        prims = []
+        prim_range = iter(Usd.PrimRange(stage.GetPseudoRoot(), Usd.PrimAllPrimsPredicate))
+        for prim in prim_range:
+            if prim.HasAuthoredPayloads() and not prim.IsLoaded():
+                prims.append(prim)
+                prim_range.PruneChildren()
+        return prims
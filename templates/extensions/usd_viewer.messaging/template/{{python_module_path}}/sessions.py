@@ -0,0 +1,108 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+from typing import Callable
+
+import carb
+import carb.events
+import carb.settings
+
+from .instrumentation import send_message
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+MAX_CLIENT_SESSIONS_SETTING = SETTINGS_PATH + "max_client_sessions"
+
+# Client of the request being handled. Set for the duration of the handler,
+# and inherited by the tasks and callbacks it schedules.
+_current_client: ContextVar[str] = ContextVar("client_id", default="")
+
+
+class ClientSession:
+    """State kept for one streaming client, identified by the `client_id` of its requests."""
+    def __init__(self, client_id: str):
+        self.client_id = client_id
+        # Encoding of the children responses, set by the client with `setEncodingRequest`.
+        self.encoding: str = "json"
+        self.last_seen: float = time.monotonic()
+
+
+class SessionRegistry:
+    """
+    Sessions of the clients observing this instance.
+
+    Requests without a `client_id` share the anonymous session, which keeps
+    a single client working as it did before sessions existed. Clients do
+    not say when they leave, so at most `max_client_sessions` sessions are
+    kept, the least recently seen being dropped first.
+    """
+    def __init__(self):
+        self._sessions: "OrderedDict[str, ClientSession]" = OrderedDict()
+
+    def get(self, client_id: str) -> ClientSession:
+        """Returns the session of `client_id`, creating it if needed."""
+        session = self._sessions.pop(client_id, None) or ClientSession(client_id)
+        session.last_seen = time.monotonic()
+        self._sessions[client_id] = session
+        limit = carb.settings.get_settings().get_as_int(MAX_CLIENT_SESSIONS_SETTING)
+        while limit > 0 and len(self._sessions) > limit:
+            client, _ = self._sessions.popitem(last=False)
+            carb.log_info(f"Dropping the session of client '{client}', seen least recently")
+        return session
+
+    def current(self) -> ClientSession:
+        """Session of the client whose request is being handled."""
+        return self.get(_current_client.get())
+
+    def bind(self, handler: Callable[[carb.events.IEvent], None]) -> Callable:
+        """Wraps an incoming event handler so that it runs on behalf of the `client_id` of the event."""
+        def on_event(event: carb.events.IEvent) -> None:
+            client_id = str(event.payload.get("client_id", "") or "") if event.payload else ""
+            token = _current_client.set(client_id)
+            try:
+                self.get(client_id)
+                handler(event)
+            finally:
+                _current_client.reset(token)
+        return on_event
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def clear(self) -> None:
+        """Drops every session."""
+        self._sessions.clear()
+
+
+_sessions = SessionRegistry()
+
+
+def get_sessions() -> SessionRegistry:
+    """Returns the sessions shared by every messaging manager."""
+    return _sessions
+
+
+def current_client_id() -> str:
+    """`client_id` of the request being handled, empty for anonymous clients."""
+    return _current_client.get()
+
+
+def send_response(event_type: str, payload: dict) -> None:
+    """
+    Sends the response to a request, tagged with the `client_id` of the
+    request. Messages reach every client, the tag lets the others ignore it.
+    """
+    client_id = _current_client.get()
+    if client_id:
+        payload = dict(payload, client_id=client_id)
+    send_message(event_type, payload)
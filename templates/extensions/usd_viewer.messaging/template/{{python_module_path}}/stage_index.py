@@ -0,0 +1,222 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import fnmatch
+import re
+from typing import Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+from pxr import Sdf, Usd
+
+from .time_slicing import TimeSlicedWork
+
+
+class StageIndex:
+    """
+    Index of the prims of a stage by name, type and path, used to answer
+    prim searches without walking the stage.
+
+    The index is built incrementally, a bounded amount of prims per frame,
+    once a stage is attached with `reset`. The owner keeps it current by
+    calling `on_resynced` with the resynced paths of `Usd.Notice.ObjectsChanged`.
+    """
+    def __init__(self, type_filters: Dict[str, type], is_listed: Callable[[Usd.Prim], bool]):
+        """
+        Args:
+            type_filters: Filter names and the prim types they match, the same
+                names can be used to restrict searches.
+            is_listed: Returns whether a prim is shown to clients. Prims that
+                are not listed are not indexed, nor are their descendants,
+                including the ones resynced later on.
+        """
+        self._type_filters = type_filters
+        self._is_listed = is_listed
+        self._stage: Optional[Usd.Stage] = None
+        self._budget_ms: float = float("inf")
+        self._task: Optional[asyncio.Task] = None
+
+        # Prim paths waiting to be indexed, along with their descendants.
+        self._pending: List[Sdf.Path] = []
+        # path -> (lowercase name, type name, matching filter names)
+        self._entries: Dict[str, Tuple[str, str, Tuple[str, ...]]] = {}
+        # Dicts with `None` values are used as insertion ordered sets.
+        self._children: Dict[str, Dict[str, None]] = {}
+        self._by_name: Dict[str, Dict[str, None]] = {}
+        self._by_type: Dict[str, Dict[str, None]] = {}
+
+    @property
+    def is_ready(self) -> bool:
+        """Whether every prim of the stage has been indexed."""
+        return not self._pending
+
+    @property
+    def prim_count(self) -> int:
+        """Number of prims currently in the index."""
+        return len(self._entries)
+
+    def reset(self, stage: Optional[Usd.Stage], budget_ms: float = float("inf")) -> None:
+        """Clears the index and starts indexing `stage`, spending at most `budget_ms` per frame."""
+        self._cancel()
+        self._stage = stage
+        self._budget_ms = budget_ms
+        self._pending.clear()
+        self._entries.clear()
+        self._children.clear()
+        self._by_name.clear()
+        self._by_type.clear()
+        if stage:
+            self._schedule([Sdf.Path.absoluteRootPath])
+
+    def on_resynced(self, resynced_paths: Iterable[Sdf.Path]) -> None:
+        """Drops the resynced subtrees from the index and schedules them to be indexed again."""
+        if not self._stage:
+            return
+        prim_paths = [path for path in resynced_paths if path.IsAbsoluteRootOrPrimPath()]
+        if not prim_paths:
+            return
+        if Sdf.Path.absoluteRootPath in prim_paths:
+            # The whole stage is indexed again.
+            self.reset(self._stage, self._budget_ms)
+            return
+        prim_paths = Sdf.Path.RemoveDescendentPaths(prim_paths)
+        for path in prim_paths:
+            self._remove_subtree(str(path))
+        self._schedule(prim_paths)
+
+    def search(
+        self, query: str = "", types: Optional[Iterable[str]] = None, root: str = "/", limit: int = 0
+    ) -> Tuple[List[dict], bool]:
+        """
+        Finds indexed prims by name, type and location.
+
+        Args:
+            query: Case insensitive glob pattern matched against prim names,
+                a query without wildcards matches names containing it.
+            types: Filter names or prim type names, prims matching any of them are returned.
+            root: Only prims at or below this path are returned.
+            limit: Maximum number of results, 0 returns every match.
+
+        Returns:
+            The matching prims, in no particular order, and whether the results were truncated by `limit`.
+        """
+        pattern = query.lower()
+        if not pattern:
+            match_name = None
+        elif any(char in pattern for char in "*?["):
+            match_name = re.compile(fnmatch.translate(pattern)).match
+        else:
+            def match_name(name: str) -> bool:
+                return pattern in name
+
+        root = root.rstrip("/")
+        prefix = root + "/"
+
+        types = set(types or [])
+        if types:
+            type_sets = [self._by_type[type_key] for type_key in types if type_key in self._by_type]
+            type_count = sum(len(paths) for paths in type_sets)
+
+        # Walk whichever of the name or type index has fewer candidates.
+        if types and (match_name is None or type_count < len(self._by_name)):
+            candidates = (path for paths in type_sets for path in paths)
+            check_name, check_types = match_name, None
+        else:
+            candidates = (
+                path for name, paths in self._by_name.items() if match_name is None or match_name(name)
+                for path in paths
+            )
+            check_name, check_types = None, types or None
+
+        results = []
+        seen = set()
+        for path in candidates:
+            if root and path != root and not path.startswith(prefix):
+                continue
+            name, type_name, type_keys = self._entries[path]
+            if check_name is not None and not check_name(name):
+                continue
+            if check_types is not None and type_name not in check_types and check_types.isdisjoint(type_keys):
+                continue
+            if path in seen:
+                continue
+            seen.add(path)
+            if limit > 0 and len(results) == limit:
+                return results, True
+            results.append({"name": path.rsplit("/", 1)[1], "path": path, "type": type_name})
+        return results, False
+
+    def shutdown(self) -> None:
+        """Stops indexing and releases the stage."""
+        self.reset(None)
+
+    def _schedule(self, paths: Iterable[Sdf.Path]) -> None:
+        self._pending.extend(paths)
+        if self._task is None or self._task.done():
+            work = TimeSlicedWork(self._index_steps(), self._budget_ms)
+            self._task = asyncio.ensure_future(work.run_remaining(lambda _work: None))
+
+    def _cancel(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _index_steps(self) -> Generator[None, None, None]:
+        """Indexes the pending subtrees depth first, one prim per step."""
+        while self._pending:
+            path = self._pending.pop()
+            key = str(path)
+            # Already indexed, along with its descendants, through a later resync.
+            if key in self._entries:
+                continue
+            prim = self._stage.GetPrimAtPath(path)
+            if not prim:
+                continue
+            if not prim.IsPseudoRoot():
+                # A resynced prim below a prim that is not listed, or not
+                # indexed yet, is left to the walk of its ancestors.
+                parent = key.rsplit("/", 1)[0] or "/"
+                if (parent != "/" and parent not in self._entries) or not self._is_listed(prim):
+                    continue
+                self._add(key, prim)
+            # Reversed so that prims are indexed in stage order.
+            self._pending.extend(reversed([child.GetPath() for child in prim.GetChildren()]))
+            yield None
+
+    def _add(self, key: str, prim: Usd.Prim) -> None:
+        name = prim.GetName().lower()
+        type_name = str(prim.GetTypeName())
+        type_keys = tuple(filter_name for filter_name, schema in self._type_filters.items() if prim.IsA(schema))
+        self._entries[key] = (name, type_name, type_keys)
+        self._children.setdefault(key.rsplit("/", 1)[0] or "/", {})[key] = None
+        self._by_name.setdefault(name, {})[key] = None
+        for type_key in type_keys + (type_name,):
+            self._by_type.setdefault(type_key, {})[key] = None
+
+    def _remove_subtree(self, key: str) -> None:
+        self._discard(self._children, key.rsplit("/", 1)[0] or "/", key)
+        stack = [key]
+        while stack:
+            key = stack.pop()
+            stack.extend(self._children.pop(key, []))
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                continue
+            name, type_name, type_keys = entry
+            self._discard(self._by_name, name, key)
+            for type_key in type_keys + (type_name,):
+                self._discard(self._by_type, type_key, key)
+
+    @staticmethod
+    def _discard(index: Dict[str, Dict[str, None]], index_key: str, path: str) -> None:
+        paths = index.get(index_key)
+        if paths is not None:
+            paths.pop(path, None)
+            if not paths:
+                del index[index_key]
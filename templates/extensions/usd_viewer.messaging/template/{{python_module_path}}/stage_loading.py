@@ -9,10 +9,13 @@
 # its affiliates is strictly prohibited.
 
 import asyncio
+import itertools
 import os
+from typing import Callable, Dict, List, Optional
 
 import carb
 import carb.events
+import carb.settings
 import carb.tokens
 from carb.eventdispatcher import get_eventdispatcher
 
@@ -20,6 +23,52 @@ import omni.client
 import omni.kit.app
 import omni.kit.livestream.messaging as messaging
 import omni.usd
+from pxr import Sdf, Usd
+
+from .encoding import as_list
+from .instrumentation import get_message_metrics, send_message
+from .layer_prefetch import LayerPrefetcher, is_remote_url
+from .payload_loading import LoadOptions
+from .sessions import current_client_id, get_sessions, send_response
+from .stage_pool import StagePool
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+LOAD_TIMEOUT_SETTING = SETTINGS_PATH + "load_timeout"
+PROGRESS_UPDATE_RATE_SETTING = SETTINGS_PATH + "progress_update_rate"
+STAGE_POOL_SIZE_SETTING = SETTINGS_PATH + "stage_pool_size"
+STAGE_POOL_MEMORY_SETTING = SETTINGS_PATH + "stage_pool_memory_mb"
+PREFETCH_WORKERS_SETTING = SETTINGS_PATH + "prefetch_workers"
+PREFETCH_MAX_LAYERS_SETTING = SETTINGS_PATH + "prefetch_max_layers"
+PREFETCH_TIMEOUT_SETTING = SETTINGS_PATH + "prefetch_timeout"
+
+
+class _StageLoadRequest:
+    """One or more `openStageRequest` messages for the same URL, waiting for or going through a load."""
+    def __init__(self, url: str, resolved_url: str, request_id: str, load_options: LoadOptions):
+        # URL as sent by the client, the only one that is sent back to it.
+        self.url = url
+        self.resolved_url = resolved_url
+        self.load_options = load_options
+        self.request_ids: List[str] = [request_id]
+        # `client_id` of each request, empty for anonymous clients.
+        self.client_ids: List[str] = [current_client_id()]
+        # Set when a newer request for another stage supersedes this one.
+        self.cancelled: bool = False
+        # Set once the result of the load has been decided, or the load was
+        # cancelled.
+        self.finished = asyncio.Event()
+        # Result sent to the client, once decided. A request is answered only
+        # once, requests are neither added to nor cancelled after that.
+        self.result: str = ""
+        # Whether the stage was swapped in from the stage pool.
+        self.from_pool: bool = False
+        # Layers fetched ahead of composition, held until the stage has opened.
+        self.prefetched_layers: List[Sdf.Layer] = []
+
+    def add_request(self, request_id: str) -> None:
+        """Adds a request for the same stage, answered along with the others."""
+        self.request_ids.append(request_id)
+        self.client_ids.append(current_client_id())
 
 
 class LoadingManager:
@@ -43,6 +92,29 @@ class LoadingManager:
         # new unsaved stage
         self._persisted_stage: bool = False
         self._is_evaluating_loading_status: bool = False
+        # Set once the stage has opened and the streaming manager is idle.
+        self._load_complete = asyncio.Event()
+
+        # Status bar updates waiting to be forwarded to the client. Only the
+        # latest progress and each distinct activity are kept between flushes.
+        self._pending_progress: Optional[dict] = None
+        self._pending_activities: Dict[str, dict] = {}
+        self._progress_flush_task: Optional[asyncio.Task] = None
+
+        # Stage loads are processed one at a time. A new request replaces the
+        # pending one and cancels the active one.
+        self._active_load: Optional[_StageLoadRequest] = None
+        self._pending_load: Optional[_StageLoadRequest] = None
+        self._load_task: Optional[asyncio.Task] = None
+        self._evaluate_task: Optional[asyncio.Task] = None
+        self._request_ids = itertools.count(1)
+        # Recently opened stages, swapped back in without reading and
+        # composing their layers again.
+        self._stage_pool = StagePool()
+        # Payloads loaded in the current stage, None when they are not known
+        # because the stage was not opened by a client request or payloads
+        # were loaded or unloaded since.
+        self._load_options: Optional[LoadOptions] = None
 
         # -- register outgoing events/messages
         outgoing = [
@@ -50,6 +122,8 @@ class LoadingManager:
             "updateProgressAmount",  # Status bar event denoting progress
             "updateProgressActivity",  # Status bar event denoting activity
             "loadingStateResponse",  # Response to loadingStateQuery
+            "loadPayloadsResponse",  # Response to loadPayloadsRequest
+            "unloadPayloadsResponse",  # Response to unloadPayloadsRequest
         ]
 
         for o in outgoing:
@@ -67,6 +141,8 @@ class LoadingManager:
             # internal event to capture progress activity
             "omni.kit.window.status_bar@activity": self._on_activity,
             "loadingStateQuery": self._on_load_state_query,
+            "loadPayloadsRequest": self._on_load_payloads,  # request to load payloads of the stage
+            "unloadPayloadsRequest": self._on_unload_payloads,  # request to unload payloads of the stage
         }
         ed = get_eventdispatcher()
         for event_type, handler in incoming.items():
@@ -81,7 +157,7 @@ class LoadingManager:
                 ed.observe_event(
                     observer_name=f"LoadingManager:{event_type}",
                     event_name=event_type,
-                    on_event=handler
+                    on_event=get_message_metrics().instrument(event_type, get_sessions().bind(handler))
                 )
             )
         usd_context = omni.usd.get_context()
@@ -113,16 +189,28 @@ class LoadingManager:
             payload = { "loading_state": "busy", "url": self._requested_stage_url }
         elif self._stage_has_opened:
             payload = { "loading_state": "idle", "url": self._requested_stage_url }
+        if self._stage_pool.enabled:
+            payload["stage_pool"] = self._stage_pool.stats
 
-        get_eventdispatcher().dispatch_event("loadingStateResponse", payload=payload)
+        send_response("loadingStateResponse", payload)
 
 
     def _on_open_stage(self, event: carb.events.IEvent) -> None:
         """
         Handler for `openStageRequest` event.
 
-        Starts loading a given URL, will send success if the layer is already
+        Schedules loading a given URL, will send success if the layer is already
         loaded, and an error on any failure.
+
+        Only one stage loads at a time: a request for another URL supersedes
+        the pending request and cancels the one being loaded, both of which
+        get a `cancelled` result. Requests for the URL that is already pending
+        or loading share its result. Every result carries the `request_id` sent
+        by the client, or one generated for it.
+
+        Payloads are all loaded unless the request sets `load_set` to `none`,
+        lists `payloads` to load, or a `load_depth` or `load_bounds` policy,
+        see `LoadOptions`.
         """
 
         if "url" not in event.payload:
@@ -130,60 +218,305 @@ class LoadingManager:
                 f"Unexpected message payload: missing \"url\" key. Payload: '{event.payload}'")
             return
 
-        self._requested_stage_url = event.payload["url"]
+        payload = dict(event.payload)
+        url = payload["url"]
+        request_id = str(payload.get("request_id", "")) or f"openStageRequest-{next(self._request_ids)}"
         carb.log_info(
-            f"Received message to load '{self._requested_stage_url}'"
+            f"Received message to load '{url}'"
         )
+        resolved_url = self._resolve_url(url)
+        try:
+            load_options = LoadOptions.from_payload(payload)
+        except ValueError as error:
+            carb.log_error(f"Invalid openStageRequest for '{url}': {error}")
+            self._send_open_result(_StageLoadRequest(url, resolved_url, request_id, LoadOptions()), "error", str(error))
+            return
+
+        active, pending = self._active_load, self._pending_load
+        if active and active.result:
+            # Answered, the load is only winding down.
+            active = None
+        if (active and not active.cancelled and active.load_options == load_options
+                and omni.client.utils.equal_urls(resolved_url, active.resolved_url)):
+            # Already loading this stage, which makes any pending request stale.
+            active.add_request(request_id)
+            if pending:
+                self._send_open_result(pending, "cancelled", "Superseded by a newer openStageRequest")
+                self._pending_load = None
+            return
+        if (pending and pending.load_options == load_options
+                and omni.client.utils.equal_urls(resolved_url, pending.resolved_url)):
+            pending.add_request(request_id)
+            return
 
-        def process_url(url):
-            # Using a single leading `.` to signify that the path is relative to the ${app} token's parent directory
-            # Because we've moved the samples out of the app directory, we need to check for that here
-            # in the samples extension directory.
-            # If that doesn't exist (using older version of the extension), we fall back to old behavior.
-            if url.startswith(("./", ".\\")):
-                if url.startswith(("./samples", ".\\samples")):
-                    sample_url = carb.tokens.acquire_tokens_interface().resolve(
-                        "${omni.usd_viewer.samples}/" + url[1:].replace("samples", "samples_data")
-                    )
-                    if os.path.exists(sample_url):
-                        return sample_url
-                return carb.tokens.acquire_tokens_interface().resolve(
-                    "${app}/.." + url[1:]
+        if pending:
+            self._send_open_result(pending, "cancelled", "Superseded by a newer openStageRequest")
+        self._pending_load = _StageLoadRequest(url, resolved_url, request_id, load_options)
+        if active:
+            active.cancelled = True
+            active.finished.set()
+
+        if self._load_task is None or self._load_task.done():
+            self._load_task = asyncio.ensure_future(self._process_loads())
+
+    @staticmethod
+    def _resolve_url(url: str) -> str:
+        """Resolves the URL sent by the client to the URL of the stage to open."""
+        # Using a single leading `.` to signify that the path is relative to the ${app} token's parent directory
+        # Because we've moved the samples out of the app directory, we need to check for that here
+        # in the samples extension directory.
+        # If that doesn't exist (using older version of the extension), we fall back to old behavior.
+        if url.startswith(("./", ".\\")):
+            if url.startswith(("./samples", ".\\samples")):
+                sample_url = carb.tokens.acquire_tokens_interface().resolve(
+                    "${omni.usd_viewer.samples}/" + url[1:].replace("samples", "samples_data")
                 )
-            return carb.tokens.acquire_tokens_interface().resolve(url)
+                if os.path.exists(sample_url):
+                    return sample_url
+            return carb.tokens.acquire_tokens_interface().resolve(
+                "${app}/.." + url[1:]
+            )
+        return carb.tokens.acquire_tokens_interface().resolve(url)
+
+    async def _process_loads(self) -> None:
+        """Loads the pending stages one after the other."""
+        while self._pending_load is not None:
+            request, self._pending_load = self._pending_load, None
+            self._active_load = request
+            try:
+                await self._load_stage(request)
+            except Exception as exc:
+                carb.log_error(f'Failed to open stage {request.url}: {exc}')
+                self._send_open_result(request, "error", str(exc))
+                self._reset_state()
+            finally:
+                if self._active_load is request:
+                    self._active_load = None
+
+    def _cancel_evaluation(self) -> None:
+        """Stops waiting for the dependencies of the stage being loaded."""
+        if self._evaluate_task is not None:
+            self._evaluate_task.cancel()
+            self._evaluate_task = None
+        self._is_evaluating_loading_status = False
 
-        # Check to see if we've already loaded the current stage.
-        url = process_url(self._requested_stage_url)
+    async def _load_stage(self, request: _StageLoadRequest) -> None:
+        """Opens the stage of `request` and waits until its result has been sent."""
+        # A previous stage may still be waiting on its dependencies, it is
+        # going away so there is nothing to report for it anymore.
+        self._cancel_evaluation()
+        self._requested_stage_url = request.url
+        url = request.resolved_url
 
+        # Check to see if we've already loaded the current stage.
         stage = omni.usd.get_context().get_stage()
         current_stage = stage.GetRootLayer().identifier if stage else ''
 
         # If we are, we don't need to reload the file, instead we'll just send the success message.
         if omni.client.utils.equal_urls(url, current_stage):
             carb.log_info(f'Client requested to open a stage that is already open: {url}')
-            payload = {"url": self._requested_stage_url, "result": "success", "error": ''}
-            get_eventdispatcher().dispatch_event("openedStageResult", payload=payload)
+            # Unless requested, payloads of a stage opened some other way are left as they are.
+            if request.load_options != (self._load_options or LoadOptions()):
+                request.load_options.apply(stage)
+                self._load_options = request.load_options
+            self._send_open_result(request, "success")
             self._reset_state()
             return
 
-        # Asynchronously load the incoming stage
-        async def open_stage():
-            carb.log_info(f'Opening stage per client request: {url}')
-            usd_context = omni.usd.get_context()
-            if url:
-                result, error = await usd_context.open_stage_async(url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)
-            else:
-                result, error = await usd_context.new_stage_async()
+        settings = carb.settings.get_settings()
+        self._stage_pool.configure(
+            settings.get_as_int(STAGE_POOL_SIZE_SETTING),
+            int(settings.get_as_float(STAGE_POOL_MEMORY_SETTING) * 1024 * 1024),
+        )
+        # The stage being closed is kept in the pool so that going back to it is
+        # cheap. Only stages with every payload loaded are pooled.
+        if stage and current_stage and self._load_options == LoadOptions():
+            await self._stage_pool.put(stage)
 
-            if result is not True:
-                # Send message to client that loading failed.
-                carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
-                payload = {"url": url, "result": "error", "error": error}
-                get_eventdispatcher().dispatch_event("openedStageResult", payload=payload)
-                self._reset_state()
+        usd_context = omni.usd.get_context()
+        load_options = request.load_options
+        pooled_stage = None
+        if url and load_options.load_all and self._stage_pool.enabled:
+            pooled_stage = await self._stage_pool.get(url)
+        if pooled_stage:
+            carb.log_info(f'Swapping in pooled stage per client request: {url}')
+            request.from_pool = True
+            result, error = await usd_context.attach_stage_async(pooled_stage)
+        elif url:
+            await self._prefetch_layers(request)
+            if request.cancelled:
+                self._send_open_result(request, "cancelled", "Superseded by a newer openStageRequest")
                 return
+            carb.log_info(f'Opening stage per client request: {url}')
+            result, error = await usd_context.open_stage_async(url, load_options.initial_load_set)
+            # Composition holds the layers it uses from here on.
+            request.prefetched_layers = []
+        else:
+            carb.log_info('Creating new stage per client request')
+            result, error = await usd_context.new_stage_async()
+
+        if request.cancelled:
+            # The next stage is opened right away, which abandons loading
+            # the dependencies of this one.
+            self._send_open_result(request, "cancelled", "Superseded by a newer openStageRequest")
+            return
+
+        if result is not True:
+            # Send message to client that loading failed.
+            carb.log_warn(f'The file that the client requested failed to load: {url} (error: {error})')
+            self._send_open_result(request, "error", error)
+            self._reset_state()
+            return
+
+        self._load_options = load_options
+        if not load_options.load_all:
+            # Opened without payloads, load the selected ones now that the stage exists.
+            loaded = load_options.apply(usd_context.get_stage())
+            carb.log_info(f'Loaded {loaded} payload prims of {url}')
+
+        if not url:
+            # New stages have no dependencies to wait for.
+            self._send_open_result(request, "success")
+            self._reset_state()
+            return
+
+        if request.from_pool and not self._is_evaluating_loading_status:
+            # The layers of a pooled stage are already loaded, only streaming
+            # is left to wait for.
+            self._persisted_stage = True
+            self._stage_has_opened = True
+            self._update_load_complete()
+            self._evaluate_task = asyncio.ensure_future(self._evaluate_load_status())
+
+        # The result is sent by `_evaluate_load_status` once the stage and
+        # its dependencies have loaded.
+        timeout = settings.get_as_float(LOAD_TIMEOUT_SETTING)
+        try:
+            await asyncio.wait_for(request.finished.wait(), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            pass
+        # Once answered, the stage is pooled when another one replaces it.
+        if request.result:
+            return
+        if request.cancelled:
+            self._send_open_result(request, "cancelled", "Superseded by a newer openStageRequest")
+        elif not request.finished.is_set():
+            # The stage events that complete the load never came.
+            self._cancel_evaluation()
+            carb.log_warn(f'Timed out after {timeout} seconds waiting for stage to load: {url}')
+            self._send_open_result(
+                request,
+                "error",
+                f"Timed out after {timeout} seconds waiting for the stage to load",
+                error_code="timeout",
+            )
+            self._reset_state()
+        else:
+            self._send_open_result(request, "error", "Stopped waiting for the stage to load")
+            self._reset_state()
+
+    async def _prefetch_layers(self, request: _StageLoadRequest) -> None:
+        """
+        Fetches the layers of a remote stage concurrently before it is opened,
+        composition would otherwise fetch them one after the other.
+
+        Local stages are not prefetched, reading them is cheap already.
+        Prefetching stops after `prefetch_timeout` seconds, the layers not
+        fetched by then are left to composition.
+        """
+        settings = carb.settings.get_settings()
+        workers = settings.get_as_int(PREFETCH_WORKERS_SETTING)
+        if workers <= 0 or not is_remote_url(request.resolved_url):
+            return
+        prefetcher = LayerPrefetcher(workers, settings.get_as_int(PREFETCH_MAX_LAYERS_SETTING))
+        timeout = settings.get_as_float(PREFETCH_TIMEOUT_SETTING)
+        try:
+            await asyncio.wait_for(prefetcher.prefetch(request.resolved_url), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            carb.log_warn(
+                f'Prefetched {len(prefetcher.layers)} layers of {request.resolved_url} '
+                f'before timing out, opening it anyway'
+            )
+        request.prefetched_layers = prefetcher.layers
 
-        asyncio.ensure_future(open_stage())
+    def _send_open_result(self, request: Optional[_StageLoadRequest], result: str, error: str = '', **extra) -> None:
+        """
+        Sends `openedStageResult` for `request`, or for a stage that was not
+        opened by a client. A request that has been answered already is not
+        answered again.
+        """
+        if request and request.result:
+            return
+        payload = {
+            "url": request.url if request else '[obfuscated]',
+            "result": result,
+            "error": error,
+            "request_id": request.request_ids[-1] if request else '',
+            "request_ids": list(request.request_ids) if request else [],
+        }
+        if request and any(request.client_ids):
+            # Every client sees the stage change, the requesters are told apart.
+            payload["client_id"] = request.client_ids[-1]
+            payload["client_ids"] = list(request.client_ids)
+        if self._stage_pool.enabled:
+            payload["from_pool"] = bool(request and request.from_pool)
+        payload.update(extra)
+        if request:
+            request.result = result
+            request.finished.set()
+            # From here on, new requests are queued instead of joining or
+            # cancelling this one, even if it is still winding down.
+            if self._active_load is request:
+                self._active_load = None
+        send_message("openedStageResult", payload)
+
+    def _on_load_payloads(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `loadPayloadsRequest` event.
+
+        Loads the payloads of the given `paths`, along with the payloads
+        below them unless `descendants` is false.
+        """
+        payload = dict(event.payload)
+        policy = Usd.LoadWithDescendants if payload.get("descendants", True) else Usd.LoadWithoutDescendants
+        self._change_payloads("loadPayloadsResponse", payload, lambda stage, paths: stage.LoadAndUnload(paths, [], policy))
+
+    def _on_unload_payloads(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `unloadPayloadsRequest` event.
+
+        Unloads the payloads of the given `paths` and the payloads below them.
+        """
+        self._change_payloads(
+            "unloadPayloadsResponse", dict(event.payload), lambda stage, paths: stage.LoadAndUnload([], paths))
+
+    def _change_payloads(
+        self, response: str, payload: dict, change: Callable[[Usd.Stage, List[Sdf.Path]], None]
+    ) -> None:
+        """Applies `change` to the stage and the prim paths of `payload`, then sends `response`."""
+        paths = [str(path) for path in as_list(payload.get("paths"))]
+        stage = omni.usd.get_context().get_stage()
+        error = ""
+        if not stage:
+            error = "No stage is open"
+        else:
+            invalid = [
+                path for path in paths
+                if not Sdf.Path.IsValidPathString(path) or not Sdf.Path(path).IsAbsoluteRootOrPrimPath()
+            ]
+            if invalid:
+                error = f"Invalid prim paths: {invalid}"
+        if error:
+            carb.log_warn(f"Failed to change the loaded payloads: {error}")
+        elif paths:
+            change(stage, [Sdf.Path(path) for path in paths])
+            # The payloads of the stage no longer match the options it was opened with.
+            self._load_options = None
+
+        response_payload = {"paths": paths, "result": "error" if error else "success", "error": error}
+        if "request_id" in payload:
+            response_payload["request_id"] = payload["request_id"]
+        send_response(response, response_payload)
 
     def _on_stage_event_opening(self, event) -> None:
         """Manage extension state via the stage event stream.
@@ -200,6 +533,9 @@ class LoadingManager:
         else:
             self._opened_stage_url = ''
         self._persisted_stage = True if self._opened_stage_url else False
+        if self._active_load is None:
+            # Not opened by a client, its payloads are unknown.
+            self._load_options = None
         return
 
     def _on_stage_event_assets_loaded(self, event) -> None:
@@ -215,9 +551,11 @@ class LoadingManager:
             return
         self._stage_is_opening = False
         self._stage_has_opened = True
+        self._update_load_complete()
 
         # Async call to evaluate opened state
-        asyncio.ensure_future(self._evaluate_load_status())
+        if not self._is_evaluating_loading_status:
+            self._evaluate_task = asyncio.ensure_future(self._evaluate_load_status())
         return
 
     def _on_rxt_streaming_event(self, event) -> None:
@@ -229,34 +567,66 @@ class LoadingManager:
             https://docs.omniverse.nvidia.com/kit/docs/kit-manual/105.0/carb.events/carb.events.IEvent.html
         """
         self._streaming_manager_is_busy = event.payload['isBusy']
+        self._update_load_complete()
+
+    def _update_load_complete(self) -> None:
+        """Signals load completion once the stage has opened and the streaming manager is idle."""
+        if self._stage_has_opened and not self._streaming_manager_is_busy:
+            self._load_complete.set()
+        else:
+            self._load_complete.clear()
 
     async def _evaluate_load_status(self):
         """
         If streaming manager is not busy and the stage is loaded from storage,
         notify the client.
+
+        Completion is signaled by the stage and streaming status events, a
+        structured error is sent if it does not happen within the
+        `load_timeout` setting.
         """
-        # Only evaluate for stage loaded from storage.
+        # Stages opened without a client request, e.g. at startup, are
+        # reported without a request id.
+        request = self._active_load
+
+        # Only evaluate for stage loaded from storage, others have no
+        # dependencies to wait for.
         if not self._persisted_stage:
+            if request and not request.cancelled:
+                self._send_open_result(request, "success")
             return
 
         if self._is_evaluating_loading_status:
             return
         self._is_evaluating_loading_status = True
 
-        # Wait until all dependencies have loaded by streaming manager
-        while self._streaming_manager_is_busy or not self._stage_has_opened:
-            await omni.kit.app.get_app().next_update_async()
-
-        for _ in range(2):
-            await omni.kit.app.get_app().next_update_async()
-
-        # Stage has loaded with all dependencies. Send message to client.
-        url = self._requested_stage_url if self._requested_stage_url  else '[obfuscated]'
-        carb.log_info(
-            f'Sending message to client that stage has loaded: {url}'
-        )
-        payload = {"url": url, "result": "success", "error": ''}
-        get_eventdispatcher().dispatch_event("openedStageResult", payload=payload)
+        url = request.url if request else '[obfuscated]'
+        timeout = carb.settings.get_settings().get_as_float(LOAD_TIMEOUT_SETTING)
+        try:
+            try:
+                # Wait until all dependencies have loaded by streaming manager
+                await asyncio.wait_for(self._load_complete.wait(), timeout if timeout > 0 else None)
+            except asyncio.TimeoutError:
+                carb.log_warn(f'Timed out after {timeout} seconds waiting for stage to load: {url}')
+                result = {
+                    "result": "error",
+                    "error": f"Timed out after {timeout} seconds waiting for the stage to load",
+                    "error_code": "timeout",
+                }
+            else:
+                # Stage has loaded with all dependencies. Send message to client.
+                carb.log_info(
+                    f'Sending message to client that stage has loaded: {url}'
+                )
+                result = {"result": "success"}
+            # Make sure the client has seen the final progress before the result.
+            self._flush_progress()
+            if not (request and request.cancelled):
+                self._send_open_result(request, **result)
+        finally:
+            # Whatever happened, the load of the request is over.
+            if request:
+                request.finished.set()
 
         # reset
         self._is_evaluating_loading_status = False
@@ -265,29 +635,60 @@ class LoadingManager:
     def _on_progress(self, event: carb.events.IEvent):
         """
         Handler for `omni.kit.window.status_bar@progress` event.
-        This forwards the statusbar progress events to the streaming client.
+        This forwards the statusbar progress events to the streaming client,
+        coalesced to at most `progress_update_rate` messages per second.
         """
         # Only notify for stage loaded from storage.
         if not self._persisted_stage:
             return
 
-        # Send progress message
-        carb.log_info('Sending message to client about loading progress.')
-        get_eventdispatcher().dispatch_event("updateProgressAmount", payload=dict(event.payload))
+        self._pending_progress = dict(event.payload)
+        self._schedule_progress_flush()
 
     def _on_activity(self, event: carb.events.IEvent):
         """
         Handler for `omni.kit.window.status_bar@activity` event.
-        This forwards the statusbar activity events to the streaming client.
+        This forwards the statusbar activity events to the streaming client,
+        coalesced to at most `progress_update_rate` messages per second.
         """
         # Only notify for stage loaded from storage.
         if not self._persisted_stage:
             return
 
-        carb.log_info('Storing message about loading activity.')
-        # Send activity message
-        carb.log_info('Sending message to client about loading activity.')
-        get_eventdispatcher().dispatch_event("updateProgressActivity", payload=dict(event.payload))
+        payload = dict(event.payload)
+        key = str(payload.get("text", payload))
+        # Re-inserted so the latest activity is last.
+        self._pending_activities.pop(key, None)
+        self._pending_activities[key] = payload
+        self._schedule_progress_flush()
+
+    def _schedule_progress_flush(self) -> None:
+        """Flushes pending status bar updates now, or at the next tick of the update rate."""
+        rate = carb.settings.get_settings().get_as_float(PROGRESS_UPDATE_RATE_SETTING)
+        if rate <= 0:
+            self._flush_progress()
+        elif self._progress_flush_task is None or self._progress_flush_task.done():
+            self._progress_flush_task = asyncio.ensure_future(self._flush_progress_periodically(1.0 / rate))
+
+    async def _flush_progress_periodically(self, interval: float) -> None:
+        """Flushes pending status bar updates every `interval` seconds for as long as new ones arrive."""
+        while self._pending_progress is not None or self._pending_activities:
+            self._flush_progress()
+            await asyncio.sleep(interval)
+
+    def _flush_progress(self) -> None:
+        """Sends the pending progress and activities to the client."""
+        if self._pending_progress is not None:
+            send_message("updateProgressAmount", self._pending_progress)
+            self._pending_progress = None
+
+        if self._pending_activities:
+            activities = list(self._pending_activities)
+            # The latest activity, along with every distinct activity since the last update.
+            payload = dict(self._pending_activities[activities[-1]])
+            payload["activities"] = activities
+            self._pending_activities.clear()
+            send_message("updateProgressActivity", payload)
 
     def on_shutdown(self) -> None:
         """
@@ -295,6 +696,15 @@ class LoadingManager:
         """
         if self._subscriptions:
             self._subscriptions.clear()
+        if self._progress_flush_task is not None:
+            self._progress_flush_task.cancel()
+            self._progress_flush_task = None
+        for task in (self._load_task, self._evaluate_task):
+            if task is not None:
+                task.cancel()
+        self._load_task = None
+        self._evaluate_task = None
+        self._stage_pool.clear()
 
     def _reset_state(self):
         """
@@ -306,3 +716,4 @@ class LoadingManager:
         self._stage_has_opened = False
         self._streaming_manager_is_busy = False
         self._persisted_stage = False
+        self._update_load_complete()
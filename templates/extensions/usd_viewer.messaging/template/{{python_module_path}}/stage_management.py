@@ -8,11 +8,17 @@
 # without an express license agreement from NVIDIA CORPORATION or
 # its affiliates is strictly prohibited.
 
-from pxr import UsdGeom, Usd
+import asyncio
+import fnmatch
+import re
+from typing import Callable, Dict, Generator, List, Optional, Set, Tuple
+
+from pxr import Sdf, Tf, UsdGeom, Usd
 
 import carb
 import carb.dictionary
 import carb.events
+import carb.settings
 import omni.usd
 import omni.kit.app
 import omni.kit.livestream.messaging as messaging
@@ -20,14 +26,97 @@ import omni.kit.livestream.messaging as messaging
 from carb.eventdispatcher import get_eventdispatcher
 from omni.kit.viewport.utility import get_active_viewport_camera_string
 
+from .camera_bookmarks import DEFAULT_SLOT, CameraBookmarks, CameraState, author_camera_state
+from .children_cache import ChildListing, ChildrenCache
+from .encoding import ENCODINGS, StringTable, as_list, decode_paths, encode_children, encode_paths, is_encoded_paths
+from .instrumentation import get_message_metrics, send_message
+from .sessions import current_client_id, get_sessions, send_response
+from .stage_index import StageIndex
+from .time_slicing import TimeSlicedWork
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+CHILDREN_PAGE_SIZE_SETTING = SETTINGS_PATH + "children_page_size"
+MAX_CHILDREN_PAGE_SIZE_SETTING = SETTINGS_PATH + "max_children_page_size"
+MAX_BATCH_PRIMS_SETTING = SETTINGS_PATH + "max_batch_prims"
+CHILDREN_FRAME_BUDGET_SETTING = SETTINGS_PATH + "children_frame_budget_ms"
+SEARCH_INDEX_ENABLED_SETTING = SETTINGS_PATH + "search_index_enabled"
+INDEX_FRAME_BUDGET_SETTING = SETTINGS_PATH + "index_frame_budget_ms"
+SEARCH_RESULT_LIMIT_SETTING = SETTINGS_PATH + "search_result_limit"
+MAX_SEARCH_RESULTS_SETTING = SETTINGS_PATH + "max_search_results"
+SELECTION_DELTA_SYNC_SETTING = SETTINGS_PATH + "selection_delta_sync"
+SELECTION_ENCODING_THRESHOLD_SETTING = SETTINGS_PATH + "selection_encoding_threshold"
+CAMERA_BOOKMARK_LIMIT_SETTING = SETTINGS_PATH + "camera_bookmark_limit"
+CAMERA_TRANSITION_DURATION_SETTING = SETTINGS_PATH + "camera_transition_duration"
+
+# Operations a client can send with `selectPrimsRequest`.
+SELECTION_OPS = ("replace", "add", "remove", "clear")
+
+# Operations a client can send with `cameraBookmarkRequest`.
+CAMERA_BOOKMARK_OPS = ("save", "restore", "delete", "list")
+
+# Filters a client can send with `getChildrenRequest` and the prim types they match.
+FILTER_TYPES = {
+    "USDGeom": UsdGeom.Mesh,
+    "mesh": UsdGeom.Mesh,
+    "xform": UsdGeom.Xform,
+    "scope": UsdGeom.Scope,
+}
+
+
+class _ChildrenPage:
+    """A page of children that is sent to the client in one or more chunks."""
+    def __init__(self, prim_path: str, offset: int):
+        self.prim_path = prim_path
+        self.offset = offset
+        self.total_count = 0
+        self.chunk_index = 0
+
+    def next_chunk(self, children: List[dict], final: bool) -> dict:
+        """Returns the `getChildrenResponse` payload for the next chunk of the page."""
+        payload = {
+            "prim_path": self.prim_path,
+            "children": children,
+            "offset": self.offset,
+            "total_count": self.total_count,
+            "has_more": self.offset + len(children) < self.total_count,
+            "chunk_index": self.chunk_index,
+            "final": final,
+        }
+        self.offset += len(children)
+        self.chunk_index += 1
+        return payload
+
 
 class StageManager:
     """This class manages the stage and its related events."""
     def __init__(self):
         # Internal messaging state
-        self._is_external_update: bool = False
-        self._camera_attrs = {}
+        # Client whose `selectPrimsRequest` changed the selection, None when
+        # it was changed on the stage side.
+        self._selection_source: Optional[str] = None
+        # Camera states saved by the client, the default slot holding the
+        # camera as it was when the stage was opened.
+        self._camera_bookmarks = CameraBookmarks()
+        # In-flight camera transition.
+        self._camera_task: Optional[asyncio.Task] = None
         self._subscriptions = []
+        # Selection as last known by the client, used as an insertion ordered
+        # set, and the sequence number of the last `stageSelectionChanged`.
+        self._selection: Dict[str, None] = {}
+        self._selection_seq: int = 0
+        self._children_cache = ChildrenCache()
+        self._objects_changed_listener = None
+        # In-flight `getChildrenRequest` traversals, keyed by client and prim path.
+        self._children_tasks: Dict[Tuple[str, str], asyncio.Task] = {}
+        # In-flight `getChildrenBatchRequest` traversals.
+        self._batch_tasks: Set[asyncio.Task] = set()
+        # In-flight `makePrimsPickable` traversals.
+        self._pickable_tasks: Set[asyncio.Task] = set()
+        self._stage_index = StageIndex(
+            FILTER_TYPES,
+            lambda prim: self._is_listed(prim, None, prim.GetParent().IsPseudoRoot()),
+        )
 
         # -- register outgoing events/messages
         outgoing = [
@@ -35,10 +124,22 @@ class StageManager:
             "stageSelectionChanged",
             # response to request for children of a prim
             "getChildrenResponse",
+            # response to request for children of several prims
+            "getChildrenBatchResponse",
             # response to request for primitive being pickable.
             "makePrimsPickableResponse",
             # response to the request to reset camera attributes
             "resetStageResponse",
+            # response to request for the child listing cache counters
+            "childrenCacheStatsResponse",
+            # response to request to search prims by name and type
+            "searchPrimsResponse",
+            # response to request to change the encoding of responses
+            "setEncodingResponse",
+            # response to request to save, restore, delete or list camera bookmarks
+            "cameraBookmarkResponse",
+            # response to a selectPrimsRequest that was rejected
+            "selectPrimsResponse",
         ]
 
         for o in outgoing:
@@ -52,12 +153,22 @@ class StageManager:
         incoming = {
             # request to get children of a prim
             'getChildrenRequest': self._on_get_children,
+            # request to get children of several prims, optionally several levels deep
+            'getChildrenBatchRequest': self._on_get_children_batch,
             # request to select a prim
             'selectPrimsRequest': self._on_select_prims,
             # request to make primitives pickable
             'makePrimsPickable': self._on_make_pickable,
             # request to make primitives pickable
             'resetStage': self._on_reset_camera,
+            # request for the child listing cache counters
+            'childrenCacheStatsQuery': self._on_children_cache_stats_query,
+            # request to search prims by name and type
+            'searchPrimsRequest': self._on_search_prims,
+            # request to change the encoding of responses
+            'setEncodingRequest': self._on_set_encoding,
+            # request to save, restore, delete or list camera bookmarks
+            'cameraBookmarkRequest': self._on_camera_bookmark,
         }
 
         ed = get_eventdispatcher()
@@ -70,7 +181,7 @@ class StageManager:
                 ed.observe_event(
                     observer_name=f"StageManager:{event_type}",
                     event_name=event_type,
-                    on_event=handler,
+                    on_event=get_message_metrics().instrument(event_type, get_sessions().bind(handler)),
                 )
             )
 
@@ -90,184 +201,779 @@ class StageManager:
                 on_event=self._on_stage_event_selection_changed,
             )
         )
+        self._subscriptions.extend([
+            ed.observe_event(
+                observer_name="StageManager:stage:opened",
+                event_name=usd_context.stage_event_name(omni.usd.StageEventType.OPENED),
+                on_event=self._on_stage_event_attached,
+            ),
+            ed.observe_event(
+                observer_name="StageManager:stage:closed",
+                event_name=usd_context.stage_event_name(omni.usd.StageEventType.CLOSED),
+                on_event=self._on_stage_event_closed,
+            ),
+        ])
+        # Extension may be enabled after a stage has already been opened.
+        self._watch_stage(usd_context.get_stage())
+
+    @property
+    def children_cache_stats(self) -> dict:
+        """Hit, miss and invalidation counters of the child listing cache."""
+        return self._children_cache.stats
+
+    def _watch_stage(self, stage: Optional[Usd.Stage]) -> None:
+        """Listens to object changes of `stage` to keep the child listing cache and search index current."""
+        if self._objects_changed_listener:
+            self._objects_changed_listener.Revoke()
+            self._objects_changed_listener = None
+        for task in self._children_tasks.values():
+            task.cancel()
+        self._children_tasks.clear()
+        for task in self._batch_tasks | self._pickable_tasks:
+            task.cancel()
+        self._batch_tasks.clear()
+        self._pickable_tasks.clear()
+        self._children_cache.clear()
+
+        settings = carb.settings.get_settings()
+        if stage and settings.get_as_bool(SEARCH_INDEX_ENABLED_SETTING):
+            budget_ms = settings.get_as_float(INDEX_FRAME_BUDGET_SETTING)
+            self._stage_index.reset(stage, budget_ms if budget_ms > 0 else float("inf"))
+        else:
+            self._stage_index.reset(None)
+
+        if stage:
+            self._objects_changed_listener = Tf.Notice.Register(
+                Usd.Notice.ObjectsChanged, self._on_objects_changed, stage
+            )
+
+    def _on_objects_changed(self, notice: Usd.Notice.ObjectsChanged, sender: Usd.Stage) -> None:
+        resynced_paths = notice.GetResyncedPaths()
+        self._children_cache.invalidate(resynced_paths)
+        self._stage_index.on_resynced(resynced_paths)
+
+    def _on_stage_event_attached(self, event) -> None:
+        self._watch_stage(omni.usd.get_context().get_stage())
+
+    def _on_stage_event_closed(self, event) -> None:
+        self._watch_stage(None)
 
     def get_children(self, prim_path, filters=None):
         """
         Collect any children of the given `prim_path`, potentially filtered by `filters`
         """
-        stage = omni.usd.get_context().get_stage()
-        prim = stage.GetPrimAtPath(prim_path)
-        if not prim:
-            return []
+        children, _ = self.get_children_page(prim_path, filters)
+        return children
 
-        filter_types = {
-            "USDGeom": UsdGeom.Mesh,
-            "mesh": UsdGeom.Mesh,
-            "xform": UsdGeom.Xform,
-            "scope": UsdGeom.Scope,
-        }
+    def get_children_page(self, prim_path, filters=None, offset: int = 0, limit: int = 0) -> Tuple[List[dict], int]:
+        """
+        Collect a page of the children of the given `prim_path`, potentially filtered by `filters`.
 
-        children = []
-        for child in prim.GetChildren():
-            # If a child doesn't pass any filter, we skip it.
-            if filters is not None:
-                if isinstance(filters, carb.dictionary.Item):
-                    filters = filters.get_dict()
-                if not any(child.IsA(filter_types[filt]) for filt in filters if filt in filter_types):
-                    continue
+        All children are matched against the filters so that the total count is
+        known, but the child info sent to the client is only built for the
+        `limit` children starting at `offset`. A `limit` of 0 returns every
+        child from `offset` onwards.
 
-            child_name = child.GetName()
-            child_path = str(prim.GetPath())
-            # Skipping over cameras
-            if child_name.startswith('OmniverseKit_'):
-                continue
-            # Also skipping rendering primitives.
-            if prim_path == '/' and child_name == 'Render':
-                continue
-            child_path = child_path if child_path != '/' else ''
-            carb.log_info(f'child_path: {child_path}')
-            info = {"name": child_name, "path": f'{child_path}/{child_name}'}
-
-            # We return an empty list here to indicate that children are
-            # available, but the current app does not support pagination,
-            # so we use this to lazy load the stage tree.
-            if child.GetChildren():
-                info["children"] = []
+        Returns:
+            The page of child infos and the total number of matching children.
+        """
+        page = _ChildrenPage(prim_path, offset)
+        # Without a budget the whole work runs in a single slice.
+        work = TimeSlicedWork(self._children_steps(page, filters, limit))
+        work.run_slice()
+        return work.take_items(), page.total_count
 
-            children.append(info)
+    def _children_steps(self, page: _ChildrenPage, filters, limit: int) -> Generator[Optional[dict], None, None]:
+        """
+        Does the work of a children request one prim at a time.
 
-        return children
+        Matches the children of the page's prim against the filters, unless a
+        listing is cached, yielding `None` after each child. Then yields the
+        info of every child of the page. `page.total_count` is set once the
+        children have been matched.
+        """
+        stage = omni.usd.get_context().get_stage()
+        prim = stage.GetPrimAtPath(page.prim_path) if stage else None
+        if not prim:
+            return
+
+        # Listings are cached per prim and filter set, repeated expansions of
+        # the same node only look up the infos of the requested page.
+        filter_key = self._filter_key(filters)
+        listing = self._children_cache.get(prim.GetPath(), filter_key)
+        if listing is None:
+            generation = self._children_cache.generation
+            filter_types = None if filter_key is None else [FILTER_TYPES[filt] for filt in filter_key]
+            is_root = prim.GetPath() == Sdf.Path.absoluteRootPath
+            matched = []
+            for child in prim.GetChildren():
+                if self._is_listed(child, filter_types, is_root):
+                    matched.append(child)
+                yield None
+            listing = ChildListing(matched)
+            # Only cache listings that were not invalidated while they were built.
+            if generation == self._children_cache.generation:
+                self._children_cache.put(prim.GetPath(), filter_key, listing)
+
+        page.total_count = len(listing.children)
+        end = min(page.offset + limit, page.total_count) if limit > 0 else page.total_count
+        for index in range(page.offset, end):
+            info = listing.infos[index]
+            if info is None:
+                child = listing.children[index]
+                # The prim may have been removed while the listing was built.
+                if not child:
+                    continue
+                info = listing.infos[index] = self._child_info(child)
+            yield dict(info)
+
+    @staticmethod
+    def _filter_key(filters) -> Optional[Tuple[str, ...]]:
+        """Normalizes request filters to the known filter names, usable as a cache key."""
+        if filters is None:
+            return None
+        return tuple(sorted({filt for filt in as_list(filters) if filt in FILTER_TYPES}))
+
+    @staticmethod
+    def _is_listed(child: Usd.Prim, filter_types: Optional[list], is_root: bool) -> bool:
+        """Returns whether `child` is shown to the client, given the request filters."""
+        child_name = child.GetName()
+        # Skipping over cameras
+        if child_name.startswith('OmniverseKit_'):
+            return False
+        # Also skipping rendering primitives.
+        if is_root and child_name == 'Render':
+            return False
+        # If a child doesn't pass any filter, we skip it.
+        if filter_types is not None and not any(child.IsA(filt) for filt in filter_types):
+            return False
+        return True
+
+    @staticmethod
+    def _child_info(child: Usd.Prim) -> dict:
+        """Builds the entry sent to the client for a single child prim."""
+        info = {"name": child.GetName(), "path": str(child.GetPath())}
+
+        # We return an empty list here to indicate that children are
+        # available, the client requests them when the node is expanded
+        # so we use this to lazy load the stage tree.
+        if child.GetChildren():
+            info["children"] = []
+
+        return info
 
     def _on_get_children(self, event: carb.events.IEvent) -> None:
         """
         Handler for the `getChildrenRequest` event
         Collects a filtered collection of a given primitives children.
+
+        Clients can page through large prims by sending an `offset` and a
+        `limit`, the response carries the `total_count` of matching children
+        and whether there are more children after the returned page.
+
+        The traversal is time sliced: it runs for at most
+        `children_frame_budget_ms` per frame and continues on the next update.
+        Clients that send `chunked` receive the children built in each frame as
+        separate responses, the last one having `final` set. A new request for
+        the same prim from the same client cancels the one in flight.
+
+        Responses are compacted by `encode_children` when the request, or the
+        client through `setEncodingRequest`, asks for the `compact` encoding.
         """
 
         carb.log_info(
             "Received message to return list of a prim\'s children"
         )
-        children = self.get_children(
-            prim_path=event.payload["prim_path"],
-            filters=event.payload["filters"]
+        payload = dict(event.payload)
+        prim_path = str(payload["prim_path"])
+        chunked = bool(payload.get("chunked", False))
+        compact = self._response_encoding(payload) == "compact"
+        page = _ChildrenPage(prim_path, max(int(payload.get("offset", 0)), 0))
+        budget_ms = carb.settings.get_settings().get_as_float(CHILDREN_FRAME_BUDGET_SETTING)
+        work = TimeSlicedWork(
+            self._children_steps(page, payload.get("filters"), self._page_limit(payload)),
+            budget_ms if budget_ms > 0 else float("inf"),
+        )
+
+        def send_chunk(final: bool) -> None:
+            chunk = page.next_chunk(work.take_items(), final)
+            send_response("getChildrenResponse", encode_children(chunk) if compact else chunk)
+
+        def on_slice(work: TimeSlicedWork) -> None:
+            if work.done:
+                send_chunk(True)
+            elif chunked and work.items:
+                send_chunk(False)
+
+        # Superseded by this request.
+        key = (current_client_id(), prim_path)
+        if (previous := self._children_tasks.pop(key, None)):
+            previous.cancel()
+
+        # Answer right away when the work fits in this frame's budget.
+        work.run_slice()
+        on_slice(work)
+        if work.done:
+            return
+
+        task = asyncio.ensure_future(work.run_remaining(on_slice))
+        self._children_tasks[key] = task
+
+        def on_done(done: asyncio.Task) -> None:
+            if self._children_tasks.get(key) is done:
+                del self._children_tasks[key]
+
+        task.add_done_callback(on_done)
+
+    def _on_get_children_batch(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for the `getChildrenBatchRequest` event.
+
+        Collects the children of every path in `prim_paths` and, when `depth`
+        is greater than 1, the children of those children down to `depth`
+        levels. All results are sent back in a single
+        `getChildrenBatchResponse`, one entry per expanded prim in the same
+        format as `getChildrenResponse`. The number of expanded prims is bounded
+        by the `max_batch_prims` setting, `truncated` is set when it is reached.
+
+        Like `getChildrenRequest`, the traversal is time sliced by the
+        `children_frame_budget_ms` setting, the response is sent once every
+        prim has been expanded.
+
+        With the `compact` encoding, every result is compacted by
+        `encode_children` and child names are indices in the `strings` table
+        shared by all results.
+        """
+        carb.log_info("Received message to return the children of several prims")
+        payload = dict(event.payload)
+        prim_paths = [str(path) for path in as_list(payload.get("prim_paths"))]
+        depth = max(int(payload.get("depth", 1)), 1)
+        compact = self._response_encoding(payload) == "compact"
+        settings = carb.settings.get_settings()
+        budget_ms = settings.get_as_float(CHILDREN_FRAME_BUDGET_SETTING)
+        work = TimeSlicedWork(
+            self._batch_steps(
+                prim_paths,
+                payload.get("filters"),
+                depth,
+                self._page_limit(payload),
+                settings.get_as_int(MAX_BATCH_PRIMS_SETTING),
+            ),
+            budget_ms if budget_ms > 0 else float("inf"),
+        )
+
+        def on_slice(work: TimeSlicedWork) -> None:
+            if not work.done:
+                return
+            results, truncated = work.result
+            response = {
+                "prim_paths": prim_paths,
+                "depth": depth,
+                "results": results,
+                "truncated": truncated,
+            }
+            if compact:
+                strings = StringTable()
+                response["results"] = [encode_children(result, strings) for result in results]
+                response["strings"] = strings.strings
+                response["encoding"] = "compact"
+            send_response("getChildrenBatchResponse", response)
+
+        # Answer right away when the work fits in this frame's budget.
+        work.run_slice()
+        on_slice(work)
+        if work.done:
+            return
+        task = asyncio.ensure_future(work.run_remaining(on_slice))
+        self._batch_tasks.add(task)
+        task.add_done_callback(self._batch_tasks.discard)
+
+    def _batch_steps(
+        self, prim_paths: List[str], filters, depth: int, limit: int, max_prims: int
+    ) -> Generator[None, None, Tuple[List[dict], bool]]:
+        """
+        Does the work of a batch request one prim at a time, level by level.
+        Returns the `getChildrenResponse` payloads of the expanded prims and
+        whether `max_prims` cut the expansion short.
+        """
+        results = []
+        level = prim_paths
+        for _ in range(depth):
+            next_level = []
+            for prim_path in level:
+                if max_prims > 0 and len(results) >= max_prims:
+                    return results, True
+                page = _ChildrenPage(prim_path, 0)
+                children = []
+                for info in self._children_steps(page, filters, limit):
+                    if info is not None:
+                        children.append(info)
+                    yield None
+                results.append(page.next_chunk(children, True))
+                next_level.extend(child["path"] for child in children if "children" in child)
+            if not next_level:
+                break
+            level = next_level
+        return results, False
+
+    def _response_encoding(self, payload: dict) -> str:
+        """The encoding asked for by a request, or else the one set by the client."""
+        encoding = payload.get("encoding", get_sessions().current().encoding)
+        return encoding if encoding in ENCODINGS else "json"
+
+    def _on_set_encoding(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for the `setEncodingRequest` event.
+
+        Sets the `encoding` children responses are sent with when requests do
+        not specify one, for the requesting client only. Responds with the
+        encoding in use and the supported ones.
+        """
+        session = get_sessions().current()
+        encoding = event.payload["encoding"] if "encoding" in event.payload else "json"
+        if encoding in ENCODINGS:
+            session.encoding = encoding
+            error = ""
+        else:
+            error = f"Unsupported encoding '{encoding}'"
+            carb.log_warn(f"setEncodingRequest: {error}")
+        send_response(
+            "setEncodingResponse",
+            {"encoding": session.encoding, "supported": list(ENCODINGS), "error": error},
         )
-        payload = {
-            "prim_path": event.payload["prim_path"],
-            "children": children
-        }
 
+    @staticmethod
+    def _page_limit(payload: dict) -> int:
+        """Returns the page size for a children request, bounded by the extension settings."""
+        settings = carb.settings.get_settings()
+        limit = max(int(payload.get("limit", settings.get_as_int(CHILDREN_PAGE_SIZE_SETTING))), 0)
+        max_limit = settings.get_as_int(MAX_CHILDREN_PAGE_SIZE_SETTING)
+        if max_limit > 0:
+            limit = min(limit, max_limit) if limit > 0 else max_limit
+        return limit
+
+    def _on_children_cache_stats_query(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for the `childrenCacheStatsQuery` event.
+
+        Sends the hit, miss and invalidation counters of the child listing cache.
+        """
+        send_response("childrenCacheStatsResponse", self.children_cache_stats)
 
-        get_eventdispatcher().dispatch_event("getChildrenResponse", payload=payload)
+    def _on_search_prims(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for the `searchPrimsRequest` event.
+
+        Finds prims through the stage index: `query` is a case insensitive glob
+        pattern matched against prim names, `types` restricts results to the
+        `getChildrenRequest` filter names or prim type names, and `root` to a
+        subtree. At most `limit` results are returned, `truncated` is set when
+        there were more. `indexing` is set while the index is still being built,
+        in which case results may be incomplete.
+        """
+        payload = dict(event.payload)
+        query = str(payload.get("query", ""))
+        carb.log_info(f"Received message to search prims matching '{query}'")
+        settings = carb.settings.get_settings()
+        limit = max(int(payload.get("limit", settings.get_as_int(SEARCH_RESULT_LIMIT_SETTING))), 0)
+        max_limit = settings.get_as_int(MAX_SEARCH_RESULTS_SETTING)
+        if max_limit > 0:
+            limit = min(limit, max_limit) if limit > 0 else max_limit
+
+        results, truncated = self._stage_index.search(
+            query=query,
+            types=[str(type_key) for type_key in as_list(payload.get("types"))],
+            root=str(payload.get("root", "/")),
+            limit=limit,
+        )
+        payload = {
+            "query": query,
+            "results": results,
+            "truncated": truncated,
+            "indexing": not self._stage_index.is_ready,
+        }
+        send_response("searchPrimsResponse", payload)
 
     def _on_select_prims(self, event: carb.events.IEvent) -> None:
         """
         Handler for `selectPrimsRequest` event.
 
-        Selects the given primitives.
+        Changes the selection by the `op` of the request: `replace` (default)
+        selects the given `paths`, `add` and `remove` add them to and remove
+        them from the selection and `clear` deselects everything. `paths` is
+        either a list of prim paths or the `prefix_lengths` and `suffixes` of
+        `encode_paths`.
+
+        A client that sends the `seq` of the last `stageSelectionChanged` it
+        has seen gets a snapshot of the selection back if it missed any.
+
+        A request that cannot be applied is answered with a
+        `selectPrimsResponse` error and leaves the selection unchanged.
         """
-        new_selection = []
-        if "paths" in event.payload:
-            if isinstance(event.payload["paths"], carb.dictionary.Item):
-                new_selection = list(event.payload["paths"].get_dict())
-            else:
-                new_selection = list(event.payload["paths"])
-            carb.log_info(f"Received message to select '{new_selection}'")
-        # Flagging this as an external event because it
-        # was initiated by the client.
-        self._is_external_update = True
+        payload = dict(event.payload)
+
+        def reject(error: str) -> None:
+            carb.log_error(f"Invalid selectPrimsRequest: {error}")
+            response = {"result": "error", "error": error}
+            if "request_id" in payload:
+                response["request_id"] = payload["request_id"]
+            send_response("selectPrimsResponse", response)
+
+        op = payload.get("op", "replace")
+        if op not in SELECTION_OPS:
+            reject(f"Unexpected op '{op}', expected one of {SELECTION_OPS}")
+            return
+        try:
+            paths = self._payload_paths(payload.get("paths"))
+        except ValueError as error:
+            reject(f"Invalid paths: {error}")
+            return
+        seq = None
+        if "seq" in payload:
+            try:
+                seq = int(payload["seq"])
+            except (TypeError, ValueError):
+                reject(f"Invalid seq '{payload['seq']}', expected an integer")
+                return
+        carb.log_info(f"Received message to {op} selection of {len(paths)} prims")
+
         sel = omni.usd.get_context().get_selection()
-        sel.clear_selected_prim_paths()
-        sel.set_selected_prim_paths(new_selection, True)
+        current = sel.get_selected_prim_paths()
+        if op == "replace":
+            new_selection = list(dict.fromkeys(paths))
+        elif op == "add":
+            new_selection = list(dict.fromkeys(current + paths))
+        elif op == "remove":
+            removed = set(paths)
+            new_selection = [path for path in current if path not in removed]
+        else:
+            new_selection = []
+
+        # An unchanged selection does not raise a selection changed event.
+        if new_selection != current:
+            # Flagging the client that initiated the change.
+            self._selection_source = current_client_id()
+            sel.clear_selected_prim_paths()
+            sel.set_selected_prim_paths(new_selection, True)
+        if not current_client_id():
+            # Anonymous clients are not sent their own changes, see
+            # `_on_stage_event_selection_changed`.
+            self._selection = dict.fromkeys(new_selection)
+
+        if seq is not None and seq != self._selection_seq:
+            # The client changed a selection it was not up to date with.
+            self._send_selection({"op": "snapshot", "paths": new_selection})
+
+    @staticmethod
+    def _payload_paths(value) -> List[str]:
+        """Reads prim paths sent as a list or encoded by `encode_paths`."""
+        if isinstance(value, carb.dictionary.Item):
+            value = value.get_dict()
+        if is_encoded_paths(value):
+            return decode_paths(value)
+        return [str(path) for path in as_list(value)]
+
+    def _send_selection(self, payload: dict) -> None:
+        """Sends a `stageSelectionChanged` delta or snapshot, encoding large path lists."""
+        # A snapshot may be sent before the selection changed event it
+        # anticipates has updated the tracked selection.
+        count = len(payload["paths"]) if payload.get("op") == "snapshot" else len(self._selection)
+        threshold = carb.settings.get_settings().get_as_int(SELECTION_ENCODING_THRESHOLD_SETTING)
+        for key in ("paths", "added", "removed"):
+            if threshold > 0 and len(payload.get(key, ())) >= threshold:
+                payload[key] = encode_paths(payload[key])
+        payload["seq"] = self._selection_seq
+        payload["count"] = count
+        send_message("stageSelectionChanged", payload)
 
     def _on_stage_event_opened(self, event):
         stage = omni.usd.get_context().get_stage()
         stage_url = stage.GetRootLayer().identifier if stage else ''
 
         if stage_url:
-            # Clear before using, so that we're sure the data is only
-            # from the new stage.
-            self._camera_attrs.clear()
+            # Bookmarks only make sense for the stage they were saved on.
+            self._cancel_camera_transition()
+            self._camera_bookmarks.clear()
             # Capture the active camera's camera data, used to reset
             # the scene to a known good state.
-            ctx = omni.usd.get_context()
-            if (prim := ctx.get_stage().GetPrimAtPath(get_active_viewport_camera_string())):
-                for attr in prim.GetAttributes():
-                    self._camera_attrs[attr.GetName()] = attr.Get()
+            if (prim := stage.GetPrimAtPath(get_active_viewport_camera_string())):
+                self._camera_bookmarks.save(DEFAULT_SLOT, CameraState.capture(prim))
 
     def _on_stage_event_selection_changed(self, event):
-        # If the selection changed came from an external event,
-        # we don't need to let the streaming client know because it
-        # initiated the change and is already aware.
-        if self._is_external_update:
-            self._is_external_update = False
-        else:
+        # If the selection changed came from an anonymous client, we don't
+        # need to let it know because it initiated the change and is already
+        # aware. Changes made by a client with a `client_id` reach the other
+        # clients, tagged with the `source_client_id` for it to ignore them.
+        source, self._selection_source = self._selection_source, None
+        if source == "":
+            pass
+        elif not carb.settings.get_settings().get_as_bool(SELECTION_DELTA_SYNC_SETTING):
             payload = {"prims": omni.usd.get_context().get_selection().
                         get_selected_prim_paths()}
+            self._selection = dict.fromkeys(payload["prims"])
+            if source:
+                payload["source_client_id"] = source
 
-            get_eventdispatcher().dispatch_event("stageSelectionChanged", payload=payload)
+            send_message("stageSelectionChanged", payload)
             carb.log_info(f"Selection changed: Path to USD prims currently selected = {omni.usd.get_context().get_selection().get_selected_prim_paths()}")
+        else:
+            # Only the difference with the selection the client knows is sent,
+            # unless sending the whole selection is smaller.
+            paths = omni.usd.get_context().get_selection().get_selected_prim_paths()
+            previous, self._selection = self._selection, dict.fromkeys(paths)
+            self._selection_seq += 1
+            added = [path for path in self._selection if path not in previous]
+            removed = [path for path in previous if path not in self._selection]
+            if not paths:
+                payload = {"op": "clear"}
+            elif len(added) + len(removed) >= len(paths):
+                payload = {"op": "snapshot", "paths": list(self._selection)}
+            else:
+                payload = {"op": "delta", "added": added, "removed": removed}
+            if source:
+                payload["source_client_id"] = source
+            self._send_selection(payload)
+            carb.log_info(f"Selection changed: {len(added)} prims added, {len(removed)} removed, {len(paths)} selected")
 
     def _on_reset_camera(self, event: carb.events.IEvent):
         """
         Handler for `resetStage` event.
 
-        Resets the camera back to values collected when the stage was opened.
+        Resets the camera back to values collected when the stage was opened,
+        over the optional `duration` of the payload in seconds.
         A success message is sent if all attributes are succesfully reset, and error message is set otherwise.
         """
-        ctx = omni.usd.get_context()
-        stage = ctx.get_stage()
-        try:
-            # Reset the camera.
-            # The camera lives on the session layer, which has a higher
-            # opinion than the root stage. So we need to explicitly target
-            # the session layer when resetting the camera's attributes.
-            camera_prim = ctx.get_stage().GetPrimAtPath(
-                get_active_viewport_camera_string()
-            )
-            edit_context = Usd.EditContext(
-                stage, Usd.EditTarget(stage.GetSessionLayer())
-            )
-            with edit_context:
-                for name, value in self._camera_attrs.items():
-                    attr = camera_prim.GetAttribute(name)
-                    attr.Set(value)
-        except Exception as e:
-            payload = {"result": "error", "error": str(e)}
+        duration = float(event.payload.get("duration", 0.0) or 0.0) if event.payload else 0.0
+
+        def respond(result: str, error: str) -> None:
+            send_response("resetStageResponse", {"result": result, "error": error})
+
+        if self._camera_bookmarks.get(DEFAULT_SLOT) is None:
+            # No camera was captured when the stage was opened, nothing to reset.
+            respond("success", "")
+            return
+        self._restore_camera(DEFAULT_SLOT, duration, respond)
+
+    def _on_camera_bookmark(self, event: carb.events.IEvent) -> None:
+        """
+        Handler for `cameraBookmarkRequest` event.
+
+        `op` is one of `CAMERA_BOOKMARK_OPS`: `save` captures the active camera
+        in slot `name`, `restore` moves the active camera to it over
+        `duration` seconds, defaulting to the `camera_transition_duration`
+        setting, `delete` removes it and `list` only reports the slots. The
+        `DEFAULT_SLOT` slot can be restored but neither saved nor deleted.
+        Every `cameraBookmarkResponse` carries the names of the saved slots.
+        """
+        payload = event.payload or {}
+        op = payload.get("op", "list")
+        name = str(payload.get("name", ""))
+
+        def respond(result: str, error: str = "") -> None:
+            send_response("cameraBookmarkResponse", {
+                "op": op,
+                "name": name,
+                "result": result,
+                "error": error,
+                "bookmarks": self._camera_bookmarks.names(),
+            })
+
+        if op not in CAMERA_BOOKMARK_OPS:
+            respond("error", f"Unknown op {op}, expected one of {', '.join(CAMERA_BOOKMARK_OPS)}")
+            return
+        if op != "list" and not name:
+            respond("error", "No bookmark name given")
+            return
+        if op in ("save", "delete") and name == DEFAULT_SLOT:
+            # The default slot is what resetStage restores.
+            respond("error", f"The {DEFAULT_SLOT} bookmark is captured when the stage opens and cannot be changed")
+            return
+
+        if op == "save":
+            stage = omni.usd.get_context().get_stage()
+            prim = stage.GetPrimAtPath(get_active_viewport_camera_string()) if stage else None
+            if not prim:
+                respond("error", "No active camera")
+                return
+            self._camera_bookmarks.limit = carb.settings.get_settings().get_as_int(CAMERA_BOOKMARK_LIMIT_SETTING)
+            self._camera_bookmarks.save(name, CameraState.capture(prim))
+            respond("success")
+        elif op == "restore":
+            duration = payload.get("duration")
+            if duration is None:
+                duration = carb.settings.get_settings().get_as_float(CAMERA_TRANSITION_DURATION_SETTING)
+            self._restore_camera(name, float(duration), respond)
+        elif op == "delete":
+            if self._camera_bookmarks.delete(name):
+                respond("success")
+            else:
+                respond("error", f"No bookmark named {name}")
         else:
-            payload = {"result": "success", "error": ""}
+            respond("success")
 
-        get_eventdispatcher().dispatch_event("resetStageResponse", payload=payload)
+    def _restore_camera(self, name: str, duration: float, respond: Callable[[str, str], None]) -> None:
+        """
+        Moves the active camera to bookmark `name` and calls `respond` with the
+        result once done. A transition still in flight is cancelled, its
+        request is answered as `cancelled`.
+        """
+        state = self._camera_bookmarks.get(name)
+        stage = omni.usd.get_context().get_stage()
+        if state is None or not stage:
+            respond("error", f"No bookmark named {name}")
+            return
+        self._cancel_camera_transition()
+        camera_path = get_active_viewport_camera_string()
+        if duration <= 0:
+            try:
+                author_camera_state(stage, camera_path, state)
+            except Exception as e:
+                respond("error", str(e))
+            else:
+                respond("success", "")
+            return
+
+        task = asyncio.ensure_future(
+            self._camera_bookmarks.transition(stage, camera_path, state, duration)
+        )
+
+        def on_done(done: asyncio.Task) -> None:
+            if self._camera_task is done:
+                self._camera_task = None
+            if done.cancelled():
+                respond("cancelled", "Superseded by a newer camera request")
+            elif done.exception() is not None:
+                respond("error", str(done.exception()))
+            else:
+                respond("success", "")
+
+        task.add_done_callback(on_done)
+        self._camera_task = task
+
+    def _cancel_camera_transition(self) -> None:
+        if self._camera_task is not None:
+            self._camera_task.cancel()
+            self._camera_task = None
 
     def _on_make_pickable(self, event: carb.events.IEvent):
         """
         Handler for `makePrimsPickable` event.
 
-        Adds the provided primitives to the set of selectable objects in the viewport.
-        Sends 'makePrimsPickableResponse' back to streamer with
-        current success status.
+        Sets whether prims can be selected in the viewport. Pickability applies
+        to the descendants of a prim, so the request targets subtrees: the
+        prims in `paths` and `subtrees`, and the prims whose path matches any
+        of the `patterns`, globs or, with `pattern_type` set to `regex`,
+        regular expressions. `pickable` defaults to true.
+
+        Matching patterns walks the stage over several frames, bounded by the
+        `children_frame_budget_ms` setting, then every change is applied at
+        once. Sends 'makePrimsPickableResponse' back to streamer with
+        current success status and the `count` of prims affected.
         """
-        # Add the provided paths to the set of pickable prims.
-        ctx = omni.usd.get_context()
-        try:
-            if "paths" in event.payload:
-                if isinstance(event.payload["paths"], carb.dictionary.Item):
-                    paths = list(event.payload["paths"].get_dict())
-                else:
-                    paths = list(event.payload["paths"])
+        payload = dict(event.payload)
+        pickable = bool(payload.get("pickable", True))
+        response = {"result": "success", "error": "", "count": 0, "pickable": pickable}
+        if "request_id" in payload:
+            response["request_id"] = payload["request_id"]
 
-            for path in paths:
-                ctx.set_pickable(path, True)
+        stage = omni.usd.get_context().get_stage()
+        try:
+            roots = []
+            for path in as_list(payload.get("paths")) + as_list(payload.get("subtrees")):
+                if not Sdf.Path.IsValidPathString(str(path)):
+                    raise ValueError(f"Invalid prim path '{path}'")
+                roots.append(Sdf.Path(str(path)))
+            matchers = self._path_matchers(
+                [str(pattern) for pattern in as_list(payload.get("patterns"))],
+                payload.get("pattern_type", "glob"),
+            )
+            if not stage and (roots or matchers):
+                raise RuntimeError("No stage is open")
         except Exception as e:
-            payload = {"result": "error", "error": str(e)}
-        else:
-            payload = {"result": "success", "error": ""}
+            response.update({"result": "error", "error": str(e)})
+            send_response("makePrimsPickableResponse", response)
+            return
+
+        budget_ms = carb.settings.get_settings().get_as_float(CHILDREN_FRAME_BUDGET_SETTING)
+        work = TimeSlicedWork(
+            self._pickable_steps(stage, roots, matchers), budget_ms if budget_ms > 0 else float("inf")
+        )
 
-        get_eventdispatcher().dispatch_event("makePrimsPickableResponse", payload=payload)
+        def on_slice(work: TimeSlicedWork) -> None:
+            if not work.done:
+                return
+            paths, count = work.result
+            # Add the provided paths to the set of pickable prims.
+            ctx = omni.usd.get_context()
+            try:
+                for path in paths:
+                    ctx.set_pickable(str(path), pickable)
+            except Exception as e:
+                response.update({"result": "error", "error": str(e)})
+            else:
+                response["count"] = count
+            send_response("makePrimsPickableResponse", response)
+
+        work.run_slice()
+        on_slice(work)
+        if work.done:
+            return
+        task = asyncio.ensure_future(work.run_remaining(on_slice))
+        self._pickable_tasks.add(task)
+        task.add_done_callback(self._pickable_tasks.discard)
+
+    @staticmethod
+    def _path_matchers(patterns: List[str], pattern_type: str) -> List[Callable[[str], bool]]:
+        """Compiles glob or regex prim path patterns, raises ValueError for invalid ones."""
+        if pattern_type not in ("glob", "regex"):
+            raise ValueError(f"Unexpected pattern_type '{pattern_type}', expected 'glob' or 'regex'")
+        matchers = []
+        for pattern in patterns:
+            try:
+                if pattern_type == "glob":
+                    matchers.append(re.compile(fnmatch.translate(pattern)).match)
+                else:
+                    matchers.append(re.compile(pattern).fullmatch)
+            except re.error as e:
+                raise ValueError(f"Invalid pattern '{pattern}': {e}")
+        return matchers
+
+    @staticmethod
+    def _pickable_steps(
+        stage: Optional[Usd.Stage], roots: List[Sdf.Path], matchers: List[Callable[[str], bool]]
+    ) -> Generator[None, None, Tuple[List[Sdf.Path], int]]:
+        """
+        Collects the subtree roots to change and counts the prims below them,
+        one prim per step. Returns the roots without nested ones and the count.
+        """
+        if matchers:
+            # A matching prim covers its subtree, its descendants need not be matched.
+            prim_range = iter(Usd.PrimRange(stage.GetPseudoRoot()))
+            for prim in prim_range:
+                path = prim.GetPath()
+                if any(match(str(path)) for match in matchers):
+                    roots.append(path)
+                    prim_range.PruneChildren()
+                yield None
+
+        roots = Sdf.Path.RemoveDescendentPaths(roots)
+        count = 0
+        for root in roots:
+            prim = stage.GetPrimAtPath(root) if stage and root.IsAbsoluteRootOrPrimPath() else None
+            if not prim:
+                continue
+            for _ in Usd.PrimRange(prim):
+                count += 1
+                yield None
+        return roots, count
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated. It is used
         to clean up the extension state."""
         # Reseting the state.
         self._subscriptions.clear()
-        self._is_external_update: bool = False
-        self._camera_attrs.clear()
+        # Cancels in-flight traversals as well.
+        self._watch_stage(None)
+        self._selection_source = None
+        self._cancel_camera_transition()
+        self._camera_bookmarks.clear()
@@ -0,0 +1,139 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+from collections import OrderedDict
+from typing import List, Optional
+
+import carb
+import omni.client
+from pxr import Sdf, Usd
+
+
+class _PooledStage:
+    """A stage kept alive by the pool, along with the layers it was composed from."""
+    __slots__ = ("stage", "layers", "size", "modified")
+
+    def __init__(self, stage: Usd.Stage, layers: List[Sdf.Layer], size: int, modified):
+        self.stage = stage
+        # Holding the layers keeps them in the layer registry, so they are
+        # neither read nor parsed again when the stage is swapped back in.
+        self.layers = layers
+        self.size = size
+        self.modified = modified
+
+
+class StagePool:
+    """
+    Least recently used pool of composed stages, keyed by the normalized
+    identifier of their root layer, see `key`.
+
+    The pool holds at most `max_stages` stages and, when `max_bytes` is not 0,
+    evicts the least recently used ones once the estimated size of their
+    layers exceeds it. The estimate is the size `omni.client.stat` reports
+    for every layer, local or remote, anonymous layers are counted as empty.
+    A pooled stage is dropped when the modification time of its root layer
+    has changed.
+    """
+    def __init__(self, max_stages: int = 0, max_bytes: int = 0):
+        self._max_stages = max_stages
+        self._max_bytes = max_bytes
+        self._stages: "OrderedDict[str, _PooledStage]" = OrderedDict()
+        self._hits: int = 0
+        self._misses: int = 0
+        self._evictions: int = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether the pool retains any stage."""
+        return self._max_stages > 0
+
+    @staticmethod
+    def key(url: str) -> str:
+        """Key of the stage whose root layer is at `url`."""
+        return omni.client.normalize_url(url)
+
+    def configure(self, max_stages: int, max_bytes: int) -> None:
+        """Updates the pool limits, evicting stages that no longer fit."""
+        self._max_stages = max_stages
+        self._max_bytes = max_bytes
+        self._evict()
+
+    async def get(self, url: str) -> Optional[Usd.Stage]:
+        """Returns the pooled stage of `url` and marks it as most recently used, if it is still current."""
+        key = self.key(url)
+        pooled = self._stages.get(key)
+        if pooled is not None:
+            entry = await self._stat(pooled.stage.GetRootLayer())
+            if entry is None or entry.modified_time != pooled.modified:
+                # The root layer changed, or went away, since it was pooled.
+                carb.log_info(f"Dropping outdated stage from the stage pool: {url}")
+                if self._stages.get(key) is pooled:
+                    del self._stages[key]
+                pooled = None
+        if pooled is None or self._stages.get(key) is not pooled:
+            self._misses += 1
+            return None
+        self._hits += 1
+        self._stages.move_to_end(key)
+        return pooled.stage
+
+    async def put(self, stage: Usd.Stage) -> None:
+        """Adds `stage` as the most recently used stage, evicting older ones as needed."""
+        if not self.enabled or not stage:
+            return
+        layers = list(stage.GetUsedLayers())
+        root_layer = stage.GetRootLayer()
+        # Layers are stat'ed concurrently, without blocking the main thread on remote ones.
+        entries = await asyncio.gather(*(self._stat(layer) for layer in layers))
+        size = sum(entry.size for entry in entries if entry is not None)
+        root_entry = entries[layers.index(root_layer)] if root_layer in layers else await self._stat(root_layer)
+        key = self.key(root_layer.identifier)
+        self._stages.pop(key, None)
+        self._stages[key] = _PooledStage(stage, layers, size, root_entry.modified_time if root_entry else None)
+        # The stage that was just added is kept even if it exceeds the memory ceiling on its own.
+        self._evict(keep=key)
+
+    def clear(self) -> None:
+        """Releases every pooled stage."""
+        self._stages.clear()
+
+    @property
+    def stats(self) -> dict:
+        """Hit, miss and eviction counters and the current content of the pool."""
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "evictions": self._evictions,
+            "stages": len(self._stages),
+            "bytes": sum(pooled.size for pooled in self._stages.values()),
+        }
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        total = sum(pooled.size for pooled in self._stages.values())
+        for key in list(self._stages):
+            over_count = len(self._stages) > self._max_stages
+            over_size = self._max_bytes > 0 and total > self._max_bytes
+            if not (over_count or over_size):
+                break
+            if key == keep:
+                continue
+            pooled = self._stages.pop(key)
+            total -= pooled.size
+            self._evictions += 1
+            carb.log_info(f"Evicted stage from the stage pool: {key}")
+
+    @staticmethod
+    async def _stat(layer: Sdf.Layer) -> Optional[omni.client.ListEntry]:
+        """The size and modification time of `layer`, None for anonymous layers or when it cannot be stat'ed."""
+        if layer.anonymous:
+            return None
+        result, entry = await omni.client.stat_async(layer.identifier)
+        return entry if result == omni.client.Result.OK else None
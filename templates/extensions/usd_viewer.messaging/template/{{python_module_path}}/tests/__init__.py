@@ -9,3 +9,4 @@
 # its affiliates is strictly prohibited.
 
 from .messaging_tests import *
+from .test_benchmarks import *
@@ -11,9 +11,12 @@
 from pathlib import Path
 from typing import Dict, List
 
+import carb.dictionary
 import carb.events
+import carb.settings
 import carb.tokens
 import omni.kit.app
+import omni.usd
 from carb.eventdispatcher import get_eventdispatcher, Event
 from omni.kit.test import AsyncTestCase
 
@@ -55,6 +58,14 @@ async def wait_stage_loading(wait_frames: int = 2, usd_context=None, timeout=100
         continue
 
 
+def payload_to_dict(event: Event) -> dict:
+    """Converts an event payload, including nested `carb.dictionary.Item` values, to a python dict."""
+    payload = {}
+    for key, value in dict(event.payload).items():
+        payload[key] = value.get_dict() if isinstance(value, carb.dictionary.Item) else value
+    return payload
+
+
 class MessagingTest(AsyncTestCase):
     async def setUp(self):
         self._app = omni.kit.app.get_app()
@@ -162,3 +173,930 @@ class MessagingTest(AsyncTestCase):
         await self._app.next_update_async()
 
         self.assertTrue(all(outgoing.values()))
+
+    async def test_get_children_paging(self):
+        """
+        Page through the children of a prim with offset and limit
+        """
+        responses: List[dict] = []
+
+        def on_children_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:getChildrenResponse",
+            event_name="getChildrenResponse",
+            on_event=on_children_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        self._ed.dispatch_event("getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh"], "limit": 1})
+        await self._app.next_update_async()
+        self._ed.dispatch_event(
+            "getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh"], "offset": 1, "limit": 1}
+        )
+        await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual(len(responses), 2)
+        first, second = responses
+        self.assertEqual(first["total_count"], 2)
+        self.assertTrue(first["has_more"])
+        # Small prims fit in a single time slice and are answered in one response.
+        self.assertTrue(first["final"])
+        self.assertEqual([child["path"] for child in first["children"]], ["/World/Cube"])
+        self.assertEqual(second["offset"], 1)
+        self.assertFalse(second["has_more"])
+        self.assertEqual([child["path"] for child in second["children"]], ["/World/Sphere"])
+
+    async def test_children_cache(self):
+        """
+        Repeated child requests are served from the cache until the prim changes
+        """
+        stats: List[dict] = []
+
+        def on_stats_response(event: Event) -> None:
+            stats.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:childrenCacheStatsResponse",
+            event_name="childrenCacheStatsResponse",
+            on_event=on_stats_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+        self._ed.dispatch_event("childrenCacheStatsQuery", payload={})
+        await self._app.next_update_async()
+
+        # A filter set no other test requests, so the first request is a miss.
+        for _ in range(2):
+            self._ed.dispatch_event("getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh", "xform"]})
+            await self._app.next_update_async()
+        self._ed.dispatch_event("childrenCacheStatsQuery", payload={})
+        await self._app.next_update_async()
+
+        # Adding a child resyncs it and invalidates the listing of its parent.
+        omni.usd.get_context().get_stage().DefinePrim("/World/Cone", "Cone")
+        self._ed.dispatch_event("getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh", "xform"]})
+        await self._app.next_update_async()
+        self._ed.dispatch_event("childrenCacheStatsQuery", payload={})
+        await self._app.next_update_async()
+        subscription = None
+
+        # Counters are cumulative, so compare against the first snapshot.
+        self.assertEqual(len(stats), 3)
+        initial, repeated, edited = stats
+        self.assertEqual(repeated["hits"] - initial["hits"], 1)
+        self.assertEqual(repeated["misses"] - initial["misses"], 1)
+        self.assertGreater(edited["invalidations"], repeated["invalidations"])
+        self.assertEqual(edited["misses"] - repeated["misses"], 1)
+
+    async def test_get_children_batch(self):
+        """
+        Expand several levels of the stage tree with a single request
+        """
+        responses: List[dict] = []
+
+        def on_batch_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:getChildrenBatchResponse",
+            event_name="getChildrenBatchResponse",
+            on_event=on_batch_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        self._ed.dispatch_event("getChildrenBatchRequest", payload={"prim_paths": ["/"], "depth": 2})
+        await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual(len(responses), 1)
+        self.assertFalse(responses[0]["truncated"])
+        results = {result["prim_path"]: result for result in responses[0]["results"]}
+        self.assertIn("/", results)
+        self.assertIn("/World", results)
+        self.assertIn("/World/Cube", [child["path"] for child in results["/World"]["children"]])
+
+    async def test_get_children_batch_time_sliced(self):
+        """
+        A batch that does not fit in the frame budget is answered over several frames
+        """
+        responses: List[dict] = []
+
+        def on_batch_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:getChildrenBatchResponse",
+            event_name="getChildrenBatchResponse",
+            on_event=on_batch_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        settings = carb.settings.get_settings()
+        budget_setting = "/exts/{{ extension_name }}/children_frame_budget_ms"
+        budget_ms = settings.get_as_float(budget_setting)
+        # A budget every step exceeds, one step runs per frame.
+        settings.set_float(budget_setting, 1e-6)
+        try:
+            self._ed.dispatch_event("getChildrenBatchRequest", payload={"prim_paths": ["/"], "depth": 2})
+            self.assertEqual(responses, [])
+            for _ in range(100):
+                if responses:
+                    break
+                await self._app.next_update_async()
+        finally:
+            settings.set_float(budget_setting, budget_ms)
+        subscription = None
+
+        self.assertEqual(len(responses), 1)
+        results = {result["prim_path"]: result for result in responses[0]["results"]}
+        self.assertIn("/World/Cube", [child["path"] for child in results["/World"]["children"]])
+
+    async def test_search_prims(self):
+        """
+        Find prims by name pattern and type through the stage index
+        """
+        responses: List[dict] = []
+
+        def on_search_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:searchPrimsResponse",
+            event_name="searchPrimsResponse",
+            on_event=on_search_response,
+        )
+
+        # The index is opt-in and built when the stage is attached.
+        settings = carb.settings.get_settings()
+        index_setting = "/exts/{{ extension_name }}/search_index_enabled"
+        settings.set_bool(index_setting, True)
+        try:
+            url = self._data_path / "testing.usd"
+            self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+            await wait_stage_loading(wait_frames=30)
+        finally:
+            settings.set_bool(index_setting, False)
+
+        self._ed.dispatch_event("searchPrimsRequest", payload={"query": "*cub*", "types": ["mesh"]})
+        await self._app.next_update_async()
+        self._ed.dispatch_event("searchPrimsRequest", payload={"query": "", "types": ["mesh"], "limit": 1})
+        await self._app.next_update_async()
+
+        # Prims resynced below a hidden subtree are not indexed either.
+        stage = omni.usd.get_context().get_stage()
+        stage.DefinePrim("/Render", "Scope")
+        await self._app.next_update_async()
+        stage.DefinePrim("/Render/Hidden/HiddenCube", "Cube")
+        stage.DefinePrim("/World/VisibleCube", "Cube")
+        for _ in range(10):
+            await self._app.next_update_async()
+        self._ed.dispatch_event("searchPrimsRequest", payload={"query": "*cube"})
+        await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual(len(responses), 3)
+        by_name, limited, resynced = responses
+        self.assertFalse(by_name["indexing"])
+        self.assertEqual([result["path"] for result in by_name["results"]], ["/World/Cube"])
+        self.assertEqual(len(limited["results"]), 1)
+        self.assertTrue(limited["truncated"])
+        self.assertEqual(
+            sorted(result["path"] for result in resynced["results"]), ["/World/Cube", "/World/VisibleCube"]
+        )
+
+    async def test_open_stage_supersession(self):
+        """
+        A newer openStageRequest cancels the pending one, requests for the same stage share one result
+        """
+        results: List[dict] = []
+
+        def on_opened_stage_result(event: Event) -> None:
+            results.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:openedStageResult",
+            event_name="openedStageResult",
+            on_event=on_opened_stage_result,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": (self._data_path / "missing.usd").as_posix(), "request_id": "first"})
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix(), "request_id": "second"})
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix(), "request_id": "third"})
+        for _ in range(300):
+            if len(results) == 2:
+                break
+            await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual(len(results), 2)
+        cancelled, opened = results
+        self.assertEqual(cancelled["request_id"], "first")
+        self.assertEqual(cancelled["result"], "cancelled")
+        self.assertEqual(opened["result"], "success")
+        self.assertEqual(list(opened["request_ids"]), ["second", "third"])
+
+    async def _open_stage_after_result(self, next_url: str) -> List[dict]:
+        """Opens testing.usd and sends an openStageRequest for `next_url` as soon as it is answered."""
+        results: List[dict] = []
+        url = self._data_path / "testing.usd"
+
+        def on_opened_stage_result(event: Event) -> None:
+            result = payload_to_dict(event)
+            results.append(result)
+            if list(result["request_ids"]) == ["first"]:
+                # Sent before the load answered has been cleared from the queue.
+                self._ed.dispatch_event("openStageRequest", payload={"url": next_url, "request_id": "second"})
+
+        # Another stage first, so that testing.usd is actually loaded.
+        self._ed.dispatch_event("openStageRequest", payload={"url": ""})
+        await wait_stage_loading(wait_frames=5)
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:openedStageResult",
+            event_name="openedStageResult",
+            on_event=on_opened_stage_result,
+        )
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix(), "request_id": "first"})
+        for _ in range(300):
+            if len(results) == 2:
+                break
+            await self._app.next_update_async()
+        # Nothing else is sent for either request.
+        for _ in range(10):
+            await self._app.next_update_async()
+        subscription = None
+        return results
+
+    async def test_open_same_stage_after_result(self):
+        """
+        A request for the stage that was just answered gets its own result
+        """
+        results = await self._open_stage_after_result((self._data_path / "testing.usd").as_posix())
+
+        self.assertEqual([(list(result["request_ids"]), result["result"]) for result in results], [
+            (["first"], "success"),
+            (["second"], "success"),
+        ])
+
+    async def test_open_other_stage_after_result(self):
+        """
+        A request for another stage does not cancel the load that was just answered
+        """
+        results = await self._open_stage_after_result((self._data_path / "missing.usd").as_posix())
+
+        self.assertEqual([(list(result["request_ids"]), result["result"]) for result in results], [
+            (["first"], "success"),
+            (["second"], "error"),
+        ])
+
+    @staticmethod
+    def _create_payload_stage(directory: str) -> str:
+        """Writes a stage with payloads on /World/A and /World/B, B being 10 units away along X."""
+        import os
+        from pxr import Gf, Usd, UsdGeom
+
+        inner = Usd.Stage.CreateNew(os.path.join(directory, "inner.usda"))
+        root = UsdGeom.Xform.Define(inner, "/Root")
+        UsdGeom.Cube.Define(inner, "/Root/Cube")
+        inner.SetDefaultPrim(root.GetPrim())
+        inner.Save()
+        outer = Usd.Stage.CreateNew(os.path.join(directory, "outer.usda"))
+        for name, offset in (("A", 0.0), ("B", 10.0)):
+            xform = UsdGeom.Xform.Define(outer, f"/World/{name}")
+            xform.AddTranslateOp().Set(Gf.Vec3d(offset, 0.0, 0.0))
+            UsdGeom.ModelAPI.Apply(xform.GetPrim()).SetExtentsHint([(0, 0, 0), (1, 1, 1)])
+            xform.GetPrim().GetPayloads().AddPayload("./inner.usda")
+        outer.Save()
+        return outer.GetRootLayer().identifier
+
+    async def test_load_options(self):
+        """
+        Payload selections are read from dispatched payloads and applied by prim path, depth and bounds
+        """
+        import tempfile
+        from pxr import Usd
+        from ..payload_loading import LoadOptions
+
+        options: List[LoadOptions] = []
+        # Dispatched lists reach the handlers as carb.dictionary.Item values.
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:loadOptions",
+            event_name="MessagingTest:loadOptions",
+            on_event=lambda event: options.append(LoadOptions.from_payload(dict(event.payload))),
+        )
+        self._ed.dispatch_event("MessagingTest:loadOptions", payload={
+            "payloads": ["/World/A", "/World/A"],
+            "load_bounds": {"min": [-1, -1, -1], "max": [2, 2, 2]},
+        })
+        subscription = None
+        self.assertEqual(len(options), 1)
+        self.assertFalse(options[0].load_all)
+        self.assertEqual(options[0].payloads, ("/World/A",))
+        self.assertEqual(options[0].bounds, ((-1.0, -1.0, -1.0), (2.0, 2.0, 2.0)))
+        self.assertTrue(LoadOptions.from_payload({}).load_all)
+        for invalid in ({"load_set": "some"}, {"payloads": ["World A"]}, {"load_bounds": {"min": [0, 0]}}):
+            with self.assertRaises(ValueError):
+                LoadOptions.from_payload(invalid)
+
+        with tempfile.TemporaryDirectory() as directory:
+            stage = Usd.Stage.Open(self._create_payload_stage(directory))
+
+            def loaded(options: LoadOptions) -> List[str]:
+                options.apply(stage)
+                return sorted(str(path) for path in stage.GetLoadSet())
+
+            self.assertEqual(loaded(LoadOptions(payloads=["/World/B"])), ["/World/B"])
+            self.assertEqual(loaded(LoadOptions(depth=1)), [])
+            self.assertEqual(loaded(LoadOptions(depth=2)), ["/World/A", "/World/B"])
+            self.assertEqual(loaded(LoadOptions(bounds=((-1, -1, -1), (2, 2, 2)))), ["/World/A"])
+            self.assertEqual(loaded(LoadOptions()), ["/World/A", "/World/B"])
+            stage = None
+
+    async def test_load_unload_payloads(self):
+        """
+        Payloads are loaded and unloaded per client request once the stage has opened
+        """
+        import tempfile
+
+        responses: List[dict] = []
+        subscriptions = [
+            self._ed.observe_event(
+                observer_name=f"MessagingTest:{event_name}",
+                event_name=event_name,
+                on_event=lambda event: responses.append(payload_to_dict(event)),
+            )
+            for event_name in ("openedStageResult", "loadPayloadsResponse", "unloadPayloadsResponse")
+        ]
+
+        def load_set() -> List[str]:
+            return sorted(str(path) for path in omni.usd.get_context().get_stage().GetLoadSet())
+
+        with tempfile.TemporaryDirectory() as directory:
+            url = self._create_payload_stage(directory)
+            self._ed.dispatch_event("openStageRequest", payload={"url": url, "payloads": ["/World/A"]})
+            for _ in range(300):
+                if responses:
+                    break
+                await self._app.next_update_async()
+            self.assertEqual(responses.pop()["result"], "success")
+            self.assertEqual(load_set(), ["/World/A"])
+
+            self._ed.dispatch_event("loadPayloadsRequest", payload={"paths": ["/World/B"], "request_id": "load"})
+            response = responses.pop()
+            self.assertEqual((response["result"], response["request_id"]), ("success", "load"))
+            self.assertEqual(list(response["paths"]), ["/World/B"])
+            self.assertEqual(load_set(), ["/World/A", "/World/B"])
+
+            self._ed.dispatch_event("unloadPayloadsRequest", payload={"paths": ["/World/A", "World A"]})
+            self.assertEqual(responses.pop()["result"], "error")
+            self.assertEqual(load_set(), ["/World/A", "/World/B"])
+            self._ed.dispatch_event("unloadPayloadsRequest", payload={"paths": ["/World/A"]})
+            self.assertEqual(responses.pop()["result"], "success")
+            self.assertEqual(load_set(), ["/World/B"])
+
+            # Releases the layers before the directory is removed.
+            self._ed.dispatch_event("openStageRequest", payload={"url": ""})
+            await wait_stage_loading(wait_frames=5)
+        subscriptions = None
+
+    async def test_encode_paths(self):
+        """
+        Front coded paths decode back to the same paths in the same order
+        """
+        from ..encoding import decode_paths, encode_paths
+
+        paths = ["/World/B/Mesh_1", "/World/B/Mesh_0", "/World/A", "/World/B/Mesh_10", "/World/A"]
+        encoded = encode_paths(paths)
+        self.assertEqual(encoded["prefix_lengths"], [0, 14, 7, 7, 7])
+        self.assertEqual(decode_paths(encoded), paths)
+        self.assertEqual(decode_paths(encode_paths([])), [])
+        with self.assertRaises(ValueError):
+            decode_paths({"prefix_lengths": [3], "suffixes": ["/A"]})
+
+    async def test_select_prims_ops(self):
+        """
+        Add to and remove from the selection with prefix encoded paths
+        """
+        from ..encoding import encode_paths
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+        selection = omni.usd.get_context().get_selection()
+
+        self._ed.dispatch_event("selectPrimsRequest", payload={"paths": ["/World/Cube"]})
+        await self._app.next_update_async()
+        self._ed.dispatch_event("selectPrimsRequest", payload={"op": "add", "paths": encode_paths(["/World/Sphere"])})
+        await self._app.next_update_async()
+        self.assertEqual(sorted(selection.get_selected_prim_paths()), ["/World/Cube", "/World/Sphere"])
+
+        self._ed.dispatch_event("selectPrimsRequest", payload={"op": "remove", "paths": ["/World/Cube"]})
+        await self._app.next_update_async()
+        self.assertEqual(selection.get_selected_prim_paths(), ["/World/Sphere"])
+
+        self._ed.dispatch_event("selectPrimsRequest", payload={"op": "clear"})
+        await self._app.next_update_async()
+        self.assertEqual(selection.get_selected_prim_paths(), [])
+
+    async def test_select_prims_seq(self):
+        """
+        A request with an invalid seq is rejected, a stale one gets a snapshot of the updated selection
+        """
+        messages: List[dict] = []
+        subscriptions = [
+            self._ed.observe_event(
+                observer_name=f"MessagingTest:{event_name}",
+                event_name=event_name,
+                on_event=lambda event: messages.append(dict(payload_to_dict(event), event=event.event_name)),
+            )
+            for event_name in ("selectPrimsResponse", "stageSelectionChanged")
+        ]
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+        selection = omni.usd.get_context().get_selection()
+        selection.clear_selected_prim_paths()
+        await self._app.next_update_async()
+        messages.clear()
+
+        self._ed.dispatch_event("selectPrimsRequest", payload={"paths": ["/World/Cube"], "seq": "latest", "request_id": 3})
+        self.assertEqual(selection.get_selected_prim_paths(), [])
+        self.assertEqual(len(messages), 1)
+        self.assertEqual((messages[0]["event"], messages[0]["result"], messages[0]["request_id"]), ("selectPrimsResponse", "error", 3))
+
+        messages.clear()
+        self._ed.dispatch_event("selectPrimsRequest", payload={"paths": ["/World/Cube", "/World/Sphere"], "seq": -1})
+        snapshot = messages[0]
+        self.assertEqual((snapshot["event"], snapshot["op"]), ("stageSelectionChanged", "snapshot"))
+        self.assertEqual(sorted(snapshot["paths"]), ["/World/Cube", "/World/Sphere"])
+        self.assertEqual(snapshot["count"], 2)
+        selection.clear_selected_prim_paths()
+        await self._app.next_update_async()
+        subscriptions = None
+
+    async def test_make_prims_pickable(self):
+        """
+        Pickability is set on subtrees given by path or matched by glob and regex patterns
+        """
+        from pxr import Sdf, UsdGeom
+        from ..stage_management import StageManager
+
+        responses: List[dict] = []
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:makePrimsPickableResponse",
+            event_name="makePrimsPickableResponse",
+            on_event=lambda event: responses.append(payload_to_dict(event)),
+        )
+
+        async def make_pickable(payload: dict) -> dict:
+            responses.clear()
+            self._ed.dispatch_event("makePrimsPickable", payload=payload)
+            for _ in range(100):
+                if responses:
+                    break
+                await self._app.next_update_async()
+            self.assertEqual(len(responses), 1)
+            return responses[0]
+
+        opened: List[dict] = []
+        opened_subscription = self._ed.observe_event(
+            observer_name="MessagingTest:openedStageResult",
+            event_name="openedStageResult",
+            on_event=lambda event: opened.append(payload_to_dict(event)),
+        )
+        self._ed.dispatch_event("openStageRequest", payload={"url": ""})
+        for _ in range(300):
+            if opened:
+                break
+            await self._app.next_update_async()
+        opened_subscription = None
+        stage = omni.usd.get_context().get_stage()
+        for index in range(3):
+            UsdGeom.Xform.Define(stage, f"/Test/Assembly_{index}")
+            for part in range(4):
+                UsdGeom.Mesh.Define(stage, f"/Test/Assembly_{index}/Part_{part}")
+
+        # Nested paths are covered by their ancestor, the whole subtree is counted once.
+        response = await make_pickable({"paths": ["/Test/Assembly_0", "/Test/Assembly_0/Part_1"], "request_id": 1})
+        self.assertEqual((response["result"], response["count"], response["request_id"]), ("success", 5, 1))
+
+        response = await make_pickable({"patterns": ["*/Part_[12]", "/Test/Assembly_2"], "pickable": False})
+        self.assertEqual((response["result"], response["count"], response["pickable"]), ("success", 9, False))
+        response = await make_pickable({"patterns": [".*Assembly_1"], "pattern_type": "regex"})
+        self.assertEqual(response["count"], 5)
+        response = await make_pickable({"patterns": ["("], "pattern_type": "regex"})
+        self.assertEqual((response["result"], response["count"]), ("error", 0))
+        response = await make_pickable({"paths": ["not a path"]})
+        self.assertEqual(response["result"], "error")
+        subscription = None
+
+        matchers = StageManager._path_matchers(["*/Part_3"], "glob")
+        work = StageManager._pickable_steps(stage, [Sdf.Path("/Test/Assembly_1")], matchers)
+        while True:
+            try:
+                next(work)
+            except StopIteration as stop:
+                roots, count = stop.value
+                break
+        self.assertEqual(sorted(map(str, roots)), [
+            "/Test/Assembly_0/Part_3", "/Test/Assembly_1", "/Test/Assembly_2/Part_3",
+        ])
+        self.assertEqual(count, 7)
+
+    async def test_get_children_compact(self):
+        """
+        Request children with the compact encoding and decode them back
+        """
+        from ..encoding import decode_children
+
+        responses: List[dict] = []
+
+        def on_children_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:getChildrenResponse",
+            event_name="getChildrenResponse",
+            on_event=on_children_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        self._ed.dispatch_event(
+            "getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh"], "encoding": "compact"}
+        )
+        for _ in range(10):
+            if responses:
+                break
+            await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual(len(responses), 1)
+        self.assertEqual(responses[0]["encoding"], "compact")
+        children = decode_children(responses[0])
+        self.assertEqual([child["path"] for child in children], ["/World/Cube", "/World/Sphere"])
+
+    async def test_camera_bookmarks(self):
+        """
+        Save a camera bookmark, reset the camera and restore the bookmark
+        """
+        from omni.kit.viewport.utility import get_active_viewport_camera_string
+        from pxr import Gf, Usd, UsdGeom
+
+        responses: List[dict] = []
+
+        def on_bookmark_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:cameraBookmarkResponse",
+            event_name="cameraBookmarkResponse",
+            on_event=on_bookmark_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        stage = omni.usd.get_context().get_stage()
+        camera = stage.GetPrimAtPath(get_active_viewport_camera_string())
+        focal_length = UsdGeom.Camera(camera).GetFocalLengthAttr()
+        initial = focal_length.Get()
+        with Usd.EditContext(stage, stage.GetSessionLayer()):
+            focal_length.Set(initial * 2.0)
+
+        self._ed.dispatch_event("cameraBookmarkRequest", payload={"op": "save", "name": "zoomed"})
+        await self._app.next_update_async()
+        self._ed.dispatch_event("resetStage", payload={})
+        await self._app.next_update_async()
+        self.assertTrue(Gf.IsClose(focal_length.Get(), initial, 1e-4))
+
+        self._ed.dispatch_event("cameraBookmarkRequest", payload={"op": "restore", "name": "zoomed", "duration": 0.1})
+        for _ in range(100):
+            if len(responses) == 2:
+                break
+            await self._app.next_update_async()
+        subscription = None
+
+        self.assertEqual([response["result"] for response in responses], ["success", "success"])
+        self.assertEqual(responses[-1]["bookmarks"], ["default", "zoomed"])
+        self.assertTrue(Gf.IsClose(focal_length.Get(), initial * 2.0, 1e-4))
+
+    async def test_camera_state_interpolation(self):
+        """
+        Euler rotations take the shortest way, unchanged attributes are not authored, the default slot is kept
+        """
+        from pxr import Gf, Usd, UsdGeom
+        from ..camera_bookmarks import CameraState, author_camera_state
+
+        stage = Usd.Stage.CreateInMemory()
+        camera = UsdGeom.Camera.Define(stage, "/Camera")
+        rotate = camera.AddRotateXYZOp()
+        rotate.Set(Gf.Vec3d(0.0, 170.0, 10.0))
+        camera.GetFocalLengthAttr().Set(50.0)
+        start = CameraState.capture(camera.GetPrim())
+        rotate.Set(Gf.Vec3d(0.0, -170.0, 20.0))
+        camera.GetFocalLengthAttr().Set(100.0)
+        end = CameraState.capture(camera.GetPrim())
+
+        middle = start.interpolate(end, 0.5)
+        rotation = middle.values["xformOp:rotateXYZ"][2]
+        self.assertTrue(Gf.IsClose(Gf.Vec3d(0.0, abs(rotation[1]), rotation[2]), Gf.Vec3d(0.0, 180.0, 15.0), 1e-6))
+        self.assertAlmostEqual(middle.values["focalLength"][2], 75.0)
+        self.assertEqual(start.interpolate(end, 1.0).values["xformOp:rotateXYZ"][2], Gf.Vec3d(0.0, -170.0, 20.0))
+
+        # Only the rotation and focal length differ from the current state.
+        self.assertEqual(author_camera_state(stage, "/Camera", middle), 2)
+        self.assertEqual(author_camera_state(stage, "/Camera", middle), 0)
+        self.assertAlmostEqual(camera.GetFocalLengthAttr().Get(), 75.0)
+
+        responses: List[dict] = []
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:cameraBookmarkResponse",
+            event_name="cameraBookmarkResponse",
+            on_event=lambda event: responses.append(payload_to_dict(event)),
+        )
+        for op in ("save", "delete"):
+            self._ed.dispatch_event("cameraBookmarkRequest", payload={"op": op, "name": "default"})
+        subscription = None
+        self.assertEqual([(response["op"], response["result"]) for response in responses], [
+            ("save", "error"),
+            ("delete", "error"),
+        ])
+
+    async def test_client_sessions(self):
+        """
+        Two clients with different encodings get their own, tagged responses
+        """
+        responses: List[dict] = []
+
+        def on_children_response(event: Event) -> None:
+            responses.append(payload_to_dict(event))
+
+        subscription = self._ed.observe_event(
+            observer_name="MessagingTest:getChildrenResponse",
+            event_name="getChildrenResponse",
+            on_event=on_children_response,
+        )
+
+        url = self._data_path / "testing.usd"
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix()})
+        await wait_stage_loading(wait_frames=30)
+
+        self._ed.dispatch_event("setEncodingRequest", payload={"encoding": "compact", "client_id": "viewer-a"})
+        for client_id in ("viewer-a", "viewer-b"):
+            self._ed.dispatch_event(
+                "getChildrenRequest", payload={"prim_path": "/World", "filters": ["mesh"], "client_id": client_id}
+            )
+        for _ in range(10):
+            if len(responses) == 2:
+                break
+            await self._app.next_update_async()
+        subscription = None
+        self._ed.dispatch_event("setEncodingRequest", payload={"encoding": "json", "client_id": "viewer-a"})
+
+        by_client = {response["client_id"]: response for response in responses}
+        self.assertEqual(sorted(by_client), ["viewer-a", "viewer-b"])
+        self.assertEqual(by_client["viewer-a"].get("encoding"), "compact")
+        self.assertNotIn("encoding", by_client["viewer-b"])
+
+    async def test_time_sliced_work(self):
+        """
+        Work over the frame budget is spread over several frames, cancelled work closes its generator
+        """
+        import asyncio
+        import time
+        from ..time_slicing import TimeSlicedWork
+
+        closed: List[bool] = []
+
+        def steps():
+            try:
+                for index in range(10):
+                    time.sleep(0.002)
+                    yield index if index % 2 else None
+                return "done"
+            finally:
+                closed.append(True)
+
+        # Without a budget, the whole work runs in a single slice.
+        work = TimeSlicedWork(steps())
+        self.assertTrue(work.run_slice())
+        self.assertEqual((work.take_items(), work.result), ([1, 3, 5, 7, 9], "done"))
+        self.assertEqual(work.items, [])
+
+        work = TimeSlicedWork(steps(), budget_ms=5.0)
+        self.assertFalse(work.run_slice())
+        self.assertLess(len(work.items), 5)
+        slices: List[int] = []
+        await work.run_remaining(lambda work: slices.append(len(work.items)))
+        self.assertTrue(work.done)
+        self.assertEqual((work.items, work.result), ([1, 3, 5, 7, 9], "done"))
+        self.assertGreater(len(slices), 1)
+        self.assertEqual(slices, sorted(slices))
+
+        work = TimeSlicedWork(steps(), budget_ms=1.0)
+        work.run_slice()
+        task = asyncio.ensure_future(work.run_remaining(lambda work: None))
+        await self._app.next_update_async()
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+        self.assertFalse(work.done)
+        self.assertEqual(closed, [True, True, True])
+
+    async def test_progress_coalescing(self):
+        """
+        Bursts of status bar updates reach the client as the latest progress and the distinct activities
+        """
+        import time
+        from ..stage_loading import LoadingManager
+
+        progress: List[dict] = []
+        activities: List[dict] = []
+        subscriptions = [
+            self._ed.observe_event(
+                observer_name="MessagingTest:updateProgressAmount",
+                event_name="updateProgressAmount",
+                on_event=lambda event: progress.append(payload_to_dict(event)),
+            ),
+            self._ed.observe_event(
+                observer_name="MessagingTest:updateProgressActivity",
+                event_name="updateProgressActivity",
+                on_event=lambda event: activities.append(payload_to_dict(event)),
+            ),
+        ]
+
+        settings = carb.settings.get_settings()
+        rate_setting = "/exts/{{ extension_name }}/progress_update_rate"
+        rate = settings.get_as_float(rate_setting)
+        settings.set_float(rate_setting, 10.0)
+        manager = LoadingManager()
+        # Updates are only forwarded while a stage is loaded from storage.
+        manager._persisted_stage = True
+        try:
+            for index in range(100):
+                self._ed.dispatch_event("omni.kit.window.status_bar@progress", payload={"progress": index})
+            for text in ("Loading a", "Loading b", "Loading a"):
+                self._ed.dispatch_event("omni.kit.window.status_bar@activity", payload={"text": text})
+            await self._app.next_update_async()
+            for index in range(100, 200):
+                self._ed.dispatch_event("omni.kit.window.status_bar@progress", payload={"progress": index})
+            deadline = time.monotonic() + 0.5
+            while time.monotonic() < deadline:
+                await self._app.next_update_async()
+        finally:
+            manager.on_shutdown()
+            settings.set_float(rate_setting, rate)
+        subscriptions = None
+
+        # The first burst is flushed right away, the second one at the next tick.
+        self.assertEqual([update["progress"] for update in progress], [99, 199])
+        self.assertEqual(len(activities), 1)
+        self.assertEqual(activities[0]["text"], "Loading a")
+        self.assertEqual(list(activities[0]["activities"]), ["Loading b", "Loading a"])
+
+    async def test_stage_pool(self):
+        """
+        Pooled stages are keyed by their root layer, evicted by count and size, and dropped once modified
+        """
+        import os
+        import tempfile
+        from pxr import Usd
+        from ..stage_pool import StagePool
+
+        with tempfile.TemporaryDirectory() as directory:
+            stages = []
+            for name in ("a", "b"):
+                stage = Usd.Stage.CreateNew(os.path.join(directory, f"{name}.usda"))
+                stage.DefinePrim(f"/{name}")
+                stage.Save()
+                stages.append(stage)
+            url_a, url_b = (stage.GetRootLayer().identifier for stage in stages)
+
+            pool = StagePool(max_stages=1)
+            await pool.put(stages[0])
+            await pool.put(stages[0])
+            self.assertEqual(pool.stats["stages"], 1)
+            self.assertGreater(pool.stats["bytes"], 0)
+            self.assertIs(await pool.get(url_a), stages[0])
+            await pool.put(stages[1])
+            self.assertIsNone(await pool.get(url_a))
+            self.assertIs(await pool.get(url_b), stages[1])
+            self.assertEqual(pool.stats["evictions"], 1)
+
+            # The stage that was just added is kept even when it alone exceeds the ceiling.
+            pool.configure(max_stages=2, max_bytes=1)
+            await pool.put(stages[0])
+            self.assertEqual(pool.stats["stages"], 1)
+            self.assertIs(await pool.get(url_a), stages[0])
+
+            modified = os.path.getmtime(url_a) + 10
+            os.utime(url_a, (modified, modified))
+            self.assertIsNone(await pool.get(url_a))
+            self.assertEqual(pool.stats["stages"], 0)
+            self.assertEqual((pool.stats["hits"], pool.stats["misses"]), (3, 2))
+
+    async def test_message_metrics(self):
+        """
+        Message rates are counted whatever the number of samples kept, payload sizes are sampled
+        """
+        from ..instrumentation import MAX_SAMPLES, PAYLOAD_SIZE_SAMPLE_INTERVAL, MessageMetrics
+
+        settings = carb.settings.get_settings()
+        enabled_setting = "/exts/{{ extension_name }}/metrics_enabled"
+        window_setting = "/exts/{{ extension_name }}/metrics_window"
+        enabled = settings.get_as_bool(enabled_setting)
+        window = settings.get_as_float(window_setting)
+        settings.set_bool(enabled_setting, True)
+        settings.set_float(window_setting, 60.0)
+        try:
+            metrics = MessageMetrics()
+            handled: List[str] = []
+            handler = metrics.instrument("testRequest", lambda event: handled.append(event.event_name))
+            subscription = self._ed.observe_event(
+                observer_name="MessagingTest:testRequest", event_name="testRequest", on_event=handler
+            )
+            for _ in range(3):
+                self._ed.dispatch_event("testRequest", payload={"value": 1})
+            subscription = None
+
+            count = 2 * MAX_SAMPLES
+            for _ in range(count):
+                metrics.record("testResponse", "outgoing", {"value": "x" * 10})
+            snapshot = metrics.snapshot()
+        finally:
+            settings.set_bool(enabled_setting, enabled)
+            settings.set_float(window_setting, window)
+
+        self.assertEqual(handled, ["testRequest"] * 3)
+        incoming = snapshot["events"]["testRequest"]
+        self.assertEqual((incoming["direction"], incoming["total_count"]), ("incoming", 3))
+        self.assertEqual(incoming["handler_ms"]["count"], 3)
+        outgoing = snapshot["events"]["testResponse"]
+        self.assertEqual(outgoing["total_count"], count)
+        self.assertAlmostEqual(outgoing["rate"], count / 60.0)
+        self.assertEqual(outgoing["payload_bytes"]["count"], count // PAYLOAD_SIZE_SAMPLE_INTERVAL)
+        self.assertEqual(outgoing["payload_bytes"]["max"], len('{"value":"xxxxxxxxxx"}'))
+
+    async def test_layer_prefetch(self):
+        """
+        A layer tree is fetched once per layer, missing layers are skipped and max_layers caps the fetch
+        """
+        import os
+        import tempfile
+        from pxr import Sdf
+        from ..layer_prefetch import LayerPrefetcher, is_remote_url
+
+        with tempfile.TemporaryDirectory() as directory:
+            leaf = Sdf.Layer.CreateNew(os.path.join(directory, "leaf.usda"))
+            Sdf.CreatePrimInLayer(leaf, "/Leaf").specifier = Sdf.SpecifierDef
+            leaf.Save()
+            for index in range(3):
+                sublayer = Sdf.Layer.CreateNew(os.path.join(directory, f"sub_{index}.usda"))
+                prim = Sdf.CreatePrimInLayer(sublayer, f"/Sub_{index}")
+                prim.specifier = Sdf.SpecifierDef
+                # Every sublayer references the same leaf, which is fetched once.
+                prim.referenceList.Prepend(Sdf.Reference("./leaf.usda", "/Leaf"))
+                sublayer.Save()
+            root = Sdf.Layer.CreateNew(os.path.join(directory, "root.usda"))
+            root.subLayerPaths = [f"./sub_{index}.usda" for index in range(3)] + ["./missing.usda"]
+            root.Save()
+            root_url = root.identifier
+            leaf = sublayer = prim = root = None
+
+            prefetcher = LayerPrefetcher(workers=2)
+            layers = await prefetcher.prefetch(root_url)
+            names = sorted(os.path.basename(layer.realPath) for layer in layers)
+            self.assertEqual(names, ["leaf.usda", "root.usda", "sub_0.usda", "sub_1.usda", "sub_2.usda"])
+            self.assertGreater(prefetcher.bytes_read, 0)
+
+            # The root and one of its dependencies, which may be the missing one.
+            prefetcher = LayerPrefetcher(workers=2, max_layers=2)
+            layers = await prefetcher.prefetch(root_url)
+            self.assertIn(len(layers), (1, 2))
+            self.assertEqual(os.path.basename(layers[0].realPath), "root.usda")
+            layers = None
+
+        self.assertTrue(is_remote_url("omniverse://localhost/Projects/stage.usd"))
+        self.assertTrue(is_remote_url("https://example.com/stage.usd"))
+        self.assertFalse(is_remote_url("C:/Projects/stage.usd"))
+        self.assertFalse(is_remote_url("file:/Projects/stage.usd"))
+        self.assertFalse(is_remote_url("/Projects/stage.usd"))
@@ -0,0 +1,184 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import math
+import tempfile
+import time
+from collections import deque
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import carb.settings
+import omni.kit.app
+import omni.usd
+from carb.eventdispatcher import get_eventdispatcher, Event
+from omni.kit.test import BenchmarkTestCase
+from pxr import Sdf
+
+
+SETTINGS_PATH = "/exts/{{ extension_name }}/benchmark/"
+# Frames longer than this are counted as stalled.
+STALL_THRESHOLD_MS = 50.0
+# Frames to wait for a response before giving up.
+MAX_WAIT_FRAMES = 10000
+
+
+def generate_stage(directory: Path, prim_count: int, depth: int, layer_count: int) -> Path:
+    """
+    Writes a synthetic stage of about `prim_count` prims, `depth` levels
+    below `/World`, spread over `layer_count` sublayers of a root layer.
+
+    Prims are created breadth first with the same number of children each,
+    the deepest ones being cubes and the others xforms. Consecutive prims go
+    to different sublayers, so every layer contributes to most subtrees.
+    """
+    depth = max(depth, 1)
+    layer_count = max(layer_count, 1)
+    fanout = max(math.ceil(prim_count ** (1.0 / depth)), 2)
+
+    layers = [Sdf.Layer.CreateNew(str(directory / f"layer_{index}.usdc")) for index in range(layer_count)]
+    root = Sdf.Layer.CreateNew(str(directory / "root.usda"))
+    root.subLayerPaths = [f"./layer_{index}.usdc" for index in range(layer_count)]
+
+    world = Sdf.CreatePrimInLayer(root, "/World")
+    world.specifier = Sdf.SpecifierDef
+    world.typeName = "Xform"
+    root.defaultPrim = "World"
+
+    created = 0
+    parents = deque([(Sdf.Path("/World"), 0)])
+    with Sdf.ChangeBlock():
+        while parents and created < prim_count:
+            parent, level = parents.popleft()
+            for index in range(fanout):
+                if created >= prim_count:
+                    break
+                path = parent.AppendChild(f"Prim_{index}")
+                spec = Sdf.CreatePrimInLayer(layers[created % layer_count], path)
+                spec.specifier = Sdf.SpecifierDef
+                spec.typeName = "Xform" if level + 1 < depth else "Cube"
+                created += 1
+                if level + 1 < depth:
+                    parents.append((path, level + 1))
+
+    for layer in layers + [root]:
+        layer.Save()
+    return directory / "root.usda"
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak resident memory of the process in megabytes, if the platform reports it."""
+    try:
+        import resource
+        import sys
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Reported in bytes on macOS and kilobytes elsewhere.
+        return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+    except ImportError:
+        pass
+    try:
+        import psutil
+
+        memory = psutil.Process().memory_info()
+        return getattr(memory, "peak_wset", memory.rss) / (1024.0 * 1024.0)
+    except ImportError:
+        return None
+
+
+class TestLoadBenchmarks(BenchmarkTestCase):
+    """
+    Measures the stage load path of the streaming viewer end to end, through
+    the same messages a streaming client sends.
+
+    The synthetic stages are sized by the `benchmark/prim_count`,
+    `benchmark/depth` and `benchmark/layer_count` settings of the extension,
+    so CI can run larger stages than the defaults, for example with
+    `--/exts/{{ extension_name }}/benchmark/prim_count=100000`.
+    """
+
+    async def setUp(self):
+        self._app = omni.kit.app.get_app()
+        self._ed = get_eventdispatcher()
+        # Names and payloads of the responses received so far.
+        self._responses: List[Tuple[str, dict]] = []
+        self._subscriptions = [
+            self._ed.observe_event(
+                observer_name=f"TestLoadBenchmarks:{event_name}",
+                event_name=event_name,
+                on_event=self._on_response,
+            )
+            for event_name in ("openedStageResult", "getChildrenResponse")
+        ]
+        self._temp_dir = tempfile.TemporaryDirectory()
+
+    async def tearDown(self):
+        self._subscriptions.clear()
+        # Release the stage before its layers are deleted.
+        await omni.usd.get_context().new_stage_async()
+        self._temp_dir.cleanup()
+
+    def _on_response(self, event: Event) -> None:
+        self._responses.append((event.event_name, dict(event.payload)))
+
+    def _setting(self, name: str, default: int) -> int:
+        value = carb.settings.get_settings().get_as_int(SETTINGS_PATH + name)
+        return value if value > 0 else default
+
+    async def _wait_for(self, event_name: str, frame_times: List[float]) -> Optional[dict]:
+        """Waits for the next `event_name` payload, recording the duration of every frame meanwhile."""
+        for _ in range(MAX_WAIT_FRAMES):
+            for response in self._responses:
+                if response[0] == event_name:
+                    self._responses.remove(response)
+                    return response[1]
+            start = time.perf_counter()
+            await self._app.next_update_async()
+            frame_times.append((time.perf_counter() - start) * 1000.0)
+        return None
+
+    async def _benchmark_load(self, prim_count: int, depth: int, layer_count: int) -> None:
+        url = generate_stage(Path(self._temp_dir.name), prim_count, depth, layer_count)
+        frame_times: List[float] = []
+
+        start = time.perf_counter()
+        self._ed.dispatch_event("openStageRequest", payload={"url": url.as_posix(), "request_id": "benchmark"})
+        result = await self._wait_for("openedStageResult", frame_times)
+        load_latency = time.perf_counter() - start
+        self.assertIsNotNone(result, "openedStageResult was not received")
+        self.assertEqual(result["result"], "success")
+
+        self._ed.dispatch_event("getChildrenRequest", payload={"prim_path": "/World", "chunked": True})
+        response = await self._wait_for("getChildrenResponse", frame_times)
+        first_children = time.perf_counter() - start
+        self.assertIsNotNone(response, "getChildrenResponse was not received")
+
+        self.set_metric_sample(name="prim_count", value=prim_count)
+        self.set_metric_sample(name="load_latency", value=load_latency, unit="s")
+        self.set_metric_sample(name="time_to_first_children", value=first_children, unit="s")
+        self.set_metric_sample(
+            name="frames_stalled", value=sum(1 for frame_time in frame_times if frame_time > STALL_THRESHOLD_MS)
+        )
+        self.set_metric_sample(name="max_frame_time", value=max(frame_times, default=0.0), unit="ms")
+        rss = peak_rss_mb()
+        if rss is not None:
+            self.set_metric_sample(name="peak_rss", value=rss, unit="MB")
+
+    async def benchmark_stage_load(self):
+        """Loads a nested stage and lists the children of its root prim."""
+        await self._benchmark_load(
+            self._setting("prim_count", 10000),
+            self._setting("depth", 4),
+            self._setting("layer_count", 4),
+        )
+
+    async def benchmark_stage_load_wide(self):
+        """Loads a stage with every prim directly below `/World`, the worst case for child listings."""
+        await self._benchmark_load(self._setting("prim_count", 10000), 1, 1)
@@ -0,0 +1,64 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import time
+from typing import Any, Callable, Generator, List
+
+import omni.kit.app
+
+
+class TimeSlicedWork:
+    """
+    Runs a generator one step at a time, in slices that each fit within a
+    per-frame time budget, so long traversals never block the render loop.
+
+    Every value the generator yields that is not `None` is collected in
+    `items`, the value it returns is stored in `result` once it is done.
+    """
+    def __init__(self, steps: Generator, budget_ms: float = float("inf")):
+        self._steps = steps
+        self._budget = budget_ms / 1000.0
+        self.items: List[Any] = []
+        self.result: Any = None
+        self.done: bool = False
+
+    def run_slice(self) -> bool:
+        """Runs steps until the budget is used up. Returns True once the generator is exhausted."""
+        deadline = time.perf_counter() + self._budget
+        try:
+            while True:
+                item = next(self._steps)
+                if item is not None:
+                    self.items.append(item)
+                if time.perf_counter() >= deadline:
+                    return False
+        except StopIteration as stop:
+            self.result = stop.value
+            self.done = True
+            return True
+
+    def take_items(self) -> List[Any]:
+        """Returns the items collected since the last call and clears them."""
+        items, self.items = self.items, []
+        return items
+
+    async def run_remaining(self, on_slice: Callable[["TimeSlicedWork"], None]) -> None:
+        """
+        Runs one slice per app update until the generator is exhausted,
+        calling `on_slice` after each slice.
+        """
+        app = omni.kit.app.get_app()
+        try:
+            while not self.done:
+                await app.next_update_async()
+                self.run_slice()
+                on_slice(self)
+        finally:
+            self._steps.close()
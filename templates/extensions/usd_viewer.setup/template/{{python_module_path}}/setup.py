@@ -9,8 +9,12 @@
 # its affiliates is strictly prohibited.
 
 import asyncio
+import json
+import time
 from pathlib import Path
+from typing import List, Tuple
 
+import carb
 import carb.settings
 import carb.tokens
 import omni.ext
@@ -19,11 +23,55 @@ import omni.kit.imgui as _imgui
 import omni.usd
 from omni.kit.mainwindow import get_main_window
 from omni.kit.quicklayout import QuickLayout
+from carb.eventdispatcher import get_eventdispatcher
 from omni.kit.viewport.utility import get_viewport_from_window_name
+from {{ extra_extension_name }} import LoadOptions
 
 COMMAND_MACRO_SETTING = "/exts/omni.kit.command_macro.core/"
 COMMAND_MACRO_FILE_SETTING = COMMAND_MACRO_SETTING + "macro_file"
 
+SETTINGS_PATH = "/exts/{{ extension_name }}/"
+AUTO_LOAD_SET_SETTING = SETTINGS_PATH + "auto_load_set"
+AUTO_LOAD_PAYLOADS_SETTING = SETTINGS_PATH + "auto_load_payloads"
+AUTO_LOAD_DEPTH_SETTING = SETTINGS_PATH + "auto_load_depth"
+STARTUP_WAIT_TIMEOUT_SETTING = SETTINGS_PATH + "startup_wait_timeout"
+STARTUP_TIMELINE_FILE_SETTING = SETTINGS_PATH + "startup_timeline_file"
+RENDERER_WAIT_TIMEOUT_SETTING = SETTINGS_PATH + "renderer_wait_timeout"
+
+# Seconds after which the USD context is checked again when no stage event
+# came, stage events are not guaranteed for every state change.
+IDLE_RECHECK_INTERVAL = 1.0
+
+
+class StartupTimeline:
+    """Records when each startup phase finished, relative to the extension startup."""
+    def __init__(self):
+        self._start = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+
+    def mark(self, phase: str) -> None:
+        """Records that `phase` just finished."""
+        elapsed = time.perf_counter() - self._start
+        self.phases.append((phase, elapsed))
+        carb.log_info(f"Startup timeline: {phase} after {elapsed * 1000.0:.1f}ms")
+
+    def write(self, path: str) -> None:
+        """Writes the phases as JSON to `path`."""
+        try:
+            with open(path, "w", encoding="utf-8") as timeline_file:
+                json.dump([{"phase": phase, "seconds": seconds} for phase, seconds in self.phases], timeline_file, indent=2)
+        except OSError as exc:
+            carb.log_warn(f"SetupExtension: Failed to write startup timeline {path}: {exc}")
+
+
+async def _wait_event(event: asyncio.Event, timeout: float) -> bool:
+    """Waits for `event` for at most `timeout` seconds, 0 waits indefinitely. Returns whether it was set."""
+    try:
+        await asyncio.wait_for(event.wait(), timeout if timeout > 0 else None)
+    except asyncio.TimeoutError:
+        return False
+    return True
+
 
 async def _load_layout(layout_file: str):
     """Loads a provided layout file and ensures the viewport is set to FILL."""
@@ -42,6 +90,12 @@ class SetupExtension(omni.ext.IExt):
         """This is called every time the extension is activated. It is used to
         set up the application and load the stage."""
         self._settings = carb.settings.get_settings()
+        self._timeline = StartupTimeline()
+        # Readiness signals awaited by the startup stage load.
+        self._layout_applied = asyncio.Event()
+        self._app_ready = asyncio.Event()
+        self._app_ready_sub = None
+        self._await_layout = None
         if self._settings and self._settings.get("/app/warmupMode"):
             # if warmup mode is enabled, we don't want to load the stage just return
             return
@@ -69,6 +123,15 @@ class SetupExtension(omni.ext.IExt):
                 pass
             asyncio.ensure_future(self.__open_stage(stage_url))
 
+        if omni.kit.app.get_app().is_app_ready():
+            self._app_ready.set()
+        else:
+            self._app_ready_sub = get_eventdispatcher().observe_event(
+                observer_name="SetupExtension:app_ready",
+                event_name=omni.kit.app.GLOBAL_EVENT_APP_READY,
+                on_event=lambda _: self._app_ready.set(),
+            )
+
         self._await_layout = asyncio.ensure_future(self._delayed_layout())
         get_main_window().get_main_menu_bar().visible = False
 
@@ -77,11 +140,13 @@ class SetupExtension(omni.ext.IExt):
         application has finished its initial setup."""
         main_menu_bar = get_main_window().get_main_menu_bar()
         main_menu_bar.visible = False
-        # few frame delay to allow automatic Layout of window that want their
-        # own positions
-        app = omni.kit.app.get_app()
-        for _ in range(4):
-            await app.next_update_async()  # type: ignore
+        # Wait for the app to be ready, so that windows that want their own
+        # positions have been laid out automatically.
+        timeout = self._settings.get_as_float(STARTUP_WAIT_TIMEOUT_SETTING)
+        if not await _wait_event(self._app_ready, timeout):
+            carb.log_warn("SetupExtension: Timed out waiting for the app to be ready, applying the layout")
+        self._app_ready_sub = None
+        self._timeline.mark("app_ready")
 
         settings = carb.settings.get_settings()
         # setup the Layout for your app
@@ -91,7 +156,9 @@ class SetupExtension(omni.ext.IExt):
         layout_name = settings.get("/app/layout/name")
         layout_file = Path(layouts_path).joinpath(f"{layout_name}.json")
 
-        asyncio.ensure_future(_load_layout(f"{layout_file}"))
+        await _load_layout(f"{layout_file}")
+        self._layout_applied.set()
+        self._timeline.mark("layout_applied")
 
         # using imgui directly to adjust some color and Variable
         imgui = _imgui.acquire_imgui()
@@ -100,41 +167,114 @@ class SetupExtension(omni.ext.IExt):
         # Dock Split connection
         imgui.push_style_var_float(_imgui.StyleVar.DockSplitterSize, 2)
 
-    async def __open_stage(self, url, frame_delay: int = 5):
+    async def _wait_usd_context_idle(self, usd_context, timeout: float) -> bool:
+        """
+        Waits until the USD context can open a stage, checking again on every
+        stage event and, without any, every `IDLE_RECHECK_INTERVAL` seconds.
+        """
+        if usd_context.can_open_stage():
+            return True
+        stage_event = asyncio.Event()
+        ed = get_eventdispatcher()
+        subscriptions = [
+            ed.observe_event(
+                observer_name=f"SetupExtension:stage:{event_type}",
+                event_name=usd_context.stage_event_name(event_type),
+                on_event=lambda _: stage_event.set(),
+            )
+            for event_type in (
+                omni.usd.StageEventType.OPENED,
+                omni.usd.StageEventType.OPEN_FAILED,
+                omni.usd.StageEventType.CLOSED,
+                omni.usd.StageEventType.ASSETS_LOADED,
+            )
+        ]
+        deadline = time.monotonic() + timeout if timeout > 0 else None
+        try:
+            while not usd_context.can_open_stage():
+                wait = IDLE_RECHECK_INTERVAL
+                if deadline:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = min(wait, remaining)
+                stage_event.clear()
+                await _wait_event(stage_event, wait)
+        finally:
+            subscriptions.clear()
+        return True
+
+    async def _wait_renderer(self, timeout: float) -> bool:
+        """Waits until the viewport has rendered a frame, meaning a renderer is attached."""
+        viewport_api = get_viewport_from_window_name("Viewport")
+        if not viewport_api or not hasattr(viewport_api, "wait_for_rendered_frames"):
+            return False
+        try:
+            await asyncio.wait_for(viewport_api.wait_for_rendered_frames(1), timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def __open_stage(self, url):
         """Opens the provided USD stage and loads the render settings."""
-        # default 5 frame delay to allow for Layout
-        if frame_delay:
-            app = omni.kit.app.get_app()
-            for _ in range(frame_delay):
-                await app.next_update_async()
+        timeout = self._settings.get_as_float(STARTUP_WAIT_TIMEOUT_SETTING)
+        # Opening the stage before the layout is applied would lay out the
+        # windows twice.
+        if not await _wait_event(self._layout_applied, timeout):
+            carb.log_warn(f"SetupExtension: Timed out waiting for the layout, opening stage {url}")
 
         usd_context = omni.usd.get_context()
 
-        count = 0
-        timed_out = False
         # Wait until we can open the stage
-        while not usd_context.can_open_stage():
-            await omni.kit.app.get_app().next_update_async()
-            count += 1
-            if count > 100:
-                timed_out = True
-                break
+        timed_out = not await self._wait_usd_context_idle(usd_context, timeout)
+        if not timed_out:
+            self._timeline.mark("usd_context_idle")
+
+        try:
+            load_options = LoadOptions.from_payload({
+                "load_set": self._settings.get_as_string(AUTO_LOAD_SET_SETTING) or "all",
+                "payloads": self._settings.get(AUTO_LOAD_PAYLOADS_SETTING),
+                "load_depth": self._settings.get_as_int(AUTO_LOAD_DEPTH_SETTING),
+            })
+        except ValueError as error:
+            carb.log_warn(
+                f"SetupExtension: Loading every payload of {url}, {error}")
+            load_options = LoadOptions()
 
         if not timed_out:
-            await usd_context.open_stage_async(
-                url, omni.usd.UsdContextInitialLoadSet.LOAD_ALL)
+            result, _ = await usd_context.open_stage_async(
+                url, load_options.initial_load_set)
         else:
             carb.log_warn(
                 f"SetupExtension: Timed out waiting to open stage {url}")
             return
 
+        if result:
+            if not load_options.load_all:
+                load_options.apply(usd_context.get_stage())
+            self._timeline.mark("stage_opened")
+        else:
+            carb.log_warn(f"SetupExtension: Failed to open stage {url}")
+
         # If this was the first Usd data opened, explicitly restore
         # render-settings now as the renderer may not have been fully
         # setup when the stage was opened.
-        if not bool(self._settings.get("/app/content/emptyStageOnStart")):
+        if result and not bool(self._settings.get("/app/content/emptyStageOnStart")):
+            if await self._wait_renderer(self._settings.get_as_float(RENDERER_WAIT_TIMEOUT_SETTING)):
+                self._timeline.mark("renderer_attached")
+            else:
+                carb.log_warn("SetupExtension: No rendered frame yet, loading render settings anyway")
             usd_context.load_render_settings_from_stage(
                 usd_context.get_stage_id())
+            self._timeline.mark("render_settings_loaded")
+
+        timeline_file = self._settings.get_as_string(STARTUP_TIMELINE_FILE_SETTING)
+        if timeline_file:
+            self._timeline.write(carb.tokens.get_tokens_interface().resolve(timeline_file))
 
     def on_shutdown(self):
         """This is called every time the extension is deactivated."""
-        return
+        self._app_ready_sub = None
+        if self._await_layout is not None:
+            self._await_layout.cancel()
+            self._await_layout = None
@@ -0,0 +1,83 @@
+# SPDX-FileCopyrightText: Copyright (c) 2024 NVIDIA CORPORATION & AFFILIATES. All rights reserved.
+# SPDX-License-Identifier: LicenseRef-NvidiaProprietary
+#
+# NVIDIA CORPORATION, its affiliates and licensors retain all intellectual
+# property and proprietary rights in and to this material, related
+# documentation and any modifications thereto. Any use, reproduction,
+# disclosure or distribution of this material and related documentation
+# without an express license agreement from NVIDIA CORPORATION or
+# its affiliates is strictly prohibited.
+
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+import omni.usd
+from carb.eventdispatcher import get_eventdispatcher
+from omni.kit.test import AsyncTestCase
+
+from ..setup import SetupExtension, StartupTimeline, _wait_event
+
+
+class _BusyUsdContext:
+    """Stands in for a USD context that cannot open a stage until `idle` is set."""
+    def __init__(self):
+        self.idle = False
+
+    def can_open_stage(self) -> bool:
+        return self.idle
+
+    def stage_event_name(self, event_type) -> str:
+        return f"TestSetup:{event_type}"
+
+
+class TestSetup(AsyncTestCase):
+    """Tests of the startup sequence helpers of the USD Viewer setup extension."""
+
+    async def test_startup_timeline(self):
+        """Phases are recorded in order and written as JSON"""
+        timeline = StartupTimeline()
+        timeline.mark("app_ready")
+        timeline.mark("stage_opened")
+        self.assertEqual([phase for phase, _ in timeline.phases], ["app_ready", "stage_opened"])
+        self.assertLessEqual(timeline.phases[0][1], timeline.phases[1][1])
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "timeline.json")
+            timeline.write(path)
+            with open(path, encoding="utf-8") as timeline_file:
+                written = json.load(timeline_file)
+            # A directory that does not exist is only warned about.
+            timeline.write(os.path.join(directory, "missing", "timeline.json"))
+        self.assertEqual([entry["phase"] for entry in written], ["app_ready", "stage_opened"])
+
+    async def test_wait_event(self):
+        """Waiting on an event returns whether it was set before the timeout"""
+        event = asyncio.Event()
+        self.assertFalse(await _wait_event(event, 0.01))
+        asyncio.get_event_loop().call_later(0.01, event.set)
+        self.assertTrue(await _wait_event(event, 0))
+
+    async def test_wait_usd_context_idle(self):
+        """The USD context is checked again as soon as a stage event comes, and given up on after the timeout"""
+        extension = SetupExtension()
+        usd_context = _BusyUsdContext()
+
+        async def become_idle():
+            await asyncio.sleep(0.05)
+            usd_context.idle = True
+            get_eventdispatcher().dispatch_event(usd_context.stage_event_name(omni.usd.StageEventType.OPENED))
+
+        task = asyncio.ensure_future(become_idle())
+        start = time.monotonic()
+        self.assertTrue(await extension._wait_usd_context_idle(usd_context, 5.0))
+        # Woken up by the stage event rather than the recheck interval.
+        self.assertLess(time.monotonic() - start, 0.5)
+        await task
+
+        usd_context.idle = False
+        start = time.monotonic()
+        self.assertFalse(await extension._wait_usd_context_idle(usd_context, 0.1))
+        self.assertLess(time.monotonic() - start, 0.5)